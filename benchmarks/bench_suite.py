@@ -0,0 +1,408 @@
+"""
+Offline benchmark suite for the pipeline, metrics and model hot paths.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_suite --stations 5 --days 60
+    python -m benchmarks.bench_suite --stations 100 --days 365 --skip-models
+    python -m benchmarks.bench_suite --long-context --skip-pipeline
+    python -m benchmarks.bench_suite --compare <base_commit> <head_commit>
+
+Each run appends one JSON line per benchmark to ``--results`` (default
+``benchmarks/results.jsonl``), tagged with the current git commit, so runs
+can be compared across commits.
+"""
+import argparse
+import ctypes
+import gc
+import json
+import os
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic_data import make_wide_frame, write_synthetic_workbooks
+
+DEFAULT_RESULTS = os.path.join(os.path.dirname(__file__), "results.jsonl")
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def current_rss_mb() -> float | None:
+    """Resident set size of this process right now (Linux), else None."""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _release_free_memory() -> None:
+    # hand freed heap pages back to the OS so the next RSS baseline is honest
+    gc.collect()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+class RSSSampler:
+    """Peak RSS above the starting level while the ``with`` block runs, sampled every ``interval`` s."""
+    def __init__(self, interval: float = 0.001):
+        self.interval = interval
+        self.base     = None
+        self.peak     = None
+        self._stop    = threading.Event()
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = current_rss_mb()
+            self.peak = max(self.peak, rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.base = self.peak = current_rss_mb()
+        if self.base is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.base is not None:
+            self._stop.set()
+            self._thread.join()
+            self.peak = max(self.peak, current_rss_mb())
+
+    @property
+    def delta_mb(self) -> float | None:
+        return None if self.base is None else self.peak - self.base
+
+
+def measure(name: str, fn, n_items: int, unit: str, repeat: int = 3, setup=None) -> dict:
+    """
+    Time ``fn()`` ``repeat`` times (after ``setup()`` if given) and record the
+    median wall time and throughput (n_items / median).
+
+    Memory comes from one extra untimed run before the timed ones (which also
+    serves as warm-up): ``rss_delta_mb`` is the peak resident memory above the
+    level at its start, so it covers torch / BLAS buffers as well, and
+    ``peak_traced_mb`` is the Python/NumPy share seen by ``tracemalloc``.
+    """
+    args = setup() if setup else ()
+    _release_free_memory()
+    tracemalloc.start()
+    with RSSSampler() as rss:
+        fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del args
+
+    times = []
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        t0 = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - t0)
+    median = statistics.median(times)
+    return {
+        "name": name,
+        "n_items": n_items,
+        "unit": unit,
+        "median_s": median,
+        "min_s": min(times),
+        "throughput": n_items / median if median > 0 else float("inf"),
+        "peak_traced_mb": peak / 2 ** 20,
+        "rss_delta_mb": rss.delta_mb,
+    }
+
+
+# ---- pipeline / data benchmarks ----------------------------------------
+
+def bench_pipeline(n_stations, n_days, repeat):
+    from utils.concatenate_data import (
+        clean_header_and_drop_unused_rows, concatenate_preprocessed_data,
+        convert_to_timeseries_long_format, gather_files, preprocess_and_add_datetime,
+        run_pipeline,
+    )
+
+    results = []
+    n_rows = n_stations * n_days
+    with tempfile.TemporaryDirectory() as tmp:
+        xlsx_dir = os.path.join(tmp, "Load-data")
+        n_files = write_synthetic_workbooks(xlsx_dir, n_stations, n_days)
+        files = gather_files(xlsx_dir, ".xlsx")
+
+        results.append(measure(
+            "pipeline.read_excel+clean",
+            lambda: [clean_header_and_drop_unused_rows(pd.read_excel(fp)) for fp, _ in files],
+            n_files, "files", repeat))
+
+        cleaned = [(clean_header_and_drop_unused_rows(pd.read_excel(fp)), fp) for fp, _ in files]
+        results.append(measure(
+            "pipeline.preprocess_and_add_datetime",
+            lambda: [preprocess_and_add_datetime(df.copy(), os.path.basename(fp)) for df, fp in cleaned],
+            n_files, "files", repeat))
+
+        out = lambda name: os.path.join(tmp, name)
+        results.append(measure(
+            "pipeline.run_pipeline",
+            lambda: run_pipeline(xlsx_dir, out("cleaned"), out("pre"), out("wide.csv"), out("long.csv")),
+            n_rows, "station-days", repeat))
+
+        results.append(measure(
+            "pipeline.concatenate_preprocessed_data",
+            lambda: concatenate_preprocessed_data(out("pre")),
+            n_rows, "station-days", repeat))
+
+    wide = make_wide_frame(n_stations, n_days)
+    results.append(measure(
+        "pipeline.convert_to_timeseries_long_format",
+        lambda: convert_to_timeseries_long_format(wide),
+        n_rows * 96, "rows", repeat))
+    return results
+
+
+def bench_data(n_stations, n_days, repeat, len_input=96, pred_len=96):
+    from utils.build_station_weight import build_station_weights
+    from utils.concatenate_data import convert_to_timeseries_long_format
+    from utils.error_analyzer import compute_station_metrics
+    from utils.split_train_test_data import split_train_test_data
+
+    long_df = convert_to_timeseries_long_format(make_wide_frame(n_stations, n_days))
+    n_rows  = len(long_df)
+    results = [measure("data.split_train_test_data",
+                       lambda: split_train_test_data(long_df), n_rows, "rows", repeat)]
+
+    rng = np.random.default_rng(0)
+    df_eval = long_df.assign(**{"Predicted(kW)": long_df["Electricity(kW)"] * rng.normal(1, 0.1, n_rows)})
+    weights = build_station_weights(long_df)
+    results.append(measure("data.compute_station_metrics",
+                           lambda: compute_station_metrics(df_eval, weights), n_rows, "rows", repeat))
+
+    try:
+        from model.dataset import pivot_to_tensor
+    except ImportError:
+        return results
+    station_names = sorted(long_df["station_name"].unique())
+    n_windows = n_days * 96 - len_input - pred_len + 1
+    results.append(measure("data.pivot_to_tensor",
+                           lambda: pivot_to_tensor(long_df, len_input + pred_len, station_names),
+                           n_windows, "windows", repeat))
+    return results
+
+
+# ---- model benchmarks ---------------------------------------------------
+
+def default_config(num_nodes, len_input=96, pred_len=96):
+    return {
+        "nb_block": 2,
+        "in_channels": 1,
+        "K": 2,
+        "nb_chev_filter": 64,
+        "nb_time_filter": 64,
+        "time_strides": 1,
+        "num_for_predict": pred_len,
+        "len_input": len_input,
+        "num_of_vertices": num_nodes,
+        "normalization": "sym",
+        "bias": True,
+    }
+
+
+def bench_models(n_stations, repeat, batch_size=32, len_input=96, pred_len=96):
+    try:
+        import torch
+        from model.model_core_architecture import ASTGCN_V1, ASTGCN_V2
+        from model.model_experiment import WattGraphNet_AAMm
+    except ImportError as e:
+        print(f"⚠️ Skipping model benchmarks ({e})")
+        return []
+
+    torch.manual_seed(0)
+    config = default_config(n_stations, len_input, pred_len)
+    edge_index = torch.tensor(
+        [[i, j] for i in range(n_stations) for j in range(n_stations) if i != j],
+        dtype=torch.long
+    ).t().contiguous()
+    X = torch.randn(batch_size, n_stations, 1, len_input)
+    Y = torch.randn(batch_size, n_stations, pred_len)
+
+    results = []
+    for cls in (ASTGCN_V1, ASTGCN_V2, WattGraphNet_AAMm):
+        model = cls(num_nodes=n_stations, **config)
+
+        def forward():
+            with torch.no_grad():
+                model(X, edge_index)
+
+        def forward_backward():
+            model.zero_grad()
+            loss = torch.nn.functional.mse_loss(model(X, edge_index), Y)
+            loss.backward()
+
+        model.eval()
+        forward()                                                  # warm-up
+        results.append(measure(f"model.{cls.__name__}.forward", forward,
+                               batch_size, "samples", repeat))
+        model.train()
+        results.append(measure(f"model.{cls.__name__}.forward_backward", forward_backward,
+                               batch_size, "samples", repeat))
+    return results
+
+
+def saved_activation_mb(fn) -> float:
+    """
+    MB of tensors autograd keeps for backward during ``fn()`` (each storage
+    counted once). On CPU this is the part of peak memory that grows with
+    batch size and sequence length, and what activation checkpointing saves.
+    """
+    import torch
+
+    storages = {}
+
+    def pack(t):
+        s = t.untyped_storage()
+        storages[s.data_ptr()] = s.nbytes()
+        return t
+
+    with torch.autograd.graph.saved_tensors_hooks(pack, lambda t: t):
+        fn()
+    return sum(storages.values()) / 2 ** 20
+
+
+def bench_long_context(n_stations, repeat, batch_size=32, history=672, pred_len=96):
+    """
+    Train-step cost of a week-long context against the 96-step baseline:
+    plain ASTGCN_V1 on ``history`` slots, with block checkpointing, and
+    through ``MultiScaleForecaster`` (last day + hourly prior), with and
+    without checkpointing.
+    """
+    try:
+        import torch
+        from model.model_core_architecture import ASTGCN_V1, MultiScaleForecaster
+    except ImportError as e:
+        print(f"⚠️ Skipping long-context benchmarks ({e})")
+        return []
+
+    torch.manual_seed(0)
+    edge_index = torch.tensor(
+        [[i, j] for i in range(n_stations) for j in range(n_stations) if i != j],
+        dtype=torch.long
+    ).t().contiguous()
+    multi_len = MultiScaleForecaster.model_len_input(history)
+    variants = [
+        ("baseline96",           96,      96,        False, False),
+        (f"full{history}",       history, history,   False, False),
+        (f"full{history}+ckpt",  history, history,   True,  False),
+        (f"multiscale{history}", history, multi_len, False, True),
+        (f"multiscale{history}+ckpt", history, multi_len, True, True),
+    ]
+    Y = torch.randn(batch_size, n_stations, pred_len)
+
+    results = []
+    for label, input_len, model_len, ckpt, multiscale in variants:
+        model = ASTGCN_V1(num_nodes=n_stations, checkpoint_blocks=ckpt,
+                          **default_config(n_stations, model_len, pred_len))
+        if multiscale:
+            model = MultiScaleForecaster(model)
+        model.train()
+        X = torch.randn(batch_size, n_stations, 1, input_len)
+
+        def forward_backward():
+            model.zero_grad()
+            loss = torch.nn.functional.mse_loss(model(X, edge_index), Y)
+            loss.backward()
+
+        activations = saved_activation_mb(lambda: model(X, edge_index))
+        r = measure(f"long_context.{label}.forward_backward", forward_backward,
+                    batch_size, "samples", repeat)
+        r["saved_activation_mb"] = activations
+        results.append(r)
+    return results
+
+
+# ---- results store --------------------------------------------------------
+
+def save_results(results: list[dict], path: str, config: dict) -> None:
+    commit = git_commit()
+    stamp  = datetime.now().isoformat(timespec="seconds")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for r in results:
+            f.write(json.dumps({"commit": commit, "timestamp": stamp, "config": config, **r}) + "\n")
+
+
+def load_results(path: str = DEFAULT_RESULTS) -> pd.DataFrame:
+    with open(path, encoding="utf-8") as f:
+        return pd.DataFrame([json.loads(line) for line in f if line.strip()])
+
+
+def compare_results(base: str, head: str, path: str = DEFAULT_RESULTS) -> pd.DataFrame:
+    """
+    Median time per benchmark for two commits and the head/base ratio
+    (> 1 means head is slower). Benchmarks are matched on (name, config), so
+    runs at different sizes are never compared; the latest run of each
+    commit is used.
+    """
+    df = load_results(path)
+    df = df[df["commit"].isin([base, head])]
+    df = df.assign(config=df["config"].map(lambda c: json.dumps(c, sort_keys=True)))
+    latest = df.sort_values("timestamp").groupby(["commit", "name", "config"]).tail(1)
+    table = latest.pivot(index=["name", "config"], columns="commit", values="median_s")
+    table = table.reindex(columns=[base, head])
+    table["ratio"] = table[head] / table[base]
+    return table.sort_values("ratio", ascending=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stations", type=int, default=5)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--skip-pipeline", action="store_true")
+    parser.add_argument("--skip-models", action="store_true")
+    parser.add_argument("--long-context", action="store_true",
+                        help="also benchmark week-long inputs (checkpointing / multi-scale)")
+    parser.add_argument("--results", default=DEFAULT_RESULTS)
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "HEAD"))
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        print(compare_results(*args.compare, path=args.results).to_string())
+        return
+
+    results = []
+    if not args.skip_pipeline:
+        results += bench_pipeline(args.stations, args.days, args.repeat)
+    results += bench_data(args.stations, args.days, args.repeat)
+    if not args.skip_models:
+        results += bench_models(args.stations, args.repeat, args.batch_size)
+    if args.long_context:
+        results += bench_long_context(args.stations, args.repeat, args.batch_size)
+
+    config = {"stations": args.stations, "days": args.days, "batch_size": args.batch_size}
+    save_results(results, args.results, config)
+
+    columns = ["name", "median_s", "throughput", "unit", "peak_traced_mb", "rss_delta_mb"]
+    if args.long_context:
+        columns.append("saved_activation_mb")
+    table = pd.DataFrame(results).reindex(columns=columns)
+    print(table.to_string(index=False, float_format=lambda v: f"{v:,.3f}"))
+
+
+if __name__ == "__main__":
+    main()
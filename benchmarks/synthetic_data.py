@@ -0,0 +1,60 @@
+import os
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+TIME_COLUMNS = [f"{h}:{m:02d}" for h in range(24) for m in (0, 15, 30, 45)]
+
+
+def make_wide_frame(n_stations: int = 5, n_days: int = 60, start: str = "2024-01-01",
+                    seed: int = 0) -> pd.DataFrame:
+    """
+    Synthetic stand-in for ``all_data_df``: one 96-slot kW profile per
+    station-day, with per-station scales spanning a few orders of magnitude,
+    a daily shape, weekday/weekend effect, noise and a few negative readings.
+    """
+    rng   = np.random.default_rng(seed)
+    days  = pd.date_range(start, periods=n_days, freq="D")
+    slot  = np.arange(96) / 96.0
+    shape = 0.55 - 0.45 * np.cos(2 * np.pi * (slot - 0.08))               # peak early afternoon
+
+    scale   = 10 ** rng.uniform(0, 2.5, size=n_stations)                 # ~1 .. 300 kW
+    weekend = np.where(days.dayofweek >= 5, 0.6, 1.0)
+    values  = (scale[:, None, None] * weekend[None, :, None] * shape[None, None, :]
+               * rng.lognormal(0, 0.15, size=(n_stations, n_days, 96)))
+    values[rng.random(values.shape) < 0.001] *= -0.05
+
+    frame = pd.DataFrame(values.reshape(-1, 96).round(2), columns=TIME_COLUMNS)
+    frame.insert(0, "Date", np.tile(days, n_stations))
+    frame.insert(0, "station_name", np.repeat([f"Data_station_{i:03d}" for i in range(n_stations)], n_days))
+    return frame
+
+
+def to_long_frame(wide: pd.DataFrame) -> pd.DataFrame:
+    """Long frame in the layout of ``convert_to_timeseries_long_format``."""
+    from utils.concatenate_data import convert_to_timeseries_long_format
+    return convert_to_timeseries_long_format(wide)
+
+
+def write_synthetic_workbooks(root_dir: str, n_stations: int = 5, n_days: int = 60,
+                              start: str = "2024-01-01", seed: int = 0) -> int:
+    """
+    Write monthly meter workbooks in the ``Load-data`` layout
+    (``<root>/Data_<station>/…-MM-YYYY.xlsx``: title row, header row, one row
+    per day). Returns the number of files written.
+    """
+    wide = make_wide_frame(n_stations, n_days, start, seed)
+    written = 0
+    for (station, month), g in wide.groupby(["station_name", wide["Date"].dt.to_period("M")]):
+        out_dir = os.path.join(root_dir, station)
+        os.makedirs(out_dir, exist_ok=True)
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+        ws.append(["รายงานสรุป Demand รายวัน"])
+        ws.append(["Date"] + TIME_COLUMNS)
+        for date, row in zip(g["Date"], g[TIME_COLUMNS].to_numpy()):
+            ws.append([f"{date.day:02d}"] + row.tolist())
+        wb.save(os.path.join(out_dir, f"รายงานสรุป-Demand-รายวัน-{station}-{month.month:02d}-{month.year}.xlsx"))
+        written += 1
+    return written
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import torch
+from torch.utils.data import Dataset
+
+from utils.instrumentation import span
+
+
+def pivot_to_series(df: pd.DataFrame, station_names: list[str]) -> np.ndarray:
+    """Pivot a long frame to a float32 (T, N) array in ``station_names`` order, NaN → 0."""
+    with span("dataset.pivot", rows=len(df)):
+        pv = df.pivot(index='Date', columns='station_name', values='Electricity(kW)')
+        pv = pv[station_names].fillna(0.0)
+        return pv.to_numpy(dtype=np.float32)
+
+
+def pivot_to_tensor(df: pd.DataFrame, seq_len: int, station_names: list[str]) -> torch.Tensor:
+    """
+    Pivot a long frame to (Date × station) and cut every sliding window.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Long frame with columns ['station_name', 'Date', 'Electricity(kW)'].
+    seq_len : int
+        Window length, usually len_input + pred_len.
+    station_names : list[str]
+        Station order of the node axis.
+
+    Returns
+    -------
+    torch.Tensor
+        Float tensor of shape (num_windows, N, seq_len).
+    """
+    values = pivot_to_series(df, station_names)                   # (T, N)
+    if len(values) < seq_len:
+        return torch.empty((0, len(station_names), seq_len), dtype=torch.float)
+    with span("dataset.windows", seq_len=seq_len):
+        windows = np.lib.stride_tricks.sliding_window_view(values, seq_len, axis=0)  # (W, N, seq_len)
+        return torch.from_numpy(np.ascontiguousarray(windows))
+
+
+def split_windows(arr: torch.Tensor, len_input: int) -> tuple[torch.Tensor, torch.Tensor]:
+    """Split (W, N, len_input + pred_len) windows into inputs X and targets Y."""
+    return arr[:, :, :len_input], arr[:, :, len_input:]
+
+
+class TemporalDataset(Dataset):
+    """
+    Sliding-window dataset of (X, Y) pairs, X: [N, len_input], Y: [N, pred_len].
+
+    If a ``StationStatsStore`` is given, X and Y are normalized once up front
+    (a single fused op over the whole tensor) instead of per item.
+    """
+    def __init__(self, X, Y, stats=None, station_names=None, method="zscore"):
+        if stats is not None:
+            with span("dataset.normalize", method=method):
+                X = stats.normalize(X, station_names, method, node_axis=1)
+                Y = stats.normalize(Y, station_names, method, node_axis=1)
+        self.X, self.Y = X, Y
+
+    def __len__(self):
+        return self.X.shape[0]
+
+    def __getitem__(self, i):
+        return self.X[i], self.Y[i]
+
+
+class SeriesWindowDataset(Dataset):
+    """
+    Windows cut lazily from a (T, N) series instead of materialized up front.
+
+    ``series`` may be a ``np.load(..., mmap_mode='r')`` array, so several
+    worker processes can share one on-disk copy of the training data and use
+    different ``len_input`` values without rebuilding window tensors.
+    """
+    def __init__(self, series, len_input: int, pred_len: int):
+        self.series    = series
+        self.len_input = len_input
+        self.pred_len  = pred_len
+
+    def __len__(self):
+        return max(len(self.series) - self.len_input - self.pred_len + 1, 0)
+
+    def __getitem__(self, i):
+        w = np.array(self.series[i : i + self.len_input + self.pred_len], dtype=np.float32).T
+        return torch.from_numpy(w[:, :self.len_input]), torch.from_numpy(w[:, self.len_input:])
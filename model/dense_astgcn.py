@@ -0,0 +1,316 @@
+"""
+Dense-matrix ASTGCN backend for small, fixed graphs.
+
+Same math and parameter names as torch_geometric_temporal's ``ASTGCN``, but
+the Chebyshev graph convolution runs as batched matmuls against a dense
+scaled Laplacian instead of message passing over ``edge_index``, and all
+timesteps are convolved at once instead of looping over T. For graphs of a
+handful to a few hundred stations this avoids scatter/gather overhead,
+needs no torch_geometric at inference time and exports cleanly to ONNX.
+
+The wrappers load ``best_model.pt`` checkpoints of the matching classes in
+``model_core_architecture`` / ``model_experiment`` unchanged:
+
+    model = DenseASTGCN_V1(num_nodes=num_nodes, **config)
+    model.load_state_dict(torch.load("best_model.pt"))
+"""
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+
+# ---- graph helpers ------------------------------------------------------
+
+def dense_adjacency(edge_index: torch.Tensor, num_nodes: int) -> torch.Tensor:
+    """Unweighted (N, N) adjacency from an edge index, self-loops removed."""
+    A = torch.zeros(num_nodes, num_nodes, dtype=torch.float32, device=edge_index.device)
+    A[edge_index[0], edge_index[1]] = 1.0
+    return A * (1 - torch.eye(num_nodes, device=A.device))
+
+
+def scaled_laplacian(A: torch.Tensor, normalization: str | None = "sym") -> torch.Tensor:
+    """
+    ``2 L / lambda_max - I`` for an unweighted adjacency, matching
+    ``ChebConvAttention.__norm__`` (edge weights are never passed there, so
+    only the sparsity pattern of the graph matters).
+    """
+    N   = A.size(0)
+    eye = torch.eye(N, dtype=A.dtype, device=A.device)
+    deg = A.sum(dim=1)
+    if normalization == "sym":
+        d = deg.pow(-0.5).masked_fill(deg == 0, 0)
+        L = eye - d[:, None] * A * d[None, :]
+        lambda_max = 2.0
+    else:
+        if normalization == "rw":
+            d = deg.pow(-1).masked_fill(deg == 0, 0)
+            L = eye - d[:, None] * A
+        else:
+            L = torch.diag(deg) - A
+        # ASTGCNBlock uses LaplacianLambdaMax() with its default
+        # (unnormalized) Laplacian for every non-sym normalization
+        L_comb = torch.diag(deg) - A
+        if torch.equal(A, A.t()):
+            lambda_max = torch.linalg.eigvalsh(L_comb).max().item()
+        else:
+            lambda_max = torch.linalg.eigvals(L_comb).real.max().item()
+    return 2.0 * L / lambda_max - eye
+
+
+def chebyshev_basis(L_hat: torch.Tensor, K: int) -> tuple[torch.Tensor, torch.Tensor]:
+    """
+    Matrices (A_k, B_k), k = 2..K-1, with ``T_k = A_k T_1 + B_k T_0`` for the
+    Chebyshev recursion ``T_k = 2 L_hat T_{k-1} - T_{k-2}``. Shapes (K-2, N, N).
+    """
+    N   = L_hat.size(0)
+    eye = torch.eye(N, dtype=L_hat.dtype, device=L_hat.device)
+    zero = torch.zeros_like(eye)
+    A_prev, A_cur = zero, eye        # coefficients of T_1 in T_0, T_1
+    B_prev, B_cur = eye, zero        # coefficients of T_0 in T_0, T_1
+    A_list, B_list = [], []
+    for _ in range(2, K):
+        A_next = 2.0 * L_hat @ A_cur - A_prev
+        B_next = 2.0 * L_hat @ B_cur - B_prev
+        A_list.append(A_next)
+        B_list.append(B_next)
+        A_prev, A_cur = A_cur, A_next
+        B_prev, B_cur = B_cur, B_next
+    if not A_list:
+        return L_hat.new_zeros(0, N, N), L_hat.new_zeros(0, N, N)
+    return torch.stack(A_list), torch.stack(B_list)
+
+
+# ---- layers -------------------------------------------------------------
+
+class DenseChebConvAttention(nn.Module):
+    def __init__(self, in_channels, out_channels, K, bias=True):
+        super().__init__()
+        self._weight = nn.Parameter(torch.Tensor(K, in_channels, out_channels))
+        if bias:
+            self._bias = nn.Parameter(torch.Tensor(out_channels))
+        else:
+            self.register_parameter("_bias", None)
+        nn.init.xavier_uniform_(self._weight)
+        if self._bias is not None:
+            nn.init.uniform_(self._bias)
+
+    def forward(self, X, L_hat, basis_a, basis_b, S):
+        """
+        X: (B, N, F_in, T), L_hat: (N, N), S: (B, N, N) spatial attention
+        returns (B, N, F_out, T)
+        """
+        W = self._weight
+        # T_0 = diag(S) x,  T_1 = (L_hat ∘ S) T_0
+        T0  = torch.diagonal(S, dim1=1, dim2=2)[:, :, None, None] * X
+        out = torch.einsum("bnft,fo->bnot", T0, W[0])
+        if W.size(0) > 1:
+            T1  = torch.einsum("bij,bjft->bift", L_hat * S, T0)
+            out = out + torch.einsum("bnft,fo->bnot", T1, W[1])
+            if W.size(0) > 2:
+                Tk  = (torch.einsum("kij,bjft->kbift", basis_a, T1)
+                       + torch.einsum("kij,bjft->kbift", basis_b, T0))
+                out = out + torch.einsum("kbnft,kfo->bnot", Tk, W[2:])
+        if self._bias is not None:
+            out = out + self._bias[None, None, :, None]
+        return out
+
+
+class DenseSpatialAttention(nn.Module):
+    def __init__(self, in_channels, num_of_vertices, num_of_timesteps):
+        super().__init__()
+        self._W1 = nn.Parameter(torch.FloatTensor(num_of_timesteps))
+        self._W2 = nn.Parameter(torch.FloatTensor(in_channels, num_of_timesteps))
+        self._W3 = nn.Parameter(torch.FloatTensor(in_channels))
+        self._bs = nn.Parameter(torch.FloatTensor(1, num_of_vertices, num_of_vertices))
+        self._Vs = nn.Parameter(torch.FloatTensor(num_of_vertices, num_of_vertices))
+        for p in self.parameters():
+            if p.dim() > 1:
+                nn.init.xavier_uniform_(p)
+            else:
+                nn.init.uniform_(p)
+
+    def forward(self, X):
+        LHS = torch.matmul(torch.matmul(X, self._W1), self._W2)
+        RHS = torch.matmul(self._W3, X).transpose(-1, -2)
+        S = torch.matmul(self._Vs, torch.sigmoid(torch.matmul(LHS, RHS) + self._bs))
+        return F.softmax(S, dim=1)
+
+
+class DenseTemporalAttention(nn.Module):
+    def __init__(self, in_channels, num_of_vertices, num_of_timesteps):
+        super().__init__()
+        self._U1 = nn.Parameter(torch.FloatTensor(num_of_vertices))
+        self._U2 = nn.Parameter(torch.FloatTensor(in_channels, num_of_vertices))
+        self._U3 = nn.Parameter(torch.FloatTensor(in_channels))
+        self._be = nn.Parameter(torch.FloatTensor(1, num_of_timesteps, num_of_timesteps))
+        self._Ve = nn.Parameter(torch.FloatTensor(num_of_timesteps, num_of_timesteps))
+        for p in self.parameters():
+            if p.dim() > 1:
+                nn.init.xavier_uniform_(p)
+            else:
+                nn.init.uniform_(p)
+
+    def forward(self, X):
+        LHS = torch.matmul(torch.matmul(X.permute(0, 3, 2, 1), self._U1), self._U2)
+        RHS = torch.matmul(self._U3, X)
+        E = torch.matmul(self._Ve, torch.sigmoid(torch.matmul(LHS, RHS) + self._be))
+        return F.softmax(E, dim=1)
+
+
+class DenseASTGCNBlock(nn.Module):
+    def __init__(self, in_channels, K, nb_chev_filter, nb_time_filter, time_strides,
+                 num_of_vertices, num_of_timesteps, bias=True):
+        super().__init__()
+        self._temporal_attention  = DenseTemporalAttention(in_channels, num_of_vertices, num_of_timesteps)
+        self._spatial_attention   = DenseSpatialAttention(in_channels, num_of_vertices, num_of_timesteps)
+        self._chebconv_attention  = DenseChebConvAttention(in_channels, nb_chev_filter, K, bias)
+        self._time_convolution    = nn.Conv2d(nb_chev_filter, nb_time_filter, kernel_size=(1, 3),
+                                              stride=(1, time_strides), padding=(0, 1))
+        self._residual_convolution = nn.Conv2d(in_channels, nb_time_filter, kernel_size=(1, 1),
+                                               stride=(1, time_strides))
+        self._layer_norm = nn.LayerNorm(nb_time_filter)
+
+    def forward(self, X, L_hat, basis_a, basis_b):
+        B, N, F_in, T = X.shape
+        X_tilde = self._temporal_attention(X)
+        X_tilde = torch.matmul(X.reshape(B, -1, T), X_tilde).reshape(B, N, F_in, T)
+        S = self._spatial_attention(X_tilde)
+
+        X_hat = F.relu(self._chebconv_attention(X, L_hat, basis_a, basis_b, S))
+        X_hat = self._time_convolution(X_hat.permute(0, 2, 1, 3))
+        X     = self._residual_convolution(X.permute(0, 2, 1, 3))
+        X     = self._layer_norm(F.relu(X + X_hat).permute(0, 3, 2, 1))
+        return X.permute(0, 2, 3, 1)
+
+
+class DenseASTGCN(nn.Module):
+    """Drop-in dense counterpart of ``torch_geometric_temporal.ASTGCN``."""
+    def __init__(self, nb_block, in_channels, K, nb_chev_filter, nb_time_filter, time_strides,
+                 num_for_predict, len_input, num_of_vertices, normalization=None, bias=True):
+        super().__init__()
+        self.K = K
+        self.normalization = normalization
+        self._blocklist = nn.ModuleList([
+            DenseASTGCNBlock(in_channels, K, nb_chev_filter, nb_time_filter, time_strides,
+                             num_of_vertices, len_input, bias)
+        ])
+        self._blocklist.extend([
+            DenseASTGCNBlock(nb_time_filter, K, nb_chev_filter, nb_time_filter, 1,
+                             num_of_vertices, len_input // time_strides, bias)
+            for _ in range(nb_block - 1)
+        ])
+        self._final_conv = nn.Conv2d(int(len_input / time_strides), num_for_predict,
+                                     kernel_size=(1, nb_time_filter))
+
+    def forward(self, X, L_hat, basis_a, basis_b):
+        for block in self._blocklist:
+            X = block(X, L_hat, basis_a, basis_b)
+        X = self._final_conv(X.permute(0, 3, 1, 2))
+        X = X[:, :, :, -1]
+        return X.permute(0, 2, 1)
+
+
+# ---- wrappers matching model_core_architecture / model_experiment --------
+
+class _DenseStaticGraph(nn.Module):
+    """Static graph: the Laplacian and its Chebyshev basis are precomputed buffers."""
+    output_relu = False
+
+    def __init__(self, num_nodes, edge_index=None, **kwargs):
+        super().__init__()
+        self.astgcn = DenseASTGCN(**kwargs)
+        if edge_index is None:
+            A = 1 - torch.eye(num_nodes)
+        else:
+            A = dense_adjacency(edge_index, num_nodes)
+        self.set_graph(A)
+
+    def set_graph(self, A: torch.Tensor):
+        L_hat = scaled_laplacian(A, self.astgcn.normalization)
+        basis_a, basis_b = chebyshev_basis(L_hat, self.astgcn.K)
+        # non-persistent: state_dict keys stay identical to the sparse models
+        self.register_buffer("_L_hat",   L_hat,   persistent=False)
+        self.register_buffer("_basis_a", basis_a, persistent=False)
+        self.register_buffer("_basis_b", basis_b, persistent=False)
+
+    def forward(self, x, edge_index=None):
+        """
+        x: [batch_size, num_nodes, num_features, num_timesteps]
+        edge_index: ignored; the graph is fixed at construction (see set_graph)
+        """
+        out = self.astgcn(x, self._L_hat, self._basis_a, self._basis_b)
+        return F.relu(out) if self.output_relu else out
+
+
+class DenseASTGCN_V1(_DenseStaticGraph):
+    output_relu = False
+
+
+class DenseASTGCN_V1_5(_DenseStaticGraph):
+    output_relu = True
+
+
+class _DenseAdaptiveGraph(nn.Module):
+    """
+    Learned adjacency from node embeddings. As in the sparse models only the
+    sparsity pattern of softmax(relu(E1 @ E2)) reaches the Chebyshev
+    convolution, so once trained the graph is fixed; ``freeze_graph()``
+    caches its Laplacian basis for inference.
+    """
+    emb_dim = None
+
+    def __init__(self, num_nodes, **kwargs):
+        super().__init__()
+        self.astgcn = DenseASTGCN(**kwargs)
+        d = self.emb_dim(num_nodes)
+        self.node_emb1 = nn.Parameter(torch.randn(num_nodes, d))
+        self.node_emb2 = nn.Parameter(torch.randn(d, num_nodes))
+        self._frozen = None
+
+    def _graph(self):
+        A_int = F.relu(self.node_emb1 @ self.node_emb2)
+        A_adp = F.softmax(A_int, dim=1)
+        A = (A_adp != 0).float() * (1 - torch.eye(A_adp.size(0), device=A_adp.device))
+        L_hat = scaled_laplacian(A, self.astgcn.normalization)
+        return (L_hat, *chebyshev_basis(L_hat, self.astgcn.K))
+
+    @torch.no_grad()
+    def freeze_graph(self):
+        self._frozen = tuple(t.detach() for t in self._graph())
+        return self
+
+    def load_state_dict(self, *args, **kwargs):
+        self._frozen = None
+        return super().load_state_dict(*args, **kwargs)
+
+    def forward(self, x, edge_index=None):
+        graph = self._frozen if (self._frozen is not None and not self.training) else self._graph()
+        return F.relu(self.astgcn(x, *graph))
+
+
+class DenseASTGCN_V2(_DenseAdaptiveGraph):
+    emb_dim = staticmethod(lambda n: 10)
+
+
+class DenseWattGraphNet_AAMm(_DenseAdaptiveGraph):
+    emb_dim = staticmethod(lambda n: n * 5)
+
+
+DENSE_EQUIVALENTS = {
+    "ASTGCN_V1": DenseASTGCN_V1,
+    "ASTGCN_V1_5": DenseASTGCN_V1_5,
+    "ASTGCN_V2": DenseASTGCN_V2,
+    "WattGraphNet_AAMm": DenseWattGraphNet_AAMm,
+}
+
+
+def to_dense(model, num_nodes, config, edge_index=None):
+    """Dense copy of a trained sparse wrapper (same weights, eval mode)."""
+    cls = DENSE_EQUIVALENTS[type(model).__name__]
+    kwargs = {"edge_index": edge_index} if issubclass(cls, _DenseStaticGraph) else {}
+    dense = cls(num_nodes=num_nodes, **kwargs, **config)
+    dense.load_state_dict(model.state_dict())
+    dense.eval()
+    if isinstance(dense, _DenseAdaptiveGraph):
+        dense.freeze_graph()
+    return dense
@@ -0,0 +1,291 @@
+"""
+Distil an ASTGCN teacher into a small student for edge gateways.
+
+The students take the same input as the ASTGCN wrappers ([B, N, 1, len_input],
+``edge_index`` ignored) and export to a single-input ONNX graph with no
+graph ops, so they run on plain onnxruntime:
+
+    python -m model.distill --data all_data_timeseries.csv \\
+        --teacher best_model.pt --student gru linear --out-dir edge
+
+The teacher class is inferred from the checkpoint's keys unless
+``--teacher-model`` is given. Teacher forecasts are computed once for every
+window; the student is then trained with the usual ``Trainer`` on a blend of
+the teacher's forecast and the ground truth (``DistillationLoss``), both
+scaled per station with a ``StationStatsStore`` fitted on the train series.
+The exported student is wrapped in ``NormalizedForecaster``, so it still
+takes and returns kW.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader, Dataset
+
+from model.dataset import SeriesWindowDataset
+from model.train import Trainer, fully_connected_edge_index
+from utils.station_stats import StationStatsStore, stats_path_for
+
+
+class LinearStudent(nn.Module):
+    """One shared linear map len_input → pred_len plus a per-station offset."""
+    def __init__(self, num_nodes, len_input=96, pred_len=96):
+        super().__init__()
+        self.proj      = nn.Linear(len_input, pred_len)
+        self.node_bias = nn.Parameter(torch.zeros(num_nodes, pred_len))
+
+    def forward(self, x, edge_index=None):
+        """
+        x: [batch_size, num_nodes, 1, len_input]
+        returns: [batch_size, num_nodes, pred_len]
+        """
+        return torch.relu(self.proj(x[:, :, 0, :]) + self.node_bias)
+
+
+class GRUStudent(nn.Module):
+    """
+    A GRU shared by all stations over the input window (optionally pooled by
+    ``stride`` first), with a station embedding added to the final hidden
+    state before the multi-horizon linear head.
+    """
+    def __init__(self, num_nodes, len_input=96, pred_len=96, hidden=32, stride=4):
+        super().__init__()
+        self.stride   = stride
+        self.gru      = nn.GRU(stride, hidden, batch_first=True)
+        self.node_emb = nn.Parameter(torch.zeros(num_nodes, hidden))
+        self.head     = nn.Linear(hidden, pred_len)
+
+    def forward(self, x, edge_index=None):
+        """
+        x: [batch_size, num_nodes, 1, len_input]
+        returns: [batch_size, num_nodes, pred_len]
+        """
+        B, N, _, T = x.shape
+        seq = x[:, :, 0, T % self.stride:].reshape(B * N, -1, self.stride)   # stride slots per step
+        _, h = self.gru(seq)
+        h = h[-1].reshape(B, N, -1) + self.node_emb
+        return torch.relu(self.head(h))
+
+
+STUDENTS = {"linear": LinearStudent, "gru": GRUStudent}
+
+
+def infer_model_name(state_dict) -> str:
+    """
+    Wrapper class of an ASTGCN checkpoint from its keys: ``node_emb1`` of
+    width 10 is ``ASTGCN_V2``, any other width ``WattGraphNet_AAMm``, none
+    ``ASTGCN_V1`` (``ASTGCN_V1_5`` has the same keys; pass it explicitly).
+    """
+    if "node_emb1" not in state_dict:
+        return "ASTGCN_V1"
+    return "ASTGCN_V2" if state_dict["node_emb1"].shape[1] == 10 else "WattGraphNet_AAMm"
+
+
+def fit_series_stats(series, station_names) -> StationStatsStore:
+    """``StationStatsStore`` of a (T, N) series, one column per station."""
+    store = StationStatsStore()
+    for j, station in enumerate(station_names):
+        store.update(station, np.asarray(series[:, j], dtype=np.float64))
+    return store
+
+
+class DistillationLoss(nn.Module):
+    """
+    ``alpha`` · MSE(student, teacher) + (1 − alpha) · MSE(student, truth).
+    Targets come stacked as [B, N, 2, pred_len] (teacher, truth).
+    """
+    def __init__(self, alpha=0.7):
+        super().__init__()
+        self.alpha = alpha
+        self.mse   = nn.MSELoss()
+
+    def forward(self, preds, targets):
+        return (self.alpha * self.mse(preds, targets[:, :, 0])
+                + (1 - self.alpha) * self.mse(preds, targets[:, :, 1]))
+
+
+class DistillationDataset(Dataset):
+    """Windows of a (T, N) series paired with the teacher's forecast for each."""
+    def __init__(self, series, teacher_preds, len_input, pred_len):
+        self.windows       = SeriesWindowDataset(series, len_input, pred_len)
+        self.teacher_preds = torch.as_tensor(teacher_preds)
+        assert len(self.windows) == len(self.teacher_preds)
+
+    def __len__(self):
+        return len(self.windows)
+
+    def __getitem__(self, i):
+        X, Y = self.windows[i]
+        return X, torch.stack([self.teacher_preds[i], Y], dim=1)
+
+
+@torch.no_grad()
+def teacher_forecasts(teacher, series, len_input, pred_len, edge_index=None, batch_size=512):
+    """Teacher output for every window of ``series``, as a float32 [W, N, pred_len] array."""
+    teacher.eval()
+    loader = DataLoader(SeriesWindowDataset(series, len_input, pred_len), batch_size=batch_size)
+    out = [teacher(Xb.unsqueeze(2), edge_index).numpy() for Xb, _ in loader]
+    if not out:
+        return np.empty((0, np.shape(series)[1], pred_len), dtype=np.float32)
+    return np.concatenate(out, axis=0).astype(np.float32)
+
+
+def distill(teacher, student, train_series, eval_series, len_input=96, pred_len=96,
+            edge_index=None, alpha=0.7, epochs=30, batch_size=512, max_lr=1e-2,
+            checkpoint_path="student.pt", stats=None, station_names=None, method="minmax", log=print):
+    """
+    Train ``student`` on the teacher's forecasts for every train window.
+
+    With ``stats`` (a ``StationStatsStore``) the student learns on per-station
+    scaled inputs and targets, the teacher still sees kW. ``method`` defaults
+    to ``'minmax'`` because the students end in a ReLU.
+
+    Returns
+    -------
+    (nn.Module, Trainer)
+        The student with its best weights, wrapped in ``NormalizedForecaster``
+        when ``stats`` is given (kW in, kW out), and the ``Trainer``.
+    """
+    train_preds = teacher_forecasts(teacher, train_series, len_input, pred_len, edge_index, batch_size)
+    eval_preds  = teacher_forecasts(teacher, eval_series,  len_input, pred_len, edge_index, batch_size)
+    if stats is not None:
+        norm = lambda a: stats.normalize(np.asarray(a, dtype=np.float32), station_names, method, node_axis=1)
+        train_series, eval_series = norm(train_series), norm(eval_series)
+        train_preds,  eval_preds  = norm(train_preds),  norm(eval_preds)
+
+    train_ds = DistillationDataset(train_series, train_preds, len_input, pred_len)
+    eval_ds  = DistillationDataset(eval_series,  eval_preds,  len_input, pred_len)
+    trainer = Trainer(student,
+                      DataLoader(train_ds, batch_size=batch_size, shuffle=True),
+                      DataLoader(eval_ds,  batch_size=batch_size, shuffle=False),
+                      total_epochs=epochs, max_lr=max_lr, device="cpu",
+                      criterion=DistillationLoss(alpha), checkpoint_path=checkpoint_path,
+                      show_progress=False)
+    trainer.fit(patience=5, log=log)
+    if os.path.exists(checkpoint_path):
+        student.load_state_dict(torch.load(checkpoint_path, map_location="cpu"))
+    if stats is not None:
+        from model.model_core_architecture import NormalizedForecaster
+
+        stats.save(stats_path_for(checkpoint_path))
+        student = NormalizedForecaster.from_store(student, stats, station_names, method)
+    return student, trainer
+
+
+def export_student_onnx(student, path, num_nodes, len_input=96):
+    """Single-input ONNX graph (``x`` → ``forecast``) with a dynamic batch axis."""
+    student.eval()
+    torch.onnx.export(
+        student, (torch.zeros(1, num_nodes, 1, len_input),), path,
+        input_names=["x"], output_names=["forecast"],
+        dynamic_axes={"x": {0: "batch"}, "forecast": {0: "batch"}},
+        opset_version=17, dynamo=False,
+    )
+    return path
+
+
+def latency_ms(fn, n_runs=200):
+    fn()                                                     # warm-up
+    times = []
+    for _ in range(n_runs):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times) * 1e3)
+
+
+def tradeoff_report(teacher, students: dict, onnx_paths: dict, eval_series, len_input=96, pred_len=96,
+                    edge_index=None, threads=1) -> pd.DataFrame:
+    """
+    Size / single-forecast latency / accuracy of the teacher and each student.
+
+    Latency is the median of single-sample forecasts on ``threads`` cores
+    (torch for the teacher, onnxruntime for the students); MAE is against
+    the ground truth of ``eval_series`` and against the teacher.
+    """
+    import onnxruntime as ort
+
+    torch.set_num_threads(threads)
+    windows = SeriesWindowDataset(eval_series, len_input, pred_len)
+    X = torch.stack([windows[i][0] for i in range(len(windows))]).unsqueeze(2)
+    Y = torch.stack([windows[i][1] for i in range(len(windows))]).numpy()
+    teacher_out = teacher_forecasts(teacher, eval_series, len_input, pred_len, edge_index)
+    one = X[:1]
+
+    with torch.no_grad():
+        rows = [{
+            "model":      type(teacher).__name__,
+            "params":     sum(p.numel() for p in teacher.parameters()),
+            "size_kb":    sum(p.numel() * p.element_size() for p in teacher.parameters()) / 1024,
+            "latency_ms": latency_ms(lambda: teacher(one, edge_index), n_runs=50),
+            "mae":        float(np.abs(teacher_out - Y).mean()),
+            "mae_vs_teacher": 0.0,
+        }]
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = threads
+    for name, student in students.items():
+        sess = ort.InferenceSession(onnx_paths[name], options, providers=["CPUExecutionProvider"])
+        preds = sess.run(None, {"x": X.numpy()})[0]
+        x_one = one.numpy()
+        rows.append({
+            "model":      name,
+            "params":     sum(p.numel() for p in student.parameters()),
+            "size_kb":    os.path.getsize(onnx_paths[name]) / 1024,
+            "latency_ms": latency_ms(lambda: sess.run(None, {"x": x_one})),
+            "mae":        float(np.abs(preds - Y).mean()),
+            "mae_vs_teacher": float(np.abs(preds - teacher_out).mean()),
+        })
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default="all_data_timeseries.csv", help="long CSV from run_pipeline")
+    parser.add_argument("--teacher", default="best_model.pt")
+    parser.add_argument("--teacher-model", help="teacher class (default: inferred from the checkpoint)")
+    parser.add_argument("--student", choices=sorted(STUDENTS), nargs="+", default=["gru", "linear"])
+    parser.add_argument("--len-input", type=int, default=96)
+    parser.add_argument("--pred-len", type=int, default=96)
+    parser.add_argument("--alpha", type=float, default=0.7)
+    parser.add_argument("--norm-method", choices=StationStatsStore.METHODS, default="minmax",
+                        help="per-station scaling the students are trained in")
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--out-dir", default=".")
+    args = parser.parse_args(argv)
+
+    from model.distributed_train import build_model, load_training_series
+    from model.evaluate import DEFAULT_CONFIG
+
+    train_series, eval_series, station_names = load_training_series(args.data)
+    num_nodes = len(station_names)
+    config = {**DEFAULT_CONFIG, "len_input": args.len_input, "num_for_predict": args.pred_len,
+              "num_of_vertices": num_nodes}
+    state_dict = torch.load(args.teacher, map_location="cpu")
+    teacher = build_model(args.teacher_model or infer_model_name(state_dict), num_nodes, config)
+    teacher.load_state_dict(state_dict)
+    edge_index = fully_connected_edge_index(num_nodes)
+    stats = fit_series_stats(train_series, station_names)
+
+    students, onnx_paths = {}, {}
+    for name in args.student:
+        student, _ = distill(teacher, STUDENTS[name](num_nodes, args.len_input, args.pred_len),
+                             train_series, eval_series, args.len_input, args.pred_len,
+                             edge_index=edge_index, alpha=args.alpha, epochs=args.epochs,
+                             checkpoint_path=os.path.join(args.out_dir, f"student_{name}.pt"),
+                             stats=stats, station_names=station_names, method=args.norm_method)
+        students[name]   = student
+        onnx_paths[name] = export_student_onnx(student, os.path.join(args.out_dir, f"student_{name}.onnx"),
+                                               num_nodes, args.len_input)
+
+    report = tradeoff_report(teacher, students, onnx_paths, eval_series, args.len_input, args.pred_len,
+                             edge_index)
+    print(report.to_string(index=False, float_format=lambda v: f"{v:,.3f}"))
+
+
+if __name__ == "__main__":
+    main()
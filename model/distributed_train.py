@@ -0,0 +1,226 @@
+"""
+Distributed data-parallel CPU training for the ASTGCN models (gloo backend).
+
+Each process trains on its own shard of the sliding windows
+(DistributedSampler), gradients are all-reduced by DDP, eval loss is
+all-reduced so every rank takes the same early-stopping decision, and only
+rank 0 writes ``best_model.pt`` (plain state_dict, loadable without DDP).
+
+Single box, 4 processes:
+    python -m model.distributed_train --data all_data_timeseries.csv --nprocs 4
+
+Several nodes (run on every node):
+    torchrun --nnodes 2 --nproc_per_node 8 --rdzv_backend c10d \\
+        --rdzv_endpoint head-node:29500 -m model.distributed_train --data all_data_timeseries.csv
+"""
+import argparse
+import json
+import os
+import socket
+
+import numpy as np
+import pandas as pd
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from torch.nn.parallel import DistributedDataParallel as DDP
+from torch.utils.data import DataLoader, Subset
+from torch.utils.data.distributed import DistributedSampler
+
+from model.dataset import SeriesWindowDataset, pivot_to_series
+from model.train import Trainer, fully_connected_edge_index
+
+EXCLUDED_STATIONS = ['Data_อาคารวิทยนิเวศน์']
+
+# Learned-adjacency parameters that only shape the sparsity pattern of the
+# attention (ASTGCN_V2, WattGraphNet_AAMm) and never receive a gradient.
+NO_GRAD_PARAMETERS = ("node_emb1", "node_emb2")
+
+
+def has_no_grad_parameters(model) -> bool:
+    """True if ``model`` (or a wrapped inner model) holds ``NO_GRAD_PARAMETERS``."""
+    return any(name.rsplit(".", 1)[-1] in NO_GRAD_PARAMETERS for name, _ in model.named_parameters())
+
+
+def setup_distributed(backend: str = "gloo") -> tuple[int, int]:
+    """Initialise the default process group from torchrun-style env vars."""
+    if not dist.is_initialized():
+        dist.init_process_group(backend=backend)
+    return dist.get_rank(), dist.get_world_size()
+
+
+def cleanup_distributed():
+    if dist.is_initialized():
+        dist.destroy_process_group()
+
+
+class DistributedTrainer(Trainer):
+    """
+    ``Trainer`` over a DDP-wrapped model with sharded train/eval loaders.
+
+    Only rank 0 logs and checkpoints. Each rank scores a contiguous,
+    unpadded slice of the eval windows and the (loss sum, count) pairs are
+    all-reduced, so the eval loss behind early stopping and checkpointing
+    counts every window exactly once. ``find_unused_parameters`` defaults to
+    on for models with ``NO_GRAD_PARAMETERS``, otherwise DDP fails at the
+    second step with "Parameter indices which did not receive grad".
+    """
+
+    def __init__(self, model, train_dataset, eval_dataset, batch_size=512,
+                 find_unused_parameters=None, **kwargs):
+        self.rank       = dist.get_rank()
+        self.world_size = dist.get_world_size()
+        self.train_sampler = DistributedSampler(train_dataset, shuffle=True)
+        eval_shard   = np.array_split(np.arange(len(eval_dataset)), self.world_size)[self.rank]
+        train_loader = DataLoader(train_dataset, batch_size=batch_size, sampler=self.train_sampler)
+        eval_loader  = DataLoader(Subset(eval_dataset, eval_shard.tolist()), batch_size=batch_size)
+        kwargs.setdefault("device", "cpu")
+        kwargs["show_progress"] = kwargs.get("show_progress", True) and self.rank == 0
+        if find_unused_parameters is None:
+            find_unused_parameters = has_no_grad_parameters(model)
+        super().__init__(DDP(model, find_unused_parameters=find_unused_parameters),
+                         train_loader, eval_loader, **kwargs)
+
+    def train_epoch(self) -> float:
+        self.train_sampler.set_epoch(self.epoch)
+        local = super().train_epoch()
+        return self._all_reduce_mean(local, len(self.train_sampler))
+
+    @torch.no_grad()
+    def evaluate(self, loader=None) -> float:
+        # the unwrapped module: ranks may run a different number of eval batches
+        total, n = self.evaluate_sums(loader, self.model.module)
+        t = torch.tensor([total, float(n)], dtype=torch.float64)
+        dist.all_reduce(t, op=dist.ReduceOp.SUM)
+        return (t[0] / t[1].clamp(min=1)).item()
+
+    def _all_reduce_mean(self, local_mean: float, local_n: int) -> float:
+        t = torch.tensor([local_mean * local_n, float(local_n)], dtype=torch.float64)
+        dist.all_reduce(t, op=dist.ReduceOp.SUM)
+        return (t[0] / t[1].clamp(min=1)).item()
+
+    def save_checkpoint(self):
+        if self.rank == 0:
+            torch.save(self.model.module.state_dict(), self.checkpoint_path)
+
+    def fit(self, num_epochs=None, patience=5, log=print) -> dict:
+        return super().fit(num_epochs, patience, log=log if self.rank == 0 else None)
+
+
+def load_training_series(data_path, excluded=EXCLUDED_STATIONS):
+    """Load the long CSV and build (train, eval) series exactly as the notebooks do."""
+    from utils.split_train_test_data import split_threeway
+
+    long_df = pd.read_csv(data_path, parse_dates=['Date'])
+    long_df = long_df[~long_df['station_name'].isin(excluded)]
+    long_df.loc[long_df['Electricity(kW)'] < 0, 'Electricity(kW)'] = 0
+    train_df, eval_df, _ = split_threeway(long_df, train_frac=0.7, eval_frac=0.1)
+    station_names = sorted(long_df['station_name'].unique())
+    return (pivot_to_series(train_df, station_names),
+            pivot_to_series(eval_df, station_names),
+            station_names)
+
+
+def build_model(model_name, num_nodes, config):
+    from model.hparam_search import get_model_class
+    return get_model_class(model_name)(num_nodes=num_nodes, **config)
+
+
+def run_worker(args):
+    rank, world_size = setup_distributed(args.backend)
+    local_world = int(os.environ.get("LOCAL_WORLD_SIZE", world_size))
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // local_world))
+    torch.manual_seed(args.seed)                     # identical init on every rank
+
+    try:
+        train_series, eval_series, station_names = load_training_series(args.data)
+        num_nodes = len(station_names)
+
+        config = {
+            "nb_block": 2,
+            "in_channels": 1,
+            "K": 2,
+            "nb_chev_filter": 64,
+            "nb_time_filter": 64,
+            "time_strides": 1,
+            "num_for_predict": args.pred_len,
+            "len_input": args.len_input,
+            "num_of_vertices": num_nodes,
+            "normalization": "sym",
+            "bias": True,
+        }
+        model_name, max_lr = args.model, args.max_lr
+        if args.config:
+            with open(args.config, encoding="utf-8") as f:
+                saved = json.load(f)                 # e.g. hparam_search best_config.json
+            config.update(saved.get("config", saved))
+            config["num_of_vertices"] = num_nodes
+            model_name = saved.get("model_name", model_name)
+            max_lr     = saved.get("max_lr", max_lr)
+
+        train_ds = SeriesWindowDataset(train_series, config["len_input"], config["num_for_predict"])
+        eval_ds  = SeriesWindowDataset(eval_series,  config["len_input"], config["num_for_predict"])
+
+        trainer = DistributedTrainer(
+            build_model(model_name, num_nodes, config), train_ds, eval_ds,
+            batch_size=args.batch_size,
+            edge_index=fully_connected_edge_index(num_nodes),
+            total_epochs=args.epochs, max_lr=max_lr,
+            checkpoint_path=args.checkpoint,
+        )
+        trainer.fit(patience=args.patience)
+        if rank == 0:
+            print(f"Best eval loss {trainer.best_eval_loss:.4f} → {args.checkpoint} "
+                  f"({world_size} processes)")
+    finally:
+        cleanup_distributed()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _spawn_entry(local_rank, args, nprocs):
+    os.environ.update({"RANK": str(local_rank), "LOCAL_RANK": str(local_rank),
+                       "WORLD_SIZE": str(nprocs), "LOCAL_WORLD_SIZE": str(nprocs)})
+    run_worker(args)
+
+
+def launch_local(args, nprocs: int):
+    """Run ``nprocs`` ranks on this machine without torchrun."""
+    os.environ.setdefault("MASTER_ADDR", "127.0.0.1")
+    os.environ.setdefault("MASTER_PORT", str(_free_port()))
+    mp.spawn(_spawn_entry, args=(args, nprocs), nprocs=nprocs, join=True)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default="all_data_timeseries.csv", help="long CSV from run_pipeline")
+    parser.add_argument("--model", default="ASTGCN_V1")
+    parser.add_argument("--config", help="JSON with a model config (e.g. hparam_search best_config.json)")
+    parser.add_argument("--len-input", type=int, default=96)
+    parser.add_argument("--pred-len", type=int, default=96)
+    parser.add_argument("--epochs", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=512, help="per-process batch size")
+    parser.add_argument("--max-lr", type=float, default=3e-2)
+    parser.add_argument("--patience", type=int, default=5)
+    parser.add_argument("--checkpoint", default="best_model.pt")
+    parser.add_argument("--backend", default="gloo")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--nprocs", type=int, default=1,
+                        help="spawn this many local ranks (ignored under torchrun)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if "RANK" in os.environ:                          # launched by torchrun
+        run_worker(args)
+    else:
+        launch_local(args, args.nprocs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""
+One-command comparison of every forecaster on the same test range.
+
+The shared inputs (the 15-minute station grid and the forecast origins) are
+built once and written to ``<out>/series.npy`` (gaps filled with 0, as in
+training) and ``<out>/actual.npy`` (gaps kept as NaN); each model then runs
+in its own worker process over all origins in batches, reading its grid with
+``mmap_mode='r'``. Predictions are aligned on (Date, station_name, lead) in
+one table and scored with ``utils.error_analyzer.compute_station_metrics``.
+
+    python -m model.evaluate --data all_data_timeseries.csv \\
+        --test-start 2025-01-01 --test-end 2025-02-01 --models eval_models.json
+
+``eval_models.json`` lists the models to compare:
+
+    [{"name": "astgcn",     "kind": "torch", "model_name": "ASTGCN_V1", "checkpoint": "best_model.pt"},
+     {"name": "astgcn_onnx", "kind": "onnx", "path": "model/astgcnv2_50epoch.onnx"},
+     {"name": "ag_ctx12",   "kind": "autogluon", "path": "ag_models_ctx12_pred12"},
+     {"name": "ag_ctx2",    "kind": "autogluon", "path": "ag_models_ctx2_pred12", "context": 2},
+     {"name": "analog",     "kind": "analog", "k": 5}]
+
+Origin ``t`` means "forecast slots t .. t+horizon-1 from everything before
+t"; with ``horizon=1`` this is the first-step evaluation of
+``error_analysis.ipynb``. ``kind`` may also be ``"package.module:function"``
+for a custom runner with the same signature as the built-in ones. A spec may
+set ``"input": "actual"`` or ``"series"`` to choose the grid its runner gets;
+the analog runner defaults to ``actual`` so meter outages are not matched as
+all-zero days.
+"""
+import argparse
+import importlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+from model.analog import run_analog
+
+DEFAULT_CONFIG = {
+    "nb_block": 2,
+    "in_channels": 1,
+    "K": 2,
+    "nb_chev_filter": 64,
+    "nb_time_filter": 64,
+    "time_strides": 1,
+    "num_for_predict": 96,
+    "len_input": 96,
+    "normalization": "sym",
+    "bias": True,
+}
+
+
+def build_features(long_df: pd.DataFrame, station_names: list[str], test_start, test_end=None,
+                   context: int = 96, horizon: int = 1):
+    """
+    Pivot the long frame once onto a regular 15-minute grid.
+
+    Returns
+    -------
+    series : np.ndarray
+        (T, N) float32 inputs, missing slots filled with 0 as in training.
+    actual : np.ndarray
+        (T, N) float32 actuals with NaN where the raw data has no reading.
+    dates : pd.DatetimeIndex
+        Timestamp of every grid row.
+    origins : np.ndarray
+        Grid rows inside ``[test_start, test_end)`` that have ``context``
+        slots of history and ``horizon`` slots of future.
+    """
+    pv = long_df.pivot_table(index='Date', columns='station_name', values='Electricity(kW)', aggfunc='mean')
+    dates = pd.date_range(pv.index.min(), pv.index.max(), freq='15min')
+    pv = pv.reindex(index=dates, columns=station_names)
+    actual = pv.to_numpy(dtype=np.float32)
+    series = np.nan_to_num(actual, nan=0.0)
+
+    idx = np.arange(len(dates))
+    keep = (dates >= pd.Timestamp(test_start)) & (idx >= context) & (idx + horizon <= len(dates))
+    if test_end is not None:
+        keep &= dates < pd.Timestamp(test_end)
+    return series, actual, dates, idx[keep]
+
+
+def gather_windows(series, origins: np.ndarray, length: int) -> np.ndarray:
+    """The ``length`` slots before each origin, as [B, N, length]."""
+    idx = origins[:, None] + np.arange(-length, 0)[None, :]
+    return np.ascontiguousarray(np.asarray(series)[idx].transpose(0, 2, 1), dtype=np.float32)
+
+
+# ---- runners -------------------------------------------------------------
+# runner(spec, series, origins, dates, horizon) -> [len(origins), N, horizon]
+# ``series`` is the grid named by RUNNER_INPUTS / spec["input"] (default "series").
+
+def model_config(spec: dict, num_nodes: int) -> dict:
+    config = dict(DEFAULT_CONFIG)
+    if spec.get("config_path"):
+        with open(spec["config_path"], encoding="utf-8") as f:
+            saved = json.load(f)                 # e.g. hparam_search best_config.json
+        config.update(saved.get("config", saved))
+    config.update(spec.get("config", {}))
+    config["num_of_vertices"] = num_nodes
+    return config
+
+
+def run_torch(spec, series, origins, dates, horizon):
+    import torch
+    from model.hparam_search import get_model_class
+    from model.train import fully_connected_edge_index
+
+    num_nodes = series.shape[1]
+    config = model_config(spec, num_nodes)
+    model = get_model_class(spec.get("model_name", "ASTGCN_V1"))(num_nodes=num_nodes, **config)
+    model.load_state_dict(torch.load(spec["checkpoint"], map_location="cpu"))
+    model.eval()
+    edge_index = fully_connected_edge_index(num_nodes)
+
+    out = []
+    batch_size = spec.get("batch_size", 512)
+    with torch.no_grad():
+        for s in range(0, len(origins), batch_size):
+            X = gather_windows(series, origins[s:s + batch_size], config["len_input"])
+            out.append(model(torch.from_numpy(X).unsqueeze(2), edge_index)[..., :horizon].numpy())
+    return np.concatenate(out, axis=0)
+
+
+def run_onnx(spec, series, origins, dates, horizon):
+    import onnxruntime as ort
+    from model.train import fully_connected_edge_index
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = spec.get("threads", 0)
+    sess = ort.InferenceSession(spec["path"], options, providers=["CPUExecutionProvider"])
+    inputs = sess.get_inputs()
+    len_input = spec.get("len_input") or inputs[0].shape[-1]
+    if not isinstance(len_input, int):
+        len_input = DEFAULT_CONFIG["len_input"]
+    feed_edges = {}
+    if len(inputs) == 2:                          # graph expects [X, edge_index]
+        feed_edges[inputs[1].name] = fully_connected_edge_index(series.shape[1]).numpy()
+
+    out = []
+    batch_size = spec.get("batch_size", 512)
+    for s in range(0, len(origins), batch_size):
+        X = gather_windows(series, origins[s:s + batch_size], len_input)[:, :, None, :]
+        out.append(sess.run(None, {inputs[0].name: X, **feed_edges})[0][..., :horizon])
+    return np.concatenate(out, axis=0)
+
+
+def run_autogluon(spec, series, origins, dates, horizon):
+    """
+    Every (origin, station) pair becomes one AutoGluon item holding the last
+    ``context`` slots, so all origins are forecast in a few ``predict`` calls.
+    """
+    from autogluon.timeseries import TimeSeriesDataFrame, TimeSeriesPredictor
+
+    predictor = TimeSeriesPredictor.load(spec["path"])
+    if horizon > predictor.prediction_length:
+        raise ValueError(f"horizon {horizon} > prediction_length {predictor.prediction_length}")
+    context = spec.get("context", DEFAULT_CONFIG["len_input"])
+    num_nodes = series.shape[1]
+    dates = pd.DatetimeIndex(dates)
+
+    out = []
+    batch_size = spec.get("batch_size", 256)
+    for s in range(0, len(origins), batch_size):
+        org = origins[s:s + batch_size]
+        X   = gather_windows(series, org, context)                     # [B, N, context]
+        ids = np.array([f"{b:07d}_{n:03d}" for b in range(len(org)) for n in range(num_nodes)])
+        ts_idx = org[:, None] + np.arange(-context, 0)[None, :]          # [B, context]
+        frame = pd.DataFrame({
+            "item_id":   np.repeat(ids, context),
+            "timestamp": dates[np.repeat(ts_idx, num_nodes, axis=0).ravel()],
+            predictor.target: X.reshape(-1),
+        })
+        pred = predictor.predict(TimeSeriesDataFrame.from_data_frame(frame), model=spec.get("model"))
+        mean = pred["mean"].reset_index()
+        mean["step"] = mean.groupby("item_id").cumcount()
+        arr = mean.pivot(index="item_id", columns="step", values="mean").loc[ids].to_numpy()
+        out.append(arr[:, :horizon].reshape(len(org), num_nodes, horizon).astype(np.float32))
+    return np.concatenate(out, axis=0)
+
+
+RUNNERS = {"torch": run_torch, "onnx": run_onnx, "autogluon": run_autogluon, "analog": run_analog}
+RUNNER_INPUTS = {"analog": "actual"}          # needs the NaN gaps to skip outage days
+
+
+def get_runner(kind: str):
+    if kind in RUNNERS:
+        return RUNNERS[kind]
+    if ":" in kind:
+        module, func = kind.split(":", 1)
+        return getattr(importlib.import_module(module), func)
+    raise ValueError(f"Unknown model kind: {kind}")
+
+
+def _run_model(job: dict) -> dict:
+    """Worker: run one model over all origins and save its predictions as .npy."""
+    import torch
+    torch.set_num_threads(job["threads"])
+    t0 = time.perf_counter()
+    spec = {"threads": job["threads"], **job["spec"]}
+    try:
+        grid    = spec.get("input", RUNNER_INPUTS.get(spec["kind"], "series"))
+        if grid not in ("series", "actual"):
+            raise ValueError(f"Unknown input grid: {grid}")
+        series  = np.load(job[f"{grid}_path"], mmap_mode="r")
+        origins = np.load(job["origins_path"])
+        dates   = pd.DatetimeIndex(np.load(job["dates_path"]))
+        preds   = get_runner(spec["kind"])(spec, series, origins, dates, job["horizon"])
+        np.save(job["preds_path"], np.asarray(preds, dtype=np.float32))
+        status = "ok"
+    except Exception as e:                        # one broken model must not sink the comparison
+        status = f"error: {type(e).__name__}: {e}"
+    return {"name": spec["name"], "status": status, "seconds": time.perf_counter() - t0,
+            "preds_path": job["preds_path"]}
+
+
+def evaluate_models(
+    long_df: pd.DataFrame,
+    models: list[dict],
+    test_start,
+    test_end=None,
+    horizon: int = 1,
+    station_names: list[str] | None = None,
+    n_workers: int | None = None,
+    out_dir: str = "eval_results",
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Run every model in ``models`` on the same origins and score them.
+
+    Parameters
+    ----------
+    long_df : pd.DataFrame
+        Preprocessed long frame (station_name, Date, Electricity(kW)).
+    models : list[dict]
+        Model specs, each with a unique ``name`` and a ``kind``
+        (``torch`` / ``onnx`` / ``autogluon`` / ``analog`` / ``module:function``).
+    test_start, test_end :
+        Forecast origins are the grid slots in ``[test_start, test_end)``.
+    horizon : int
+        Forecast steps scored per origin.
+    n_workers : int, optional
+        Worker processes (default: one per model, capped at the core count).
+
+    Returns
+    -------
+    predictions : pd.DataFrame
+        station_name, Date, lead, Electricity(kW) and one prediction column
+        per model; written to ``<out_dir>/predictions.csv``.
+    metrics : pd.DataFrame
+        ``compute_station_metrics`` rows of every model stacked with a
+        ``model`` column (plus status and runtime); ``<out_dir>/metrics.csv``.
+    """
+    from utils.build_station_weight import build_station_weights
+    from utils.error_analyzer import compute_station_metrics
+
+    station_names = station_names or sorted(long_df['station_name'].unique())
+    context = max(
+        [m.get("context") or model_config(m, len(station_names))["len_input"] for m in models]
+    )
+
+    # 1) Shared features, built once
+    series, actual, dates, origins = build_features(long_df, station_names, test_start, test_end,
+                                                    context=context, horizon=horizon)
+    if len(origins) == 0:
+        raise ValueError("No forecast origins in the test range")
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {k: os.path.join(out_dir, f"{k}.npy") for k in ("series", "actual", "origins", "dates")}
+    np.save(paths["series"], series)
+    np.save(paths["actual"], actual)
+    np.save(paths["origins"], origins)
+    np.save(paths["dates"], dates.values)
+
+    # 2) Models in parallel workers
+    n_workers = min(n_workers or len(models), os.cpu_count() or 1, len(models))
+    threads   = max(1, (os.cpu_count() or 1) // n_workers)
+    jobs = [{"spec": m, "horizon": horizon, "threads": threads,
+             "series_path": paths["series"], "actual_path": paths["actual"],
+             "origins_path": paths["origins"],
+             "dates_path": paths["dates"],
+             "preds_path": os.path.join(out_dir, f"preds_{m['name']}.npy")} for m in models]
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=get_context("spawn")) as pool:
+        runs = list(pool.map(_run_model, jobs))
+
+    # 3) One aligned table: rows ordered by (origin, lead, station)
+    W, N = len(origins), len(station_names)
+    target = origins[:, None] + np.arange(horizon)[None, :]                  # [W, H]
+    predictions = pd.DataFrame({
+        'station_name':    np.tile(station_names, W * horizon),
+        'Date':            dates[np.repeat(target.ravel(), N)],
+        'lead':            np.tile(np.repeat(np.arange(1, horizon + 1), N), W),
+        'Electricity(kW)': actual[target].reshape(-1),
+    })
+    for run in runs:
+        if run["status"] == "ok":
+            preds = np.load(run["preds_path"])                               # [W, N, H]
+            predictions[run["name"]] = preds.transpose(0, 2, 1).reshape(-1)
+
+    # 4) Metrics via error_analyzer, stacked per model
+    station_weights_df = build_station_weights(long_df)
+    scored = predictions.dropna(subset=['Electricity(kW)'])
+    tables = []
+    for run in runs:
+        if run["status"] == "ok":
+            df_eval = scored[['station_name', 'Date', 'Electricity(kW)']].assign(
+                **{'Predicted(kW)': scored[run["name"]]})
+            m = compute_station_metrics(df_eval, station_weights_df)
+        else:
+            m = pd.DataFrame({'station_name': ['all_station']})
+        m.insert(0, 'model', run["name"])
+        m['status']  = run["status"]
+        m['seconds'] = run["seconds"]
+        tables.append(m)
+    metrics = pd.concat(tables, ignore_index=True)
+
+    predictions.to_csv(os.path.join(out_dir, "predictions.csv"), index=False)
+    metrics.to_csv(os.path.join(out_dir, "metrics.csv"), index=False)
+    return predictions, metrics
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default="all_data_timeseries.csv", help="long CSV from run_pipeline")
+    parser.add_argument("--models", required=True, help="JSON list of model specs")
+    parser.add_argument("--test-start", required=True)
+    parser.add_argument("--test-end")
+    parser.add_argument("--horizon", type=int, default=1)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--out", default="eval_results")
+    args = parser.parse_args(argv)
+
+    from model.distributed_train import EXCLUDED_STATIONS
+
+    long_df = pd.read_csv(args.data, parse_dates=['Date'])
+    long_df = long_df[~long_df['station_name'].isin(EXCLUDED_STATIONS)]
+    long_df.loc[long_df['Electricity(kW)'] < 0, 'Electricity(kW)'] = 0
+    with open(args.models, encoding="utf-8") as f:
+        models = json.load(f)
+
+    _, metrics = evaluate_models(long_df, models, args.test_start, args.test_end,
+                                 horizon=args.horizon, n_workers=args.workers, out_dir=args.out)
+    print(metrics[metrics['station_name'] == 'all_station'].to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Warm-start fine-tuning of a trained checkpoint on newly ingested months.
+
+Instead of retraining from scratch, the current checkpoint is trained for a
+few epochs (short OneCycle schedule, low peak LR) on
+
+- every window whose target reaches into the new data (``new_start`` on), and
+- a bounded random replay sample of older windows, so the model does not
+  forget the rest of the year,
+
+while the new period is cut chronologically into training, a validation
+slice (``val_frac`` of what precedes the hold-out) that picks the best epoch,
+and the last ``eval_frac`` as the gate hold-out, which only the before/after
+comparison sees. Both the current and the fine-tuned model are scored on
+that hold-out with ``compute_station_metrics``; the new weights replace the
+checkpoint only if none of the ``all_station`` metrics got worse (the old
+file is kept as ``<checkpoint>.prev``). A JSON report is written next to the
+checkpoint.
+
+    python -m model.finetune --data all_data_timeseries.csv --checkpoint best_model.pt \\
+        --model ASTGCN_V1 --new-start 2025-01-01
+"""
+import argparse
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import torch
+from torch.utils.data import DataLoader, Subset
+
+from model.dataset import SeriesWindowDataset
+from model.evaluate import build_features, model_config
+from model.train import Trainer, fully_connected_edge_index
+
+
+def split_windows_by_date(n_windows, dates, len_input, pred_len, new_start, eval_frac=0.25, val_frac=0.0):
+    """
+    Indices of (old, new train, validation, eval) windows of a ``SeriesWindowDataset``.
+
+    Window ``i`` covers inputs ``i .. i+len_input-1`` and targets up to
+    ``i+len_input+pred_len-1``. Eval windows have their whole target in the
+    last ``eval_frac`` of the new period, validation windows theirs in the
+    last ``val_frac`` of the part before it; new train windows end before both.
+    """
+    new_idx  = int(np.searchsorted(dates, pd.Timestamp(new_start)))
+    eval_idx = new_idx + int((len(dates) - new_idx) * (1 - eval_frac))
+    val_idx  = new_idx + int((eval_idx - new_idx) * (1 - val_frac))
+    i        = np.arange(n_windows)
+    target_start = i + len_input
+    target_end   = i + len_input + pred_len - 1
+    old      = i[target_end < new_idx]
+    new      = i[(target_end >= new_idx) & (target_end < val_idx)]
+    val      = i[(target_start >= val_idx) & (target_end < eval_idx)]
+    held_out = i[target_start >= eval_idx]
+    return old, new, val, held_out
+
+
+@torch.no_grad()
+def holdout_metrics(model, dataset, indices, dates, actual, station_names, station_weights_df,
+                    edge_index=None, batch_size=512):
+    """``compute_station_metrics`` of ``model`` over every horizon of the held-out windows."""
+    from utils.error_analyzer import compute_station_metrics
+
+    model.eval()
+    preds = []
+    loader = DataLoader(Subset(dataset, indices), batch_size=batch_size, shuffle=False)
+    for Xb, _ in loader:
+        preds.append(model(Xb.unsqueeze(2), edge_index).numpy())
+    preds = np.concatenate(preds, axis=0)                                # [W, N, P]
+
+    W, N, P = preds.shape
+    target = indices[:, None] + dataset.len_input + np.arange(P)[None, :]    # [W, P]
+    df_eval = pd.DataFrame({
+        'station_name':    np.tile(station_names, W * P),
+        'Date':            dates[np.repeat(target.ravel(), N)],
+        'Electricity(kW)': actual[target].reshape(-1),
+        'Predicted(kW)':   preds.transpose(0, 2, 1).reshape(-1),
+    }).dropna(subset=['Electricity(kW)'])
+    return compute_station_metrics(df_eval, station_weights_df)
+
+
+def finetune_checkpoint(
+    long_df: pd.DataFrame,
+    checkpoint_path: str,
+    new_start,
+    model_name: str = "ASTGCN_V1",
+    config: dict | None = None,
+    station_names: list[str] | None = None,
+    epochs: int = 3,
+    max_lr: float = 3e-3,
+    replay_size: int = 2048,
+    eval_frac: float = 0.25,
+    val_frac: float = 0.2,
+    batch_size: int = 256,
+    tolerance: float = 0.0,
+    metrics: tuple[str, ...] = ("MAE", "RMSE", "WAPE"),
+    seed: int = 0,
+    log=print,
+) -> dict:
+    """
+    Fine-tune ``checkpoint_path`` on data from ``new_start`` on and promote
+    it if the hold-out metrics do not regress.
+
+    Parameters
+    ----------
+    long_df : pd.DataFrame
+        Full preprocessed long frame, including the new months.
+    new_start : str or Timestamp
+        First timestamp of the newly ingested data.
+    config : dict, optional
+        Model config (as in the notebooks / ``best_config.json``).
+    replay_size : int
+        Upper bound on old windows mixed into the fine-tuning set.
+    eval_frac, val_frac : float
+        Share of the new period kept for the gate hold-out, and share of the
+        rest used as the validation slice for choosing the epoch.
+    tolerance : float
+        Relative slack: promote if new <= old * (1 + tolerance) for every metric.
+
+    Returns
+    -------
+    dict
+        Old / new ``all_station`` metrics, window counts and ``promoted``.
+    """
+    from model.distributed_train import build_model
+    from utils.build_station_weight import build_station_weights
+
+    torch.manual_seed(seed)
+    rng = np.random.default_rng(seed)
+    station_names = station_names or sorted(long_df['station_name'].unique())
+    num_nodes = len(station_names)
+    config = model_config({"config": config or {}}, num_nodes)
+    len_input, pred_len = config["len_input"], config["num_for_predict"]
+
+    # 1) Windows: new, replay sample of old, then validation slice and gate hold-out
+    series, actual, dates, _ = build_features(long_df, station_names, new_start)
+    dataset = SeriesWindowDataset(series, len_input, pred_len)
+    old, new, val, held_out = split_windows_by_date(len(dataset), dates, len_input, pred_len, new_start,
+                                                    eval_frac, val_frac)
+    if len(new) == 0 or len(val) == 0 or len(held_out) == 0:
+        raise ValueError("Not enough new data after new_start for training, validation and hold-out windows")
+    replay = rng.choice(old, size=min(replay_size, len(old)), replace=False) if len(old) else old
+    train_idx = np.concatenate([new, replay])
+
+    # 2) Current model and its hold-out score
+    edge_index = fully_connected_edge_index(num_nodes)
+    model = build_model(model_name, num_nodes, config)
+    model.load_state_dict(torch.load(checkpoint_path, map_location="cpu"))
+    weights_df = build_station_weights(long_df)
+    before = holdout_metrics(model, dataset, held_out, dates, actual, station_names, weights_df, edge_index)
+
+    # 3) Short warm-start run; best epoch by validation loss goes to a candidate file
+    candidate_path = checkpoint_path + ".candidate"
+    trainer = Trainer(model,
+                      DataLoader(Subset(dataset, train_idx), batch_size=batch_size, shuffle=True),
+                      DataLoader(Subset(dataset, val),       batch_size=batch_size, shuffle=False),
+                      edge_index=edge_index, total_epochs=epochs, max_lr=max_lr, device="cpu",
+                      checkpoint_path=candidate_path, show_progress=False)
+    trainer.fit(patience=None, log=log)
+    if os.path.exists(candidate_path):
+        model.load_state_dict(torch.load(candidate_path, map_location="cpu"))
+    after = holdout_metrics(model, dataset, held_out, dates, actual, station_names, weights_df, edge_index)
+
+    # 4) Promote only if no all-station metric regressed
+    old_all = before.set_index('station_name').loc['all_station', list(metrics)].astype(float)
+    new_all = after.set_index('station_name').loc['all_station', list(metrics)].astype(float)
+    promoted = bool(os.path.exists(candidate_path) and (new_all <= old_all * (1 + tolerance)).all())
+    if promoted:
+        shutil.copyfile(checkpoint_path, checkpoint_path + ".prev")
+        os.replace(candidate_path, checkpoint_path)
+    elif os.path.exists(candidate_path):
+        os.remove(candidate_path)
+
+    report = {
+        "checkpoint":    checkpoint_path,
+        "model_name":    model_name,
+        "new_start":     str(pd.Timestamp(new_start)),
+        "new_windows":   int(len(new)),
+        "replay_windows": int(len(replay)),
+        "validation_windows": int(len(val)),
+        "holdout_windows": int(len(held_out)),
+        "epochs":        trainer.epoch,
+        "before":        old_all.to_dict(),
+        "after":         new_all.to_dict(),
+        "promoted":      promoted,
+    }
+    with open(checkpoint_path + ".finetune.json", "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    if log:
+        verdict = "promoted" if promoted else "kept previous checkpoint"
+        log(f"{verdict}: " + ", ".join(f"{m} {old_all[m]:.4f} → {new_all[m]:.4f}" for m in metrics))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default="all_data_timeseries.csv", help="long CSV from run_pipeline")
+    parser.add_argument("--checkpoint", default="best_model.pt")
+    parser.add_argument("--model", default="ASTGCN_V1")
+    parser.add_argument("--config", help="JSON with a model config (e.g. hparam_search best_config.json)")
+    parser.add_argument("--new-start", required=True, help="first timestamp of the new data")
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--max-lr", type=float, default=3e-3)
+    parser.add_argument("--replay-size", type=int, default=2048)
+    parser.add_argument("--eval-frac", type=float, default=0.25)
+    parser.add_argument("--val-frac", type=float, default=0.2)
+    parser.add_argument("--tolerance", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    from model.distributed_train import EXCLUDED_STATIONS
+
+    long_df = pd.read_csv(args.data, parse_dates=['Date'])
+    long_df = long_df[~long_df['station_name'].isin(EXCLUDED_STATIONS)]
+    long_df.loc[long_df['Electricity(kW)'] < 0, 'Electricity(kW)'] = 0
+
+    config, model_name = None, args.model
+    if args.config:
+        with open(args.config, encoding="utf-8") as f:
+            saved = json.load(f)
+        config     = saved.get("config", saved)
+        model_name = saved.get("model_name", model_name)
+
+    finetune_checkpoint(long_df, args.checkpoint, args.new_start, model_name=model_name, config=config,
+                        epochs=args.epochs, max_lr=args.max_lr, replay_size=args.replay_size,
+                        eval_frac=args.eval_frac, val_frac=args.val_frac, tolerance=args.tolerance)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Content-addressed on-disk cache of model forecasts.
+
+Predictions are keyed by (weights hash, config, station order, graph) → one
+directory per model, and by a digest of each input window inside it. Each
+``put`` writes one shard: a ``.keys.npy`` column of 16-byte window digests
+and a ``.preds.npy`` float32 block of shape (n, N, pred_len), read back with
+``mmap_mode='r'``. When the cache grows past ``max_bytes`` the least
+recently used shards are deleted.
+
+    cache = ForecastCache("forecast_cache", max_bytes=2 * 2**30)
+    preds = cache.predict(model, X_all, edge_index, config=config, station_names=station_names)
+    # second call with the same checkpoint and windows never touches the model
+"""
+import glob
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import torch
+
+DIGEST_SIZE = 16
+
+
+def hash_state_dict(state_dict) -> str:
+    h = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    for name in sorted(state_dict):
+        t = state_dict[name]
+        h.update(name.encode())
+        if isinstance(t, torch.Tensor):
+            h.update(str(t.dtype).encode())
+            h.update(t.detach().cpu().contiguous().numpy().tobytes())
+    return h.hexdigest()
+
+
+def _update_tensor(h, t) -> None:
+    if t is None:
+        h.update(b"none")
+        return
+    arr = t.detach().cpu().contiguous().numpy() if isinstance(t, torch.Tensor) else np.ascontiguousarray(t)
+    h.update(f"{arr.dtype}{arr.shape}".encode())
+    h.update(arr.tobytes())
+
+
+def model_key(model, config: dict | None = None, station_names: list[str] | None = None,
+              edge_index=None, edge_weight=None) -> str:
+    """
+    Key of a (weights, model class, config, station order, graph) combination.
+
+    ``edge_index`` and ``edge_weight`` (e.g. from ``build_geo_graph``) and
+    every buffer of ``model``, persistent or not, are hashed by value, so a
+    changed graph never serves forecasts made on the old one.
+    """
+    h = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    h.update(type(model).__name__.encode())
+    h.update(hash_state_dict(model.state_dict()).encode())
+    # non-persistent buffers too: the dense static-graph models keep their
+    # graph (_L_hat, Chebyshev basis) only there and ignore edge_index
+    h.update(hash_state_dict(dict(model.named_buffers())).encode())
+    h.update(json.dumps(config or {}, sort_keys=True, default=str).encode())
+    h.update(json.dumps(list(station_names or []), ensure_ascii=False).encode())
+    _update_tensor(h, edge_index)
+    _update_tensor(h, edge_weight)
+    return h.hexdigest()
+
+
+def window_digests(X) -> np.ndarray:
+    """
+    One 16-byte digest per input window (first axis), as an 'S16' array.
+
+    One ``blake2b`` call per window, i.e. O(W) Python calls (~4 µs per
+    96-slot, 5-station window); ``ForecastCache.get`` does one dict lookup
+    per window as well. Cheap next to running the model, but it is the
+    whole cost of an all-hit lookup.
+    """
+    arr = X.detach().cpu().numpy() if isinstance(X, torch.Tensor) else np.asarray(X)
+    arr = np.ascontiguousarray(arr, dtype=np.float32).reshape(len(arr), -1)
+    out = np.empty(len(arr), dtype=f"S{DIGEST_SIZE}")
+    for i, row in enumerate(arr):
+        out[i] = hashlib.blake2b(row.tobytes(), digest_size=DIGEST_SIZE).digest()
+    return out
+
+
+class ForecastCache:
+    def __init__(self, cache_dir: str = "forecast_cache", max_bytes: int = 2 * 2 ** 30):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._index: dict[str, dict] = {}       # model key -> {digest: (shard path, row)}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    # ---- index ----------------------------------------------------------
+
+    def _model_dir(self, mkey: str) -> str:
+        return os.path.join(self.cache_dir, mkey)
+
+    def _shards(self, mkey: str) -> list[str]:
+        return sorted(glob.glob(os.path.join(self._model_dir(mkey), "*.keys.npy")))
+
+    def _load_index(self, mkey: str) -> dict:
+        if mkey not in self._index:
+            index = {}
+            for keys_path in self._shards(mkey):
+                preds_path = keys_path.replace(".keys.npy", ".preds.npy")
+                for row, digest in enumerate(np.load(keys_path)):
+                    index[digest.tobytes()] = (preds_path, row)
+            self._index[mkey] = index
+        return self._index[mkey]
+
+    # ---- get / put -----------------------------------------------------
+
+    def get(self, mkey: str, digests: np.ndarray):
+        """
+        Look up windows by digest. Returns ``(preds, hit)`` where ``preds`` is
+        a list with an array per hit (None per miss) and ``hit`` a bool mask.
+        """
+        index = self._load_index(mkey)
+        hit   = np.zeros(len(digests), dtype=bool)
+        preds = [None] * len(digests)
+        by_shard: dict[str, list[tuple[int, int]]] = {}
+        for i, d in enumerate(digests):
+            loc = index.get(d.tobytes())
+            if loc is not None:
+                by_shard.setdefault(loc[0], []).append((i, loc[1]))
+        now = time.time()
+        for preds_path, pairs in by_shard.items():
+            try:
+                block = np.load(preds_path, mmap_mode="r")
+            except FileNotFoundError:             # evicted by another process
+                self._index.pop(mkey, None)
+                continue
+            for i, row in pairs:
+                preds[i] = np.array(block[row])
+                hit[i] = True
+            os.utime(preds_path, (now, now))      # LRU stamp
+        return preds, hit
+
+    def put(self, mkey: str, digests: np.ndarray, preds: np.ndarray) -> None:
+        if len(digests) == 0:
+            return
+        d = self._model_dir(mkey)
+        os.makedirs(d, exist_ok=True)
+        stem = os.path.join(d, f"{time.time_ns():020d}")
+        np.save(stem + ".preds.npy", np.ascontiguousarray(preds, dtype=np.float32))
+        np.save(stem + ".keys.npy", np.asarray(digests, dtype=f"S{DIGEST_SIZE}"))
+        index = self._load_index(mkey)
+        for row, digest in enumerate(digests):
+            index[digest.tobytes()] = (stem + ".preds.npy", row)
+        self.evict()
+
+    # ---- model front-end -----------------------------------------------
+
+    @torch.no_grad()
+    def predict(self, model, X, edge_index=None, config=None, station_names=None,
+                batch_size: int = 512, device=None, edge_weight=None) -> np.ndarray:
+        """
+        Forecasts for windows ``X`` ([W, N, 1, len_input]), serving cached
+        windows from disk and running ``model`` only on the misses.
+
+        ``edge_weight`` is only part of the cache key (the models take
+        ``edge_index`` alone); pass it when the graph came with weights.
+        """
+        mkey    = model_key(model, config, station_names, edge_index, edge_weight)
+        digests = window_digests(X)
+        cached, hit = self.get(mkey, digests)
+        miss = np.flatnonzero(~hit)
+
+        if len(miss):
+            device = device or next(model.parameters()).device
+            model.eval()
+            Xt = X if isinstance(X, torch.Tensor) else torch.from_numpy(np.asarray(X, dtype=np.float32))
+            ei = edge_index.to(device) if edge_index is not None else None
+            new = []
+            for s in range(0, len(miss), batch_size):
+                idx = torch.from_numpy(miss[s:s + batch_size])
+                new.append(model(Xt[idx].to(device), ei).cpu().numpy())
+            new = np.concatenate(new, axis=0)
+            self.put(mkey, digests[miss], new)
+            for j, i in enumerate(miss):
+                cached[i] = new[j]
+        return np.stack(cached, axis=0) if cached else np.empty((0,), dtype=np.float32)
+
+    # ---- housekeeping --------------------------------------------------
+
+    def size_bytes(self) -> int:
+        return sum(os.path.getsize(p) for p in glob.glob(os.path.join(self.cache_dir, "*", "*.npy")))
+
+    def evict(self) -> int:
+        """Delete least recently used shards until under ``max_bytes``. Returns shards removed."""
+        shards = []
+        for preds_path in glob.glob(os.path.join(self.cache_dir, "*", "*.preds.npy")):
+            keys_path = preds_path.replace(".preds.npy", ".keys.npy")
+            size = os.path.getsize(preds_path) + (os.path.getsize(keys_path) if os.path.exists(keys_path) else 0)
+            shards.append((os.path.getmtime(preds_path), size, preds_path, keys_path))
+        total = sum(s[1] for s in shards)
+        removed = 0
+        for _, size, preds_path, keys_path in sorted(shards):
+            if total <= self.max_bytes:
+                break
+            for p in (preds_path, keys_path):
+                if os.path.exists(p):
+                    os.remove(p)
+            total -= size
+            removed += 1
+        if removed:
+            self._index.clear()
+        return removed
+
+    def clear(self) -> None:
+        for p in glob.glob(os.path.join(self.cache_dir, "*", "*.npy")):
+            os.remove(p)
+        self._index.clear()
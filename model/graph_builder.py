@@ -0,0 +1,201 @@
+"""
+Station graphs from geographic coordinates.
+
+Distances are great-circle (haversine) metres, computed as one vectorized
+N×N matrix for small station sets and with a haversine ``BallTree``
+(scikit-learn) above ``tree_threshold`` stations, so large fleets never
+build the dense matrix. Three edge rules are available:
+
+- ``"knn"``      each station receives edges from its ``k`` nearest stations
+- ``"radius"``   every pair closer than ``radius_m``
+- ``"gaussian"`` every pair whose kernel weight exp(-d²/σ²) ≥ ``min_weight``
+
+Graphs are cached on disk (``cache_dir``) and in memory, keyed by the
+coordinate set and the build parameters.
+
+    locations = load_station_locations()                 # station_locations.csv
+    edge_index, edge_weight = build_geo_graph(locations, station_names, method="knn", k=3)
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import torch
+
+EARTH_RADIUS_M = 6_371_008.8
+DEFAULT_LOCATIONS_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                     "station_locations.csv")
+
+_memory_cache: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+
+
+def load_station_locations(path: str = DEFAULT_LOCATIONS_CSV) -> dict[str, tuple[float, float]]:
+    """{station_name: (lat, lon)} from a CSV with columns station_name, lat, lon."""
+    df = pd.read_csv(path, encoding="utf-8")
+    return {row.station_name: (float(row.lat), float(row.lon)) for row in df.itertuples(index=False)}
+
+
+def _coords(locations, station_names=None) -> np.ndarray:
+    """(N, 2) float64 array of (lat, lon) degrees in ``station_names`` order."""
+    if isinstance(locations, dict):
+        station_names = station_names or list(locations)
+        missing = [s for s in station_names if s not in locations]
+        if missing:
+            raise KeyError(f"No coordinates for stations: {missing}")
+        return np.array([locations[s] for s in station_names], dtype=np.float64)
+    return np.asarray(locations, dtype=np.float64).reshape(-1, 2)
+
+
+def haversine_matrix(coords: np.ndarray) -> np.ndarray:
+    """Pairwise great-circle distances in metres for (N, 2) (lat, lon) degrees."""
+    lat, lon = np.radians(coords[:, 0]), np.radians(coords[:, 1])
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _ball_tree(coords):
+    from sklearn.neighbors import BallTree
+    return BallTree(np.radians(coords), metric="haversine")
+
+
+def knn_edges(coords, k, tree_threshold=512):
+    """(src, dst, dist_m): each node ``dst`` receives edges from its ``k`` nearest ``src``."""
+    n = len(coords)
+    k = min(k, n - 1)
+    if n <= tree_threshold:
+        D = haversine_matrix(coords)
+        np.fill_diagonal(D, np.inf)
+        nbr = np.argpartition(D, k - 1, axis=1)[:, :k] if k > 0 else np.empty((n, 0), dtype=int)
+        dst = np.repeat(np.arange(n), k)
+        src = nbr.ravel()
+        return src, dst, D[dst, src]
+    dist, nbr = _ball_tree(coords).query(np.radians(coords), k=k + 1)
+    dist, nbr = dist[:, 1:] * EARTH_RADIUS_M, nbr[:, 1:]               # drop self
+    return nbr.ravel(), np.repeat(np.arange(n), k), dist.ravel()
+
+
+def radius_edges(coords, radius_m, tree_threshold=512):
+    """(src, dst, dist_m) for every ordered pair closer than ``radius_m`` (no self-loops)."""
+    n = len(coords)
+    if n <= tree_threshold:
+        D = haversine_matrix(coords)
+        dst, src = np.nonzero((D <= radius_m) & ~np.eye(n, dtype=bool))
+        return src, dst, D[dst, src]
+    nbrs, dists = _ball_tree(coords).query_radius(np.radians(coords), r=radius_m / EARTH_RADIUS_M,
+                                                  return_distance=True)
+    dst = np.repeat(np.arange(n), [len(x) for x in nbrs])
+    src = np.concatenate(nbrs)
+    dist = np.concatenate(dists) * EARTH_RADIUS_M
+    keep = src != dst
+    return src[keep], dst[keep], dist[keep]
+
+
+def _cache_key(coords, params) -> str:
+    h = hashlib.sha1(np.round(coords, 7).tobytes())
+    h.update(json.dumps(params, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def build_geo_graph(
+    locations,
+    station_names: list[str] | None = None,
+    method: str = "knn",
+    k: int = 4,
+    radius_m: float | None = None,
+    sigma_m: float | None = None,
+    min_weight: float = 0.1,
+    weighting: str = "gaussian",
+    symmetric: bool = True,
+    tree_threshold: int = 512,
+    cache_dir: str | None = ".graph_cache",
+) -> tuple[torch.Tensor, torch.Tensor]:
+    """
+    Build a sparse station graph from coordinates.
+
+    Parameters
+    ----------
+    locations : dict or array-like
+        {station_name: (lat, lon)} or an (N, 2) array of (lat, lon) degrees.
+    station_names : list[str], optional
+        Node order (default: dict order); must match the model's node axis.
+    method : {"knn", "radius", "gaussian"}
+        Edge rule (see module docstring).
+    k, radius_m : edge rule parameters for "knn" / "radius".
+    sigma_m : float, optional
+        Gaussian kernel width; defaults to the mean kept edge length (for
+        "gaussian": the mean distance from each station to its nearest neighbour).
+    min_weight : float
+        Kernel threshold for "gaussian".
+    weighting : {"gaussian", "inverse", "none"}
+        Edge weights for "knn" / "radius": kernel, 1/d normalized to max 1, or all ones.
+    symmetric : bool
+        Add the reverse of every edge (kNN graphs are otherwise directed).
+
+    Returns
+    -------
+    edge_index : torch.LongTensor (2, E)
+        Row 0 source, row 1 target, sorted by (target, source).
+    edge_weight : torch.FloatTensor (E,)
+    """
+    coords = _coords(locations, station_names)
+    params = {"method": method, "k": k, "radius_m": radius_m, "sigma_m": sigma_m,
+              "min_weight": min_weight, "weighting": weighting, "symmetric": symmetric}
+    key = _cache_key(coords, params)
+    path = os.path.join(cache_dir, f"graph_{key}.npz") if cache_dir else None
+
+    if key not in _memory_cache and path and os.path.exists(path):
+        with np.load(path) as f:
+            _memory_cache[key] = (f["edge_index"], f["edge_weight"])
+    if key not in _memory_cache:
+        _memory_cache[key] = _build(coords, method, k, radius_m, sigma_m, min_weight,
+                                    weighting, symmetric, tree_threshold)
+        if path:
+            os.makedirs(cache_dir, exist_ok=True)
+            np.savez(path, edge_index=_memory_cache[key][0], edge_weight=_memory_cache[key][1])
+
+    edge_index, edge_weight = _memory_cache[key]
+    return torch.from_numpy(edge_index.copy()), torch.from_numpy(edge_weight.copy())
+
+
+def _default_sigma(dist: np.ndarray) -> float:
+    """Mean of the distances (1 m if there are none)."""
+    return float(np.mean(dist)) if len(dist) and np.mean(dist) > 0 else 1.0
+
+
+def _build(coords, method, k, radius_m, sigma_m, min_weight, weighting, symmetric, tree_threshold):
+    if method == "knn":
+        src, dst, dist = knn_edges(coords, k, tree_threshold)
+    elif method == "radius":
+        if radius_m is None:
+            raise ValueError("method='radius' needs radius_m")
+        src, dst, dist = radius_edges(coords, radius_m, tree_threshold)
+    elif method == "gaussian":
+        if sigma_m is None:
+            sigma_m = _default_sigma(knn_edges(coords, 1, tree_threshold)[2])
+        # exp(-d²/σ²) ≥ min_weight  ⇔  d ≤ σ·sqrt(-ln min_weight)
+        src, dst, dist = radius_edges(coords, sigma_m * np.sqrt(-np.log(min_weight)), tree_threshold)
+        weighting = "gaussian"
+    else:
+        raise ValueError(f"Unknown method: {method}")
+
+    if symmetric:
+        src, dst, dist = np.concatenate([src, dst]), np.concatenate([dst, src]), np.concatenate([dist, dist])
+    pairs, first = np.unique(np.stack([dst, src], axis=1), axis=0, return_index=True)   # dedup, sort by target
+    dst, src, dist = pairs[:, 0], pairs[:, 1], dist[first]
+
+    if weighting == "gaussian":
+        weight = np.exp(-(dist / (sigma_m or _default_sigma(dist))) ** 2)
+    elif weighting == "inverse":
+        weight = 1.0 / np.maximum(dist, 1.0)
+        weight = weight / weight.max() if len(weight) else weight
+    elif weighting == "none":
+        weight = np.ones_like(dist)
+    else:
+        raise ValueError(f"Unknown weighting: {weighting}")
+
+    return (np.stack([src, dst]).astype(np.int64),
+            weight.astype(np.float32))
@@ -0,0 +1,271 @@
+"""
+Parallel hyperparameter search over ASTGCN configs with successive halving.
+
+Typical use from a notebook, after the three-way split:
+
+    from model.dataset import pivot_to_series
+    from model.hparam_search import successive_halving_search
+
+    results = successive_halving_search(
+        pivot_to_series(train_df, station_names),
+        pivot_to_series(eval_df, station_names),
+        n_trials=27, min_epochs=2, max_epochs=18, eta=3, n_workers=6,
+    )
+
+The train/eval series are written once as .npy files in ``workdir`` and
+every worker opens them with ``mmap_mode='r'``, so all trials share a single
+copy of the data. Each rung trains the surviving trials for the rung's epoch
+budget (resuming from their saved state), then keeps the best ``1/eta`` by
+eval loss. Trial files live in ``<workdir>/<search_id>/`` (a hash of data,
+space, seed and settings) and are cleared when a search starts, so a rerun
+never resumes another search's trials. A trial that raises is recorded as
+``failed`` and dropped at the next cut. Every result is appended to
+``<workdir>/trials.jsonl``.
+"""
+import hashlib
+import json
+import math
+import os
+import random
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_SPACE = {
+    "nb_block":       [1, 2, 3],
+    "K":              [1, 2, 3],
+    "nb_chev_filter": [16, 32, 64],
+    "nb_time_filter": [16, 32, 64],
+    "len_input":      [48, 96, 192],
+    "max_lr":         [1e-3, 3e-3, 1e-2, 3e-2],
+}
+
+
+def get_model_class(name: str):
+    from model.model_core_architecture import ASTGCN_V1, ASTGCN_V1_5, ASTGCN_V2
+    from model.model_experiment import WattGraphNet_AAMm
+    classes = {c.__name__: c for c in (ASTGCN_V1, ASTGCN_V1_5, ASTGCN_V2, WattGraphNet_AAMm)}
+    if name not in classes:
+        raise ValueError(f"Unknown model: {name}")
+    return classes[name]
+
+
+def build_config(params: dict, num_nodes: int, pred_len: int) -> dict:
+    """Full ASTGCN config (as in the notebooks) from one sampled parameter set."""
+    return {
+        "nb_block": params["nb_block"],
+        "in_channels": 1,
+        "K": params["K"],
+        "nb_chev_filter": params["nb_chev_filter"],
+        "nb_time_filter": params["nb_time_filter"],
+        "time_strides": 1,
+        "num_for_predict": pred_len,
+        "len_input": params["len_input"],
+        "num_of_vertices": num_nodes,
+        "normalization": "sym",
+        "bias": True,
+    }
+
+
+def sample_configs(space: dict, n_trials: int, seed: int = 0) -> list[dict]:
+    """Random configs from ``space`` (the full grid if it has <= n_trials points)."""
+    keys = list(space)
+    grid_size = math.prod(len(space[k]) for k in keys)
+    rng = random.Random(seed)
+    if grid_size <= n_trials:
+        import itertools
+        return [dict(zip(keys, vals)) for vals in itertools.product(*(space[k] for k in keys))]
+    seen, out = set(), []
+    while len(out) < n_trials:
+        vals = tuple(rng.choice(space[k]) for k in keys)
+        if vals not in seen:
+            seen.add(vals)
+            out.append(dict(zip(keys, vals)))
+    return out
+
+
+def _run_trial(job: dict) -> dict:
+    """Worker: run one trial; a failing trial is reported instead of aborting the rung."""
+    try:
+        return _train_trial(job)
+    except Exception as e:
+        return {**job, "eval_loss": float("inf"), "epochs": 0, "seconds": 0.0,
+                "status": "failed", "error": f"{type(e).__name__}: {e}"}
+
+
+def _train_trial(job: dict) -> dict:
+    """Train one trial up to ``job['budget']`` epochs, resuming from its state file."""
+    import torch
+    from torch.utils.data import DataLoader
+
+    from model.dataset import SeriesWindowDataset
+    from model.train import Trainer, fully_connected_edge_index
+
+    torch.set_num_threads(job["threads"])
+    torch.manual_seed(job["seed"])
+    t0 = time.perf_counter()
+
+    train_series = np.load(job["train_path"], mmap_mode="r")
+    eval_series  = np.load(job["eval_path"],  mmap_mode="r")
+    num_nodes    = train_series.shape[1]
+    params       = job["params"]
+    config       = build_config(params, num_nodes, job["pred_len"])
+
+    train_ds = SeriesWindowDataset(train_series, params["len_input"], job["pred_len"])
+    eval_ds  = SeriesWindowDataset(eval_series,  params["len_input"], job["pred_len"])
+    if len(train_ds) == 0 or len(eval_ds) == 0:
+        return {**job, "eval_loss": float("inf"), "epochs": 0, "seconds": 0.0,
+                "status": "too_short"}
+
+    train_loader = DataLoader(train_ds, batch_size=job["batch_size"], shuffle=True)
+    eval_loader  = DataLoader(eval_ds,  batch_size=job["batch_size"], shuffle=False)
+
+    model = get_model_class(job["model_name"])(num_nodes=num_nodes, **config)
+    trainer = Trainer(model, train_loader, eval_loader,
+                      edge_index=fully_connected_edge_index(num_nodes),
+                      total_epochs=job["max_epochs"], max_lr=params["max_lr"], device="cpu",
+                      checkpoint_path=job["best_path"], show_progress=False)
+    if os.path.exists(job["state_path"]):
+        trainer.load_state_dict(torch.load(job["state_path"], weights_only=False))
+
+    trainer.fit(num_epochs=job["budget"] - trainer.epoch, patience=None, log=None)
+    torch.save(trainer.state_dict(), job["state_path"])
+
+    eval_loss = trainer.best_eval_loss
+    return {**job, "eval_loss": eval_loss if math.isfinite(eval_loss) else float("inf"),
+            "epochs": trainer.epoch, "seconds": time.perf_counter() - t0, "status": "ok"}
+
+
+def _record(path: str, row: dict) -> None:
+    keep = ("search_id", "trial_id", "rung", "epochs", "eval_loss", "seconds", "status",
+            "model_name", "params", "error")
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({k: row[k] for k in keep if k in row}) + "\n")
+
+
+def search_id(train_series, eval_series, space: dict, n_trials: int, seed: int, **settings) -> str:
+    """Short hash of everything that defines a search: data, space, seed and training settings."""
+    h = hashlib.sha1()
+    for a in (train_series, eval_series):
+        a = np.ascontiguousarray(a, dtype=np.float32)
+        h.update(str(a.shape).encode())
+        h.update(a.tobytes())
+    h.update(json.dumps({"space": space, "n_trials": n_trials, "seed": seed, **settings},
+                        sort_keys=True, default=str).encode())
+    return h.hexdigest()[:12]
+
+
+def successive_halving_search(
+    train_series: np.ndarray,
+    eval_series: np.ndarray,
+    space: dict | None = None,
+    n_trials: int = 27,
+    min_epochs: int = 1,
+    max_epochs: int = 27,
+    eta: int = 3,
+    n_workers: int | None = None,
+    model_name: str = "ASTGCN_V1",
+    pred_len: int = 96,
+    batch_size: int = 512,
+    workdir: str = "hparam_search",
+    seed: int = 0,
+) -> pd.DataFrame:
+    """
+    Run a successive-halving search across a process pool.
+
+    Parameters
+    ----------
+    train_series, eval_series : np.ndarray
+        (T, N) float arrays from ``pivot_to_series``.
+    space : dict, optional
+        Lists of candidate values per hyperparameter (``DEFAULT_SPACE``).
+    n_trials : int
+        Number of configs in the first rung.
+    min_epochs, max_epochs, eta : int
+        Rung budgets are min_epochs, min_epochs*eta, ... capped at max_epochs;
+        after each rung the best ceil(n/eta) trials survive.
+    n_workers : int, optional
+        Worker processes (default: all cores); cores are split evenly
+        between workers for torch intra-op threads.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per (trial, rung), best first. The overall winner's weights
+        and config are copied to ``<workdir>/best_model.pt`` and
+        ``<workdir>/best_config.json``.
+    """
+    space = space or DEFAULT_SPACE
+    os.makedirs(workdir, exist_ok=True)
+    train_path = os.path.join(workdir, "train_series.npy")
+    eval_path  = os.path.join(workdir, "eval_series.npy")
+    np.save(train_path, np.asarray(train_series, dtype=np.float32))
+    np.save(eval_path,  np.asarray(eval_series,  dtype=np.float32))
+    store = os.path.join(workdir, "trials.jsonl")
+
+    # trial state is only ever resumed within this search
+    sid = search_id(train_series, eval_series, space, n_trials, seed, model_name=model_name,
+                    pred_len=pred_len, batch_size=batch_size, min_epochs=min_epochs,
+                    max_epochs=max_epochs, eta=eta)
+    trial_dir = os.path.join(workdir, sid)
+    shutil.rmtree(trial_dir, ignore_errors=True)
+    os.makedirs(trial_dir)
+
+    n_workers = n_workers or os.cpu_count() or 1
+    threads   = max(1, (os.cpu_count() or 1) // n_workers)
+
+    budgets = []
+    b = min_epochs
+    while b < max_epochs:
+        budgets.append(b)
+        b *= eta
+    budgets.append(max_epochs)
+
+    trials = [
+        {
+            "search_id": sid, "trial_id": i, "params": p, "model_name": model_name, "pred_len": pred_len,
+            "batch_size": batch_size, "max_epochs": max_epochs, "threads": threads,
+            "seed": seed + i, "train_path": train_path, "eval_path": eval_path,
+            "state_path": os.path.join(trial_dir, f"trial_{i:03d}_state.pt"),
+            "best_path":  os.path.join(trial_dir, f"trial_{i:03d}_best.pt"),
+        }
+        for i, p in enumerate(sample_configs(space, n_trials, seed))
+    ]
+
+    rows = []
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=get_context("spawn")) as pool:
+        for rung, budget in enumerate(budgets):
+            jobs = [{**t, "rung": rung, "budget": budget} for t in trials]
+            results = list(pool.map(_run_trial, jobs))
+            for r in results:
+                _record(store, r)
+                rows.append(r)
+            failed = [r for r in results if r["status"] == "failed"]
+            print(f"Rung {rung}: {len(results)} trials @ {budget} epochs — "
+                  f"best eval loss {min(r['eval_loss'] for r in results):.4f}"
+                  + (f" ({len(failed)} failed)" if failed else ""))
+            for r in failed:
+                print(f"  trial {r['trial_id']} failed: {r['error']}")
+            if rung == len(budgets) - 1:
+                break
+            results.sort(key=lambda r: r["eval_loss"])
+            keep = {r["trial_id"] for r in results[:max(1, math.ceil(len(results) / eta))]}
+            trials = [t for t in trials if t["trial_id"] in keep]
+
+    df = pd.DataFrame(rows)[["trial_id", "rung", "epochs", "eval_loss", "seconds", "status", "params"]]
+    df = df.sort_values(["rung", "eval_loss"], ascending=[False, True]).reset_index(drop=True)
+
+    best = df.iloc[0]
+    best_trial = next(t for t in trials if t["trial_id"] == best["trial_id"])
+    if os.path.exists(best_trial["best_path"]):
+        shutil.copyfile(best_trial["best_path"], os.path.join(workdir, "best_model.pt"))
+    with open(os.path.join(workdir, "best_config.json"), "w", encoding="utf-8") as f:
+        json.dump({"model_name": model_name,
+                   "max_lr": best["params"]["max_lr"],
+                   "config": build_config(best["params"], train_series.shape[1], pred_len),
+                   "eval_loss": best["eval_loss"]}, f, indent=2)
+    return df
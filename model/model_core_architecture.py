@@ -1,5 +1,8 @@
+import functools
+
 import torch
 import torch.nn.functional as F
+from torch.utils.checkpoint import checkpoint
 from torch_geometric_temporal import ASTGCN
 from torch_geometric.utils import dense_to_sparse
 from torch.utils.data import DataLoader, Dataset
@@ -13,9 +16,11 @@ import torch.nn as nn
 
 # 6. ASTGCN with adaptive adjacency
 class ASTGCN_V2(nn.Module):
-    def __init__(self, num_nodes, **kwargs):
+    def __init__(self, num_nodes, checkpoint_blocks=False, **kwargs):
         super().__init__()
         self.astgcn    = ASTGCN(**kwargs)
+        if checkpoint_blocks:
+            checkpoint_astgcn_blocks(self.astgcn)
         self.node_emb1 = nn.Parameter(torch.randn(num_nodes, 10))
         self.node_emb2 = nn.Parameter(torch.randn(10, num_nodes))
 
@@ -34,9 +39,11 @@ import torch.nn.functional as F
 from torch_geometric_temporal import ASTGCN
 
 class ASTGCN_V1_5(nn.Module):
-    def __init__(self, num_nodes, **kwargs):
+    def __init__(self, num_nodes, checkpoint_blocks=False, **kwargs):
         super().__init__()
         self.astgcn = ASTGCN(**kwargs)
+        if checkpoint_blocks:
+            checkpoint_astgcn_blocks(self.astgcn)
 
     def forward(self, x, edge_index):
         """
@@ -46,9 +53,11 @@ class ASTGCN_V1_5(nn.Module):
         out = self.astgcn(x, edge_index)
         return F.relu(out)
 class ASTGCN_V1(nn.Module):
-    def __init__(self, num_nodes, **kwargs):
+    def __init__(self, num_nodes, checkpoint_blocks=False, **kwargs):
         super().__init__()
         self.astgcn = ASTGCN(**kwargs)
+        if checkpoint_blocks:
+            checkpoint_astgcn_blocks(self.astgcn)
 
     def forward(self, x, edge_index):
         """
@@ -73,3 +82,83 @@ class ASTGCN_V1(nn.Module):
 # }
 
 
+
+
+class NormalizedForecaster(nn.Module):
+    """
+    Wrap a trained model with a fused per-station normalize/denormalize step.
+
+    loc/scale are registered as buffers, so they are saved in the state_dict
+    and baked into ONNX exports. Use method='minmax' for wrappers whose output
+    ends in a ReLU (ASTGCN_V1_5, ASTGCN_V2), since z-scored targets go negative.
+    """
+    def __init__(self, model, loc, scale):
+        super().__init__()
+        self.model = model
+        self.register_buffer("loc",   torch.as_tensor(loc,   dtype=torch.float32))
+        self.register_buffer("scale", torch.as_tensor(scale, dtype=torch.float32))
+
+    @classmethod
+    def from_store(cls, model, store, station_names, method="zscore"):
+        loc, scale = store.scale_vectors(station_names, method)
+        return cls(model, loc, scale)
+
+    def forward(self, x, edge_index=None):
+        """
+        x: [batch_size, num_nodes, num_features, num_timesteps] in kW
+        returns: [batch_size, num_nodes, num_for_predict] in kW
+        """
+        x   = (x - self.loc[None, :, None, None]) / self.scale[None, :, None, None]
+        out = self.model(x, edge_index)
+        return out * self.scale[None, :, None] + self.loc[None, :, None]
+
+
+
+def _checkpointed_forward(forward, X, edge_index):
+    if torch.is_grad_enabled():
+        return checkpoint(forward, X, edge_index, use_reentrant=False)
+    return forward(X, edge_index)
+
+
+def checkpoint_astgcn_blocks(astgcn):
+    """
+    Activation checkpointing for every block of an ``ASTGCN``: the block's
+    attention maps and per-step Chebyshev outputs are recomputed during
+    backward instead of being kept, trading one extra block forward per step
+    for activation memory that no longer grows with nb_block. Inference and
+    the state_dict are unchanged.
+    """
+    for block in astgcn._blocklist:
+        block.forward = functools.partial(_checkpointed_forward, type(block).forward.__get__(block))
+    return astgcn
+
+
+class MultiScaleForecaster(nn.Module):
+    """
+    Feed a long context (e.g. a week, 672 slots) to a model as the last
+    ``recent`` slots at full resolution plus the older slots average-pooled by
+    ``factor``. With the defaults a week becomes 96 + 576/4 = 240 steps, so
+    the wrapped model is built with ``len_input=model_len_input(672)``.
+
+    Pooling runs inside the module, so it is baked into ONNX exports.
+    """
+    def __init__(self, model, recent=96, factor=4):
+        super().__init__()
+        self.model  = model
+        self.recent = recent
+        self.factor = factor
+
+    @staticmethod
+    def model_len_input(history, recent=96, factor=4):
+        return recent + (history - recent) // factor
+
+    def forward(self, x, edge_index=None):
+        """
+        x: [batch_size, num_nodes, num_features, history]
+        returns: [batch_size, num_nodes, num_for_predict]
+        """
+        B, N, C, T = x.shape
+        prior  = x[..., : T - self.recent]
+        prior  = prior[..., prior.shape[-1] % self.factor:]        # drop the oldest remainder
+        pooled = F.avg_pool1d(prior.reshape(B, N * C, -1), self.factor).reshape(B, N, C, -1)
+        return self.model(torch.cat([pooled, x[..., T - self.recent:]], dim=-1), edge_index)
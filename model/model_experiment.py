@@ -9,13 +9,17 @@ import numpy as np
 import pandas as pd
 import torch.nn as nn
 
+from model.model_core_architecture import checkpoint_astgcn_blocks
+
 
 
 # 6. ASTGCN with adaptive adjacency
 class WattGraphNet_AAMm(nn.Module):
-    def __init__(self, num_nodes, **kwargs):
+    def __init__(self, num_nodes, checkpoint_blocks=False, **kwargs):
         super().__init__()
         self.astgcn    = ASTGCN(**kwargs)
+        if checkpoint_blocks:
+            checkpoint_astgcn_blocks(self.astgcn)
         self.node_emb1 = nn.Parameter(torch.randn(num_nodes, num_nodes*5))  # Increased to allow for more complex relationships
         self.node_emb2 = nn.Parameter(torch.randn(num_nodes*5, num_nodes))
 
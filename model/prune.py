@@ -0,0 +1,330 @@
+"""
+Structured channel pruning of trained ASTGCN checkpoints.
+
+Whole channels are removed from the weights, so the result is a physically
+smaller model of the same wrapper class (``ASTGCN_V1`` / ``V1_5`` / ``V2`` /
+``WattGraphNet_AAMm``) built with a smaller ``nb_chev_filter`` /
+``nb_time_filter``. It loads with the usual
+
+    model = build_model(model_name, num_nodes, pruned_config)
+    model.load_state_dict(torch.load("pruned/pruned_50.pt"))
+
+Channel importance is weight based:
+
+- Chebyshev channel ``c`` of a block: norm of its graph-conv weights and bias
+  times the norm of the time-conv weights reading it
+- temporal channel ``c`` of a block (the block output): |LayerNorm scale| +
+  |shift| times the norm of every weight consuming it in the next block
+  (attention, Chebyshev and residual convs) or in the final conv
+
+The same number of channels is kept in every block (the wrappers take one
+width for all blocks), but each block keeps its own best channels. Each
+level is briefly fine-tuned on the dense backend (same parameter names,
+much faster on CPU), exported to ONNX and scored on a hold-out:
+
+    python -m model.prune --data all_data_timeseries.csv --checkpoint best_model.pt \\
+        --model ASTGCN_V1 --eval-start 2024-11-01 --keep 0.75 0.5 0.25 --out-dir pruned
+"""
+import argparse
+import json
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import torch
+from torch.utils.data import DataLoader, Subset
+
+from model.dataset import SeriesWindowDataset
+from model.dense_astgcn import to_dense
+from model.distill import export_student_onnx, latency_ms
+from model.distributed_train import build_model
+from model.finetune import holdout_metrics, split_windows_by_date
+from model.train import Trainer, fully_connected_edge_index
+
+
+def _astgcn_prefix(state_dict) -> str:
+    for key in state_dict:
+        if key.endswith("_final_conv.weight"):
+            return key[:-len("_final_conv.weight")]
+    raise ValueError("Not an ASTGCN state dict (no _final_conv.weight)")
+
+
+def _nb_block(state_dict, prefix) -> int:
+    blocks = {int(k[len(prefix):].split(".")[1]) for k in state_dict if k.startswith(prefix + "_blocklist.")}
+    return len(blocks)
+
+
+def _block(state_dict, prefix, b):
+    p = f"{prefix}_blocklist.{b}."
+    return {k[len(p):]: v for k, v in state_dict.items() if k.startswith(p)}
+
+
+def _consumer_norm(state_dict, prefix, b) -> torch.Tensor:
+    """Per-channel norm of every weight reading the output channels of block ``b``."""
+    nb_block = _nb_block(state_dict, prefix)
+    if b == nb_block - 1:
+        w = state_dict[prefix + "_final_conv.weight"]                      # [P, T, 1, C]
+        return w.permute(3, 0, 1, 2).reshape(w.shape[-1], -1).norm(dim=1)
+    nxt = _block(state_dict, prefix, b + 1)
+    parts = [
+        nxt["_chebconv_attention._weight"].permute(1, 0, 2),            # [C, K, chev]
+        nxt["_residual_convolution.weight"].transpose(0, 1),            # [C, time, 1, 1]
+        nxt["_temporal_attention._U2"], nxt["_temporal_attention._U3"][:, None],
+        nxt["_spatial_attention._W2"],  nxt["_spatial_attention._W3"][:, None],
+    ]
+    return torch.sqrt(sum(p.reshape(p.shape[0], -1).pow(2).sum(dim=1) for p in parts))
+
+
+@torch.no_grad()
+def channel_scores(state_dict) -> tuple[list[torch.Tensor], list[torch.Tensor]]:
+    """(Chebyshev scores, temporal scores), one tensor per block; higher = more important."""
+    prefix = _astgcn_prefix(state_dict)
+    chev, time = [], []
+    for b in range(_nb_block(state_dict, prefix)):
+        blk = _block(state_dict, prefix, b)
+        W = blk["_chebconv_attention._weight"]                             # [K, in, chev]
+        w_in = W.permute(2, 0, 1).reshape(W.shape[-1], -1).pow(2).sum(dim=1)
+        if "_chebconv_attention._bias" in blk:
+            w_in = w_in + blk["_chebconv_attention._bias"].pow(2)
+        w_out = blk["_time_convolution.weight"].transpose(0, 1).reshape(W.shape[-1], -1).norm(dim=1)
+        chev.append(w_in.sqrt() * w_out)
+
+        ln = blk["_layer_norm.weight"].abs() + blk["_layer_norm.bias"].abs()
+        time.append(ln * _consumer_norm(state_dict, prefix, b))
+    return chev, time
+
+
+def select_channels(scores: list[torch.Tensor], n_keep: int) -> list[torch.Tensor]:
+    """Indices of the ``n_keep`` best channels per block, in their original order."""
+    return [s.topk(n_keep).indices.sort().values for s in scores]
+
+
+@torch.no_grad()
+def prune_state_dict(state_dict, chev_keep: list[torch.Tensor], time_keep: list[torch.Tensor]):
+    """Slice every tensor touched by the kept Chebyshev / temporal channels of each block."""
+    prefix = _astgcn_prefix(state_dict)
+    out = OrderedDict((k, v.clone()) for k, v in state_dict.items())
+
+    def take(key, dim, idx):
+        if key in out:
+            out[key] = out[key].index_select(dim, idx).contiguous()
+
+    for b, (ck, tk) in enumerate(zip(chev_keep, time_keep)):
+        p = f"{prefix}_blocklist.{b}."
+        take(p + "_chebconv_attention._weight", 2, ck)
+        take(p + "_chebconv_attention._bias",   0, ck)
+        take(p + "_time_convolution.weight",    0, tk)
+        take(p + "_time_convolution.weight",    1, ck)
+        take(p + "_time_convolution.bias",      0, tk)
+        take(p + "_residual_convolution.weight", 0, tk)
+        take(p + "_residual_convolution.bias",   0, tk)
+        take(p + "_layer_norm.weight", 0, tk)
+        take(p + "_layer_norm.bias",   0, tk)
+        if b > 0:                                      # inputs are the previous block's channels
+            prev = time_keep[b - 1]
+            take(p + "_chebconv_attention._weight",  1, prev)
+            take(p + "_residual_convolution.weight", 1, prev)
+            take(p + "_temporal_attention._U2", 0, prev)
+            take(p + "_temporal_attention._U3", 0, prev)
+            take(p + "_spatial_attention._W2",  0, prev)
+            take(p + "_spatial_attention._W3",  0, prev)
+    take(prefix + "_final_conv.weight", 3, time_keep[-1])
+    return out
+
+
+def prune_model(model, model_name: str, num_nodes: int, config: dict, keep: float):
+    """
+    Physically smaller copy of ``model`` keeping ``keep`` of the Chebyshev and
+    temporal channels.
+
+    Returns
+    -------
+    pruned : nn.Module
+        Same wrapper class, built with the reduced widths.
+    config : dict
+        The config to rebuild it with (``nb_chev_filter`` / ``nb_time_filter`` updated).
+    """
+    n_chev = max(1, int(round(config["nb_chev_filter"] * keep)))
+    n_time = max(1, int(round(config["nb_time_filter"] * keep)))
+    state_dict = model.state_dict()
+    chev_scores, time_scores = channel_scores(state_dict)
+    pruned_sd = prune_state_dict(state_dict, select_channels(chev_scores, n_chev),
+                                 select_channels(time_scores, n_time))
+    config = {**config, "nb_chev_filter": n_chev, "nb_time_filter": n_time}
+    pruned = build_model(model_name, num_nodes, config)
+    pruned.load_state_dict(pruned_sd)
+    return pruned, config
+
+
+@torch.no_grad()
+def count_flops(model, num_nodes: int, len_input: int) -> int:
+    """Matmul / conv FLOPs of one forecast (batch of 1)."""
+    from torch.utils.flop_counter import FlopCounterMode
+
+    model.eval()
+    counter = FlopCounterMode(display=False)
+    with counter:
+        model(torch.zeros(1, num_nodes, 1, len_input))
+    return counter.get_total_flops()
+
+
+def pruning_report(
+    model,
+    model_name: str,
+    config: dict,
+    long_df: pd.DataFrame,
+    eval_start,
+    station_names: list[str] | None = None,
+    keep_ratios=(0.75, 0.5, 0.25),
+    epochs: int = 3,
+    max_lr: float = 3e-3,
+    max_train_windows: int = 4096,
+    val_frac: float = 0.1,
+    batch_size: int = 64,
+    out_dir: str = "pruned",
+    threads: int = 1,
+    seed: int = 0,
+    log=print,
+) -> pd.DataFrame:
+    """
+    Prune ``model`` to each level in ``keep_ratios``, fine-tune, export and score.
+
+    Every level is written to ``<out_dir>/pruned_<pct>.pt`` / ``.json``
+    (hparam_search ``best_config.json`` layout) / ``.onnx``. Metrics are
+    ``compute_station_metrics`` over every horizon of the windows whose
+    target starts at or after ``eval_start``. The last ``val_frac`` of the
+    period before ``eval_start`` is a validation slice that picks the
+    fine-tuning epoch; fine-tuning uses a random sample of at most
+    ``max_train_windows`` windows before that slice.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per level (``keep=1.0`` is the unpruned model): widths,
+        params, MFLOPs, torch / ONNX single-forecast latency, MAE / RMSE /
+        WAPE and their deltas against the unpruned model.
+    """
+    import onnxruntime as ort
+    from model.evaluate import build_features
+    from utils.build_station_weight import build_station_weights
+
+    torch.manual_seed(seed)
+    torch.set_num_threads(threads)
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    station_names = station_names or sorted(long_df['station_name'].unique())
+    num_nodes = len(station_names)
+    len_input, pred_len = config["len_input"], config["num_for_predict"]
+    edge_index = fully_connected_edge_index(num_nodes)
+
+    # 1) Hold-out windows from eval_start; the period before it is split the
+    #    same way into fine-tuning windows and a validation slice at its end
+    series, actual, dates, _ = build_features(long_df, station_names, eval_start)
+    dataset = SeriesWindowDataset(series, len_input, pred_len)
+    _, _, _, eval_idx = split_windows_by_date(len(dataset), dates, len_input, pred_len,
+                                              new_start=eval_start, eval_frac=1.0)
+    eval_pos = int(np.searchsorted(dates, pd.Timestamp(eval_start)))
+    _, train_idx, val_idx, _ = split_windows_by_date(max(eval_pos - len_input - pred_len + 1, 0), dates[:eval_pos],
+                                                     len_input, pred_len, new_start=dates[0],
+                                                     eval_frac=0.0, val_frac=val_frac)
+    if len(train_idx) == 0 or len(val_idx) == 0:
+        raise ValueError("Not enough data before eval_start for fine-tuning and validation windows")
+    if len(train_idx) > max_train_windows:
+        train_idx = rng.choice(train_idx, size=max_train_windows, replace=False)
+    weights_df = build_station_weights(long_df)
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = threads
+    x_one = torch.zeros(1, num_nodes, 1, len_input)
+
+    rows = []
+    for keep in (1.0, *keep_ratios):
+        tag = f"{int(round(keep * 100))}"
+        pruned, cfg = (model, config) if keep == 1.0 else prune_model(model, model_name, num_nodes, config, keep)
+
+        # 2) Brief fine-tune on the dense backend; its state dict loads back unchanged
+        dense = to_dense(pruned, num_nodes, cfg, edge_index)
+        ckpt  = os.path.join(out_dir, f"pruned_{tag}.pt")
+        if keep < 1.0 and epochs > 0:
+            trainer = Trainer(dense,
+                              DataLoader(Subset(dataset, train_idx), batch_size=batch_size, shuffle=True),
+                              DataLoader(Subset(dataset, val_idx),   batch_size=batch_size, shuffle=False),
+                              total_epochs=epochs, max_lr=max_lr, device="cpu",
+                              checkpoint_path=ckpt, show_progress=False)
+            trainer.fit(patience=None, log=log)
+            pruned.load_state_dict(torch.load(ckpt, map_location="cpu"))
+            dense = to_dense(pruned, num_nodes, cfg, edge_index)
+        torch.save(pruned.state_dict(), ckpt)
+        with open(os.path.join(out_dir, f"pruned_{tag}.json"), "w", encoding="utf-8") as f:
+            json.dump({"model_name": model_name, "config": cfg}, f, indent=2)
+        onnx_path = export_student_onnx(dense, os.path.join(out_dir, f"pruned_{tag}.onnx"), num_nodes, len_input)
+
+        # 3) Cost and accuracy
+        sess = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        pruned.eval()
+        with torch.no_grad():
+            torch_ms = latency_ms(lambda: pruned(x_one, edge_index), n_runs=20)
+        metrics = holdout_metrics(dense, dataset, eval_idx, dates, actual, station_names, weights_df)
+        overall = metrics.set_index('station_name').loc['all_station']
+        rows.append({
+            "keep":           keep,
+            "nb_chev_filter": cfg["nb_chev_filter"],
+            "nb_time_filter": cfg["nb_time_filter"],
+            "params":         sum(p.numel() for p in pruned.parameters()),
+            "mflops":         count_flops(dense, num_nodes, len_input) / 1e6,
+            "latency_ms":     torch_ms,
+            "onnx_latency_ms": latency_ms(lambda: sess.run(None, {"x": x_one.numpy()})),
+            "MAE":            float(overall["MAE"]),
+            "RMSE":           float(overall["RMSE"]),
+            "WAPE":           float(overall["WAPE"]),
+        })
+        if log:
+            log(f"keep {keep:.2f}: {rows[-1]['params']:,} params, MAE {rows[-1]['MAE']:.3f}")
+
+    report = pd.DataFrame(rows)
+    for m in ("MAE", "RMSE", "WAPE"):
+        report[f"d_{m}"] = report[m] - report[m].iloc[0]
+    report.to_csv(os.path.join(out_dir, "prune_report.csv"), index=False)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default="all_data_timeseries.csv", help="long CSV from run_pipeline")
+    parser.add_argument("--checkpoint", default="best_model.pt")
+    parser.add_argument("--model", default="ASTGCN_V1")
+    parser.add_argument("--config", help="JSON with a model config (e.g. hparam_search best_config.json)")
+    parser.add_argument("--eval-start", required=True, help="hold-out windows start here")
+    parser.add_argument("--keep", type=float, nargs="+", default=[0.75, 0.5, 0.25])
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--val-frac", type=float, default=0.1,
+                        help="share of the data before --eval-start used to pick the fine-tuning epoch")
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--out-dir", default="pruned")
+    args = parser.parse_args(argv)
+
+    from model.distributed_train import EXCLUDED_STATIONS
+    from model.evaluate import model_config
+
+    long_df = pd.read_csv(args.data, parse_dates=['Date'])
+    long_df = long_df[~long_df['station_name'].isin(EXCLUDED_STATIONS)]
+    long_df.loc[long_df['Electricity(kW)'] < 0, 'Electricity(kW)'] = 0
+    station_names = sorted(long_df['station_name'].unique())
+
+    model_name = args.model
+    if args.config:
+        with open(args.config, encoding="utf-8") as f:
+            model_name = json.load(f).get("model_name", model_name)
+    config = model_config({"config_path": args.config}, len(station_names))
+    model = build_model(model_name, len(station_names), config)
+    model.load_state_dict(torch.load(args.checkpoint, map_location="cpu"))
+
+    report = pruning_report(model, model_name, config, long_df, args.eval_start, station_names,
+                            keep_ratios=args.keep, epochs=args.epochs, val_frac=args.val_frac, threads=args.threads,
+                            out_dir=args.out_dir)
+    print(report.to_string(index=False, float_format=lambda v: f"{v:,.3f}"))
+
+
+if __name__ == "__main__":
+    main()
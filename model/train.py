@@ -0,0 +1,158 @@
+import torch
+import torch.nn as nn
+from torch.amp import GradScaler, autocast
+from tqdm.auto import tqdm
+
+
+def fully_connected_edge_index(num_nodes: int) -> torch.Tensor:
+    """Edge index of the fully connected graph without self-loops, shape (2, N*(N-1))."""
+    idx = torch.arange(num_nodes)
+    src, dst = torch.meshgrid(idx, idx, indexing="ij")
+    keep = src != dst
+    return torch.stack([src[keep], dst[keep]]).contiguous()
+
+
+class Trainer:
+    """
+    The notebook training loop (AdamW + OneCycleLR, grad clipping, AMP on
+    CUDA, early stopping on eval loss, best weights saved to
+    ``checkpoint_path``) as a resumable object.
+
+    ``total_epochs`` fixes the OneCycle schedule length, so training can be
+    run in several ``fit`` calls (e.g. rung by rung in a search) and
+    ``state_dict`` / ``load_state_dict`` carry everything needed to resume.
+    """
+
+    def __init__(self, model, train_loader, eval_loader, edge_index=None,
+                 total_epochs=50, max_lr=3e-2, weight_decay=1e-4, device=None,
+                 criterion=None, checkpoint_path="best_model.pt", show_progress=True):
+        self.device = torch.device(device) if device is not None else torch.device(
+            "cuda" if torch.cuda.is_available() else "cpu")
+        self.model        = model.to(self.device)
+        self.train_loader = train_loader
+        self.eval_loader  = eval_loader
+        self.edge_index   = edge_index.to(self.device) if edge_index is not None else None
+        self.criterion    = criterion or nn.MSELoss()
+        self.checkpoint_path = checkpoint_path
+        self.show_progress   = show_progress
+
+        self.optimizer = torch.optim.AdamW(model.parameters(), lr=max_lr, weight_decay=weight_decay)
+        self.scheduler = torch.optim.lr_scheduler.OneCycleLR(
+            self.optimizer,
+            max_lr=max_lr,
+            steps_per_epoch=max(len(train_loader), 1),
+            epochs=total_epochs,
+            pct_start=0.3,
+        )
+        self.use_amp = self.device.type == "cuda"
+        self.scaler  = GradScaler(enabled=self.use_amp)
+
+        self.total_epochs   = total_epochs
+        self.epoch          = 0
+        self.best_eval_loss = float('inf')
+        self.no_improve     = 0
+        self.history        = {"train_loss": [], "eval_loss": []}
+
+    def _step_batch(self, Xb, Yb):
+        Xb = Xb.unsqueeze(2).to(self.device)  # [B, N, 1, len_input]
+        Yb = Yb.to(self.device)
+        self.optimizer.zero_grad()
+        with autocast(self.device.type, enabled=self.use_amp):
+            preds = self.model(Xb, self.edge_index)
+            loss  = self.criterion(preds, Yb)
+        self.scaler.scale(loss).backward()
+        self.scaler.unscale_(self.optimizer)
+        torch.nn.utils.clip_grad_norm_(self.model.parameters(), 1.0)
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
+        self.scheduler.step()
+        return loss.item() * Xb.size(0)
+
+    def train_epoch(self) -> float:
+        self.model.train()
+        total, n = 0.0, 0
+        batches = self.train_loader
+        if self.show_progress:
+            batches = tqdm(batches, desc=f"Epoch {self.epoch + 1} train")
+        for Xb, Yb in batches:
+            total += self._step_batch(Xb, Yb)
+            n     += Xb.size(0)
+        return total / max(n, 1)
+
+    @torch.no_grad()
+    def evaluate(self, loader=None) -> float:
+        total, n = self.evaluate_sums(loader)
+        return total / max(n, 1)
+
+    @torch.no_grad()
+    def evaluate_sums(self, loader=None, model=None) -> tuple[float, int]:
+        """Sample-weighted loss sum and sample count over ``loader`` (default: the eval loader)."""
+        loader = loader if loader is not None else self.eval_loader
+        model  = model if model is not None else self.model
+        model.eval()
+        total, n = 0.0, 0
+        for Xb, Yb in loader:
+            Xb = Xb.unsqueeze(2).to(self.device)
+            Yb = Yb.to(self.device)
+            preds = model(Xb, self.edge_index)
+            total += self.criterion(preds, Yb).item() * Xb.size(0)
+            n     += Xb.size(0)
+        return total, n
+
+    def save_checkpoint(self):
+        torch.save(self.model.state_dict(), self.checkpoint_path)
+
+    def fit(self, num_epochs=None, patience=5, log=print) -> dict:
+        """
+        Train up to ``num_epochs`` more epochs (default: the rest of the
+        schedule), stopping early after ``patience`` epochs without
+        improvement. Returns the loss history.
+        """
+        end = self.total_epochs if num_epochs is None else min(self.epoch + num_epochs, self.total_epochs)
+        while self.epoch < end:
+            avg_train = self.train_epoch()
+            avg_eval  = self.evaluate()
+            self.epoch += 1
+            self.history["train_loss"].append(avg_train)
+            self.history["eval_loss"].append(avg_eval)
+            if log:
+                log(f"Epoch {self.epoch:02d} — Train Loss: {avg_train:.4f} | Eval Loss: {avg_eval:.4f}")
+
+            if avg_eval < self.best_eval_loss:
+                self.best_eval_loss = avg_eval
+                self.no_improve = 0
+                if self.checkpoint_path:
+                    self.save_checkpoint()
+                if log:
+                    log(f"  → New best model saved (Eval Loss: {self.best_eval_loss:.4f})")
+            else:
+                self.no_improve += 1
+                if log:
+                    log(f"  → No improvement for {self.no_improve}/{patience} epochs")
+                if patience is not None and self.no_improve >= patience:
+                    if log:
+                        log(f"Stopping early at epoch {self.epoch} (no improvement in last {patience} epochs)")
+                    break
+        return self.history
+
+    def state_dict(self) -> dict:
+        return {
+            "model":     self.model.state_dict(),
+            "optimizer": self.optimizer.state_dict(),
+            "scheduler": self.scheduler.state_dict(),
+            "scaler":    self.scaler.state_dict(),
+            "epoch":     self.epoch,
+            "best_eval_loss": self.best_eval_loss,
+            "no_improve": self.no_improve,
+            "history":   self.history,
+        }
+
+    def load_state_dict(self, state: dict):
+        self.model.load_state_dict(state["model"])
+        self.optimizer.load_state_dict(state["optimizer"])
+        self.scheduler.load_state_dict(state["scheduler"])
+        self.scaler.load_state_dict(state["scaler"])
+        self.epoch          = state["epoch"]
+        self.best_eval_loss = state["best_eval_loss"]
+        self.no_improve     = state["no_improve"]
+        self.history        = state["history"]
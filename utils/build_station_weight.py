@@ -11,6 +11,7 @@ def build_station_weights(df: pd.DataFrame) -> pd.DataFrame:
       station_name, normalized_reverse_weight
     """
     station_counts = df['station_name'].value_counts()
+    station_counts = station_counts[station_counts > 0]   # unused categories of a compact frame
 
     # Normalize so max count has weight = 1
     max_count = station_counts.max()
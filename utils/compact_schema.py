@@ -0,0 +1,159 @@
+"""
+Compact in-memory layout for the wide and long station frames.
+
+- ``station_name`` as a pandas categorical (one small integer code per row)
+- values as float32
+- ``Date`` as datetime64, optionally moved to a DatetimeIndex or replaced by
+  an int32 ``slot`` (15-minute steps since 1970-01-01)
+
+The compact long frame of the real 6-station data takes about a sixth of the
+memory of the object/float64 frame, and groupby/pivot on ``station_name``
+run on integer codes. ``expand_long`` / ``expand_wide`` convert back to the
+exact layout of ``convert_to_timeseries_long_format`` / ``all_data_df``.
+
+Note: after dropping stations from a compact frame, call
+``drop_unused_stations`` so the removed names do not linger as empty
+categories.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+VALUE_COL = 'Electricity(kW)'
+SLOT      = pd.Timedelta(minutes=15)
+_EPOCH    = pd.Timestamp("1970-01-01")
+_TIME_RE  = re.compile(r"^(\d{1,2}):(\d{2})$")
+
+
+def time_columns(df: pd.DataFrame) -> list[str]:
+    return [c for c in df.columns if _TIME_RE.match(str(c))]
+
+
+def _slot_minutes(col) -> int:
+    hours, minutes = _TIME_RE.match(str(col)).groups()
+    return int(hours) * 60 + int(minutes)
+
+
+def datetime_to_slot(dates) -> np.ndarray:
+    """int32 number of 15-minute slots since 1970-01-01."""
+    dates = pd.DatetimeIndex(dates)
+    return ((dates - _EPOCH) // SLOT).to_numpy(dtype=np.int64).astype(np.int32)
+
+
+def slot_to_datetime(slots) -> pd.DatetimeIndex:
+    return pd.DatetimeIndex(_EPOCH + np.asarray(slots, dtype=np.int64) * SLOT)
+
+
+def _station_category(values, stations=None):
+    categories = stations if stations is not None else sorted(pd.unique(np.asarray(values, dtype=object)))
+    return pd.Categorical(values, categories=categories)
+
+
+def _set_time_index(df: pd.DataFrame, index: str | None) -> pd.DataFrame:
+    if index is None:
+        return df
+    if index == "datetime":
+        return df.set_index('Date')
+    if index == "slot":
+        df.insert(1, 'slot', datetime_to_slot(df['Date']))
+        return df.drop(columns='Date').set_index('slot')
+    raise ValueError(f"Unknown index: {index}")
+
+
+def compact_long(long_df: pd.DataFrame, index: str | None = None,
+                 stations: list[str] | None = None) -> pd.DataFrame:
+    """
+    Compact copy of a long frame (station_name, Date, Electricity(kW)).
+
+    Parameters
+    ----------
+    index : {None, "datetime", "slot"}
+        Keep ``Date`` as a column, move it to a DatetimeIndex, or replace it
+        with an int32 slot index.
+    stations : list[str], optional
+        Category order (default: sorted station names, as in the notebooks).
+    """
+    out = pd.DataFrame({
+        'station_name': _station_category(long_df['station_name'], stations),
+        'Date':         pd.to_datetime(long_df['Date']).to_numpy(),
+        VALUE_COL:      long_df[VALUE_COL].to_numpy(dtype=np.float32),
+    })
+    return _set_time_index(out, index)
+
+
+def expand_long(df: pd.DataFrame) -> pd.DataFrame:
+    """Back to object station names, a ``Date`` column and float64 values."""
+    df = df.reset_index()
+    if 'slot' in df.columns:
+        df.insert(1, 'Date', slot_to_datetime(df.pop('slot')))
+    return pd.DataFrame({
+        'station_name': df['station_name'].astype(str).astype(object),
+        'Date':         pd.to_datetime(df['Date']),
+        VALUE_COL:      df[VALUE_COL].astype(np.float64),
+    })
+
+
+def compact_wide(wide: pd.DataFrame, stations: list[str] | None = None) -> pd.DataFrame:
+    """``all_data_df`` with categorical stations, datetime ``Date`` and float32 slot columns."""
+    out = wide.copy()
+    out['station_name'] = _station_category(wide['station_name'], stations)
+    out['Date'] = pd.to_datetime(wide['Date'])
+    cols = [c for c in wide.columns if c not in ('station_name', 'Date')]
+    out[cols] = wide[cols].astype(np.float32)
+    return out
+
+
+def expand_wide(wide: pd.DataFrame) -> pd.DataFrame:
+    out = wide.copy()
+    out['station_name'] = wide['station_name'].astype(str).astype(object)
+    cols = [c for c in wide.columns if c not in ('station_name', 'Date')]
+    out[cols] = wide[cols].astype(np.float64)
+    return out
+
+
+def wide_to_long_compact(wide: pd.DataFrame, index: str | None = None,
+                         stations: list[str] | None = None) -> pd.DataFrame:
+    """
+    Compact equivalent of ``convert_to_timeseries_long_format``: the 96 slot
+    columns are flattened with NumPy and timestamps are built as
+    day + slot offset, instead of melting and parsing "Date Time" strings.
+    Rows are sorted by (station_name, Date).
+    """
+    cols    = time_columns(wide)
+    offsets = np.array([_slot_minutes(c) for c in cols], dtype='timedelta64[m]')
+    days    = pd.to_datetime(wide['Date']).dt.normalize().to_numpy()
+    values  = wide[cols].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float32)
+    station = _station_category(wide['station_name'], stations)
+
+    n_rows, n_cols = values.shape
+    dates = (days[:, None] + offsets[None, :]).ravel()
+    codes = np.repeat(station.codes, n_cols)
+    order = np.lexsort((dates, codes))
+    out = pd.DataFrame({
+        'station_name': pd.Categorical.from_codes(codes[order], categories=station.categories),
+        'Date':         dates[order],
+        VALUE_COL:      values.ravel()[order],
+    })
+    return _set_time_index(out, index)
+
+
+def drop_unused_stations(df: pd.DataFrame) -> pd.DataFrame:
+    if isinstance(df['station_name'].dtype, pd.CategoricalDtype):
+        df = df.assign(station_name=df['station_name'].cat.remove_unused_categories())
+    return df
+
+
+def read_long_csv(path: str, compact: bool = True, index: str | None = None) -> pd.DataFrame:
+    """Read ``all_data_timeseries.csv`` straight into the compact (or standard) layout."""
+    if not compact:
+        return pd.read_csv(path, parse_dates=['Date'])
+    df = pd.read_csv(path, parse_dates=['Date'],
+                     dtype={'station_name': 'category', VALUE_COL: np.float32})
+    df['station_name'] = df['station_name'].cat.reorder_categories(
+        sorted(df['station_name'].cat.categories))
+    return _set_time_index(df, index)
+
+
+def memory_mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / 2 ** 20
@@ -3,6 +3,10 @@ import re
 import pandas as pd
 from datetime import datetime
 
+from utils.compact_schema import compact_wide, wide_to_long_compact
+from utils.fast_excel import read_station_month
+from utils.instrumentation import span
+
 def clean_header_and_drop_unused_rows(tmp_df):
     tmp_df.columns = tmp_df.iloc[0]
     tmp_df = tmp_df[1:].reset_index(drop=True)
@@ -68,39 +72,172 @@ def run_pipeline(
     preprocessed_csv_dir="preprocessed_data",
     final_wide_csv="all_data_df.csv",
     final_long_csv="all_data_timeseries.csv",
+    engine="pandas",
+    num_workers=None,
+    compact=False,
+    reader="pandas",
 ):
+    """
+    Excel workbooks → wide ``all_data_df`` and long time-series frames.
+
+    ``compact=True`` returns both frames in the compact layout of
+    ``utils.compact_schema`` (categorical stations, float32 values) and
+    builds the long frame without string parsing; the CSVs are unchanged.
+
+    ``reader="openpyxl"`` reads each workbook straight into a float64 block
+    with ``utils.fast_excel`` (same dtypes and CSVs as the pandas reader) and skips the cleaned/preprocessed CSV steps
+    (``cleaned_csv_dir`` and ``preprocessed_csv_dir`` are not written).
+    """
+    if engine == "dask":
+        return run_pipeline_dask(root_xlsx_dir, final_wide_csv, final_long_csv,
+                                 num_workers=num_workers, reader=reader)
+    if engine != "pandas":
+        raise ValueError(f"Unknown engine: {engine}")
+    if reader == "openpyxl":
+        return _run_pipeline_direct(root_xlsx_dir, final_wide_csv, final_long_csv, compact)
+    if reader != "pandas":
+        raise ValueError(f"Unknown reader: {reader}")
+
     # --- Step 1: Excel → cleaned CSV
-    os.makedirs(cleaned_csv_dir, exist_ok=True)
-    for fp, rel in gather_files(root_xlsx_dir, ".xlsx"):
-        df = pd.read_excel(fp)
-        dfc = clean_header_and_drop_unused_rows(df)
-        out = os.path.join(cleaned_csv_dir, rel).replace(".xlsx", ".csv")
-        os.makedirs(os.path.dirname(out), exist_ok=True)
-        dfc.to_csv(out, index=False)
+    with span("pipeline.step1_excel_to_cleaned_csv"):
+        os.makedirs(cleaned_csv_dir, exist_ok=True)
+        for fp, rel in gather_files(root_xlsx_dir, ".xlsx"):
+            with span("pipeline.read_excel", file=rel):
+                df = pd.read_excel(fp)
+            dfc = clean_header_and_drop_unused_rows(df)
+            out = os.path.join(cleaned_csv_dir, rel).replace(".xlsx", ".csv")
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+            dfc.to_csv(out, index=False)
 
     # --- Step 2: cleaned CSV → preprocessed CSV
-    os.makedirs(preprocessed_csv_dir, exist_ok=True)
-    for fp, rel in gather_files(cleaned_csv_dir, ".csv"):
-        df = pd.read_csv(fp)
-        dfp = preprocess_and_add_datetime(df, os.path.basename(fp))
-        station = rel.split(os.sep)[0]
-        dfp.insert(0, 'station_name', station)
-        out = os.path.join(preprocessed_csv_dir, rel)
-        os.makedirs(os.path.dirname(out), exist_ok=True)
-        dfp.to_csv(out, index=False)
+    with span("pipeline.step2_preprocess"):
+        os.makedirs(preprocessed_csv_dir, exist_ok=True)
+        for fp, rel in gather_files(cleaned_csv_dir, ".csv"):
+            df = pd.read_csv(fp)
+            dfp = preprocess_and_add_datetime(df, os.path.basename(fp))
+            station = rel.split(os.sep)[0]
+            dfp.insert(0, 'station_name', station)
+            out = os.path.join(preprocessed_csv_dir, rel)
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+            dfp.to_csv(out, index=False)
 
     # --- Step 3: concatenate wide
-    all_df = concatenate_preprocessed_data(preprocessed_csv_dir)
-    if not all_df.empty:
-        all_df.to_csv(final_wide_csv, index=False)
-    else:
-        print("⚠️ No data to concatenate (wide).")
+    with span("pipeline.step3_concatenate_wide"):
+        all_df = concatenate_preprocessed_data(preprocessed_csv_dir)
+        if not all_df.empty:
+            all_df.to_csv(final_wide_csv, index=False)
+            if compact:
+                all_df = compact_wide(all_df)
+        else:
+            print("⚠️ No data to concatenate (wide).")
 
     # --- Step 4: long time‑series
-    if not all_df.empty:
-        long_df = convert_to_timeseries_long_format(all_df)
-        long_df.to_csv(final_long_csv, index=False)
-    else:
-        print("⚠️ No data to convert (long).")
+    with span("pipeline.step4_long_format"):
+        if not all_df.empty:
+            with span("pipeline.melt", rows=len(all_df)):
+                if compact:
+                    long_df = wide_to_long_compact(all_df)
+                else:
+                    long_df = convert_to_timeseries_long_format(all_df)
+            long_df.to_csv(final_long_csv, index=False)
+        else:
+            print("⚠️ No data to convert (long).")
 
     return all_df, (long_df if 'long_df' in locals() else pd.DataFrame())
+
+
+def _run_pipeline_direct(root_xlsx_dir, final_wide_csv, final_long_csv, compact=False):
+    """run_pipeline with the direct openpyxl reader: Excel → wide frame in memory."""
+    with span("pipeline.step1_direct_read"):
+        parts = []
+        for fp, rel in gather_files(root_xlsx_dir, ".xlsx"):
+            with span("pipeline.read_excel", file=rel):
+                parts.append(read_station_month(fp, rel.split(os.sep)[0]))
+        all_df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+    with span("pipeline.step3_concatenate_wide"):
+        if all_df.empty:
+            print("⚠️ No data to concatenate (wide).")
+            return all_df, pd.DataFrame()
+        all_df.to_csv(final_wide_csv, index=False)
+        if compact:
+            all_df = compact_wide(all_df)
+
+    with span("pipeline.step4_long_format"):
+        with span("pipeline.melt", rows=len(all_df)):
+            long_df = wide_to_long_compact(all_df) if compact else convert_to_timeseries_long_format(all_df)
+        long_df.to_csv(final_long_csv, index=False)
+    return all_df, long_df
+
+
+# --- Out-of-core mode -------------------------------------------------------
+
+def _month_sort_key(item):
+    fp, rel = item
+    match = re.search(r"(\d{2})-(\d{4})", os.path.basename(fp))
+    ym = (int(match.group(2)), int(match.group(1))) if match else (0, 0)
+    return rel.split(os.sep)[0], ym
+
+
+def load_station_month(fp, rel, reader="pandas"):
+    """
+    Excel → cleaned → preprocessed wide frame for one station-month,
+    entirely in memory (no intermediate CSVs).
+    """
+    if reader == "openpyxl":
+        return read_station_month(fp, rel.split(os.sep)[0])
+    df = clean_header_and_drop_unused_rows(pd.read_excel(fp))
+    df.columns = [str(c) for c in df.columns]
+    df = preprocess_and_add_datetime(df, os.path.basename(fp))
+    df.insert(0, 'station_name', rel.split(os.sep)[0])
+    return df
+
+
+def run_pipeline_dask(
+    root_xlsx_dir="Load-data",
+    final_wide_csv="all_data_df.csv",
+    final_long_csv="all_data_timeseries.csv",
+    num_workers=None,
+    reader="pandas",
+):
+    """
+    Dask-backed run_pipeline: one partition per station-month workbook.
+
+    Nothing is concatenated in memory. The wide and long datasets are built
+    lazily, computed with the local multi-process scheduler and written one
+    CSV per partition under directories named after the final CSVs
+    (e.g. 'all_data_df/' and 'all_data_timeseries/'). Partitions are ordered
+    by (station, year, month), so each output stays sorted per station.
+
+    Returns the lazy (wide, long) dask DataFrames backed by the written files.
+    """
+    import dask
+    import dask.dataframe as dd
+
+    files = sorted(gather_files(root_xlsx_dir, ".xlsx"), key=_month_sort_key)
+    if not files:
+        print("⚠️ No data to concatenate (wide).")
+        return pd.DataFrame(), pd.DataFrame()
+
+    parts   = [dask.delayed(load_station_month)(fp, rel, reader) for fp, rel in files]
+    wide_dd = dd.from_delayed(parts, verify_meta=False)
+    long_dd = wide_dd.map_partitions(convert_to_timeseries_long_format)
+
+    wide_dir = os.path.splitext(final_wide_csv)[0]
+    long_dir = os.path.splitext(final_long_csv)[0]
+    os.makedirs(wide_dir, exist_ok=True)
+    os.makedirs(long_dir, exist_ok=True)
+
+    names = [f"{i:05d}" for i in range(len(files))]
+    writes = [
+        wide_dd.to_csv(os.path.join(wide_dir, "*.csv"), index=False,
+                       name_function=names.__getitem__, compute=False),
+        long_dd.to_csv(os.path.join(long_dir, "*.csv"), index=False,
+                       name_function=names.__getitem__, compute=False),
+    ]
+    # shared read tasks are executed once for both outputs
+    dask.compute(*writes, scheduler="processes", num_workers=num_workers)
+
+    wide_out = dd.read_csv(os.path.join(wide_dir, "*.csv"), parse_dates=['Date'])
+    long_out = dd.read_csv(os.path.join(long_dir, "*.csv"), parse_dates=['Date'])
+    return wide_out, long_out
@@ -0,0 +1,208 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Bit flags stored per (station, day, slot)
+MISSING        = 1    # NaN value or whole day absent
+NEGATIVE       = 2    # reading < 0
+FLATLINE       = 4    # part of a run of identical readings
+SPIKE          = 8    # isolated jump up-and-back (or down-and-back)
+DUPLICATE_DAY  = 16   # 96-slot profile identical to the previous day
+MONTH_MISMATCH = 32   # month row count != calendar days, or (station, Date) duplicated
+
+FLAG_NAMES = {
+    MISSING: 'missing',
+    NEGATIVE: 'negative',
+    FLATLINE: 'flatline',
+    SPIKE: 'spike',
+    DUPLICATE_DAY: 'duplicate_day',
+    MONTH_MISMATCH: 'month_mismatch',
+}
+ALL_FLAGS = sum(FLAG_NAMES)
+
+
+class QualityIndex:
+    """
+    Compact bitmask over the (station, day, slot) matrix.
+
+    mask[s, d, k] holds the OR of the flags above for station ``stations[s]``,
+    day ``days[d]`` and 15-minute slot ``k``. One byte per reading, so a year
+    of 100 meters is ~3.5 MB.
+    """
+
+    def __init__(self, mask: np.ndarray, stations: list[str], days: pd.DatetimeIndex,
+                 slots_per_day: int = 96):
+        self.mask          = mask
+        self.stations      = list(stations)
+        self.days          = pd.DatetimeIndex(days)
+        self.slots_per_day = slots_per_day
+
+    @property
+    def timestamps(self) -> pd.DatetimeIndex:
+        step = pd.Timedelta(days=1) / self.slots_per_day
+        return pd.date_range(self.days[0], periods=len(self.days) * self.slots_per_day, freq=step)
+
+    def slot_frame(self) -> pd.DataFrame:
+        """(timestamp × station) frame of flag bytes, same layout as the training pivot."""
+        flat = self.mask.reshape(len(self.stations), -1).T
+        return pd.DataFrame(flat, index=self.timestamps, columns=self.stations)
+
+    def summary(self) -> pd.DataFrame:
+        """Number of flagged slots per station and flag."""
+        rows = []
+        for s, station in enumerate(self.stations):
+            m = self.mask[s]
+            row = {'station_name': station}
+            for bit, name in FLAG_NAMES.items():
+                row[name] = int(np.count_nonzero(m & bit))
+            row['clean'] = int(np.count_nonzero(m == 0))
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    def window_flags(self, index, seq_len: int, station_names: list[str] | None = None,
+                     ignore: int = 0) -> np.ndarray:
+        """
+        OR of flags over every sliding window of ``seq_len`` rows.
+
+        ``index`` is the Date index of the pivot the windows are cut from
+        (``pivot_to_tensor`` window i covers ``index[i:i+seq_len]``), so the
+        result lines up one-to-one with those windows. Timestamps not covered
+        by the scan count as MISSING. Bits in ``ignore`` are cleared first.
+        """
+        station_names = station_names or self.stations
+        frame = self.slot_frame().reindex(index=pd.DatetimeIndex(index), columns=station_names)
+        flags = frame.fillna(MISSING).to_numpy(dtype=np.uint8) & np.uint8(ALL_FLAGS & ~ignore)
+        row_flags = np.bitwise_or.reduce(flags, axis=1)                   # (T,)
+
+        n_win = len(row_flags) - seq_len + 1
+        if n_win <= 0:
+            return np.zeros(0, dtype=np.uint8)
+        out = np.zeros(n_win, dtype=np.uint8)
+        for bit in FLAG_NAMES:
+            hits = np.concatenate([[0], np.cumsum((row_flags & bit) != 0)])
+            out |= np.where(hits[seq_len:] - hits[:-seq_len] > 0, bit, 0).astype(np.uint8)
+        return out
+
+    def window_weights(self, index, seq_len: int, station_names: list[str] | None = None,
+                       ignore: int = 0) -> np.ndarray:
+        """Fraction of clean (station, slot) cells in each sliding window."""
+        station_names = station_names or self.stations
+        frame = self.slot_frame().reindex(index=pd.DatetimeIndex(index), columns=station_names)
+        flags = frame.fillna(MISSING).to_numpy(dtype=np.uint8) & np.uint8(ALL_FLAGS & ~ignore)
+        clean = (flags == 0).mean(axis=1)                                  # (T,)
+
+        n_win = len(clean) - seq_len + 1
+        if n_win <= 0:
+            return np.zeros(0, dtype=np.float32)
+        c = np.concatenate([[0.0], np.cumsum(clean)])
+        return ((c[seq_len:] - c[:-seq_len]) / seq_len).astype(np.float32)
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(
+            path,
+            mask=self.mask,
+            stations=np.asarray(self.stations, dtype=object),
+            days=self.days.values.astype('datetime64[ns]'),
+            slots_per_day=self.slots_per_day,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "QualityIndex":
+        z = np.load(path, allow_pickle=True)
+        return cls(z['mask'], z['stations'].tolist(), pd.DatetimeIndex(z['days']),
+                   int(z['slots_per_day']))
+
+
+def _run_lengths(x: np.ndarray) -> np.ndarray:
+    """Length of the run of equal values each cell belongs to, per row of x."""
+    change = np.ones(x.shape, dtype=bool)
+    change[:, 1:] = x[:, 1:] != x[:, :-1]
+    ids = np.cumsum(change.ravel()) - 1
+    return np.bincount(ids)[ids].reshape(x.shape)
+
+
+def scan_data_quality(
+    df: pd.DataFrame,
+    station_col: str = 'station_name',
+    date_col: str = 'Date',
+    flatline_slots: int = 16,
+    spike_z: float = 8.0,
+) -> QualityIndex:
+    """
+    Scan the wide ``all_data_df`` (one 96-slot row per station-day) once and
+    build a ``QualityIndex``.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Wide frame from ``run_pipeline`` / ``concatenate_preprocessed_data``.
+    flatline_slots : int, default 16
+        Minimum run of identical readings (in slots) flagged as FLATLINE;
+        16 slots = 4 hours.
+    spike_z : float, default 8.0
+        A slot is a SPIKE when both the jump into it and the jump out of it
+        exceed ``spike_z`` robust standard deviations of the station's
+        slot-to-slot differences, with opposite signs.
+
+    Returns
+    -------
+    QualityIndex
+    """
+    time_columns = [c for c in df.columns if re.match(r"^\d{1,2}:\d{2}$", str(c))]
+    n_slots = len(time_columns)
+
+    wide = df[[station_col, date_col] + time_columns].copy()
+    wide[date_col] = pd.to_datetime(wide[date_col]).dt.normalize()
+
+    # month boundary mismatches from preprocess_and_add_datetime: dates are
+    # assigned by row count, so a short/long sheet shifts or overflows them
+    dup = wide.duplicated([station_col, date_col], keep=False)
+    ym  = wide[date_col].dt.to_period('M')
+    per_month = wide.groupby([wide[station_col], ym])[date_col].transform('size')
+    bad_month = (per_month != wide[date_col].dt.days_in_month) | dup
+    wide = wide.assign(_mismatch=bad_month.to_numpy())
+    wide = wide.drop_duplicates([station_col, date_col], keep='first')
+
+    stations = sorted(wide[station_col].unique())
+    days = pd.date_range(wide[date_col].min(), wide[date_col].max(), freq='D')
+    S, D = len(stations), len(days)
+
+    s_idx = pd.Index(stations).get_indexer(wide[station_col])
+    d_idx = days.get_indexer(wide[date_col])
+
+    values = np.full((S, D, n_slots), np.nan, dtype=np.float32)
+    values[s_idx, d_idx] = wide[time_columns].apply(pd.to_numeric, errors='coerce').to_numpy(np.float32)
+    mismatch = np.zeros((S, D), dtype=bool)
+    mismatch[s_idx, d_idx] = wide['_mismatch'].to_numpy()
+
+    mask = np.zeros((S, D, n_slots), dtype=np.uint8)
+    nan = np.isnan(values)
+    mask[nan] |= MISSING
+    mask[values < 0] |= NEGATIVE
+    mask[mismatch] |= MONTH_MISMATCH
+
+    # flatlines over the continuous per-station series
+    flat = values.reshape(S, -1)
+    runs = _run_lengths(flat).reshape(S, D, n_slots)
+    mask[(runs >= flatline_slots) & ~nan] |= FLATLINE
+
+    # spikes: large opposite-signed jumps in and out of a slot
+    # (scale from non-zero jumps only: long idle stretches would otherwise
+    # push the MAD to ~0 and flag every switch-on as a spike)
+    d = np.diff(flat, axis=1)
+    d_nz = np.where(d != 0, d, np.nan)
+    mad = np.nanmedian(np.abs(d_nz - np.nanmedian(d_nz, axis=1, keepdims=True)), axis=1, keepdims=True)
+    thresh = spike_z * 1.4826 * np.maximum(np.nan_to_num(mad), 1e-6)
+    d_in, d_out = d[:, :-1], d[:, 1:]
+    spike = (np.abs(d_in) > thresh) & (np.abs(d_out) > thresh) & (np.sign(d_in) != np.sign(d_out))
+    spike_full = np.zeros_like(flat, dtype=bool)
+    spike_full[:, 1:-1] = spike
+    mask[spike_full.reshape(S, D, n_slots)] |= SPIKE
+
+    # day profile identical to the previous day (ignore all-NaN days)
+    same = np.zeros((S, D), dtype=bool)
+    same[:, 1:] = np.all(values[:, 1:] == values[:, :-1], axis=2)
+    mask[same] |= DUPLICATE_DAY
+
+    return QualityIndex(mask, stations, days, n_slots)
@@ -0,0 +1,305 @@
+"""
+Streaming drift monitor for live (actual, predicted) readings.
+
+Each 15-minute reading updates, in O(1) and without keeping any history:
+
+- exponentially weighted error sums per station × hour-of-day, per station
+  and over all stations, from which MAE / MSE / RMSE / WAPE / Bias follow
+  with the definitions of ``compute_station_metrics`` (error = predicted −
+  actual; WAPE weighted by ``normalized_reverse_weight``). With
+  ``halflife=None`` nothing decays and ``metrics()`` equals
+  ``compute_station_metrics`` over everything seen so far.
+- per-station change-point tests, run once per ``test_window`` (default one
+  day) on that window's mean |error| and mean error, accumulated reading by
+  reading (single 15-minute errors are too heavy tailed and autocorrelated
+  for these tests). Both are taken relative to the station's mean load and
+  standardized with the mean / std of the first ``warmup`` windows, then
+  clipped to ±``clip``:
+  Page–Hinkley on the absolute ratio (accuracy getting worse) and a
+  two-sided CUSUM on the signed one (a new over/under-forecast bias).
+- an optional WAPE guard against the offline report: alert when a station's
+  EW WAPE exceeds its ``baseline`` WAPE by more than ``wape_tolerance``
+  (again only after it fell back below half that margin).
+
+Every alert is returned by ``update``, kept in ``alerts`` and passed to
+``on_alert``; a test that fired starts over for that station, the others
+keep their state (a bias alarm does not hide a later accuracy drop).
+
+    monitor = DriftMonitor(station_names, build_station_weights(train_df), baseline=metrics_df)
+    for date, actual, predicted in stream:          # one slot, all stations
+        for alert in monitor.update(date, actual, predicted):
+            ...                                      # schedule retraining
+"""
+import numpy as np
+import pandas as pd
+
+SLOT   = pd.Timedelta(minutes=15)
+_EPOCH = pd.Timestamp("1970-01-01")
+STATS  = ("n", "abs", "sq", "err", "w_abs", "w_act")
+TESTS  = {                                # alert kind -> state arrays it owns
+    "page_hinkley": ("_ph_n", "_ph_mean", "_ph_m", "_ph_min"),
+    "cusum_over":   ("_cu_pos",),
+    "cusum_under":  ("_cu_neg",),
+}
+
+
+class DriftMonitor:
+    """
+    Parameters
+    ----------
+    station_names : list[str]
+        Station order of the arrays passed to ``update``.
+    station_weights_df : pd.DataFrame, optional
+        ``build_station_weights`` output; all weights 1 when omitted.
+    baseline : pd.DataFrame, optional
+        ``compute_station_metrics`` output of the offline evaluation.
+    halflife : str or Timedelta or None
+        Age at which a reading counts half in the EW metrics.
+    test_window : str or Timedelta
+        Aggregation window of the change-point tests.
+    warmup : int
+        Windows per station used to calibrate the change-point tests.
+    ph_delta, ph_threshold : float
+        Page–Hinkley tolerance and alarm level (in warmup std units).
+    cusum_k, cusum_h : float
+        CUSUM slack and alarm level (in warmup std units).
+    clip : float
+        Standardized window values are clipped to ±clip before the tests.
+    """
+    def __init__(self, station_names, station_weights_df=None, baseline=None, halflife="7D",
+                 test_window="1D", warmup=14, ph_delta=0.25, ph_threshold=8.0, cusum_k=0.25,
+                 cusum_h=8.0, clip=3.0, wape_tolerance=0.25, on_alert=None):
+        self.station_names = list(station_names)
+        N = len(self.station_names)
+        self._pos = {s: i for i, s in enumerate(self.station_names)}
+
+        weights = np.ones(N)
+        if station_weights_df is not None:
+            w = station_weights_df.set_index('station_name')['normalized_reverse_weight']
+            weights = w.reindex(self.station_names).fillna(1.0).to_numpy(dtype=np.float64)
+        self.weights = weights
+
+        self.baseline_wape = np.full(N, np.nan)
+        if baseline is not None:
+            b = baseline.set_index('station_name')['WAPE'].astype(float)
+            self.baseline_wape = b.reindex(self.station_names).to_numpy(dtype=np.float64)
+
+        self.halflife       = None if halflife is None else pd.Timedelta(halflife) / SLOT
+        self.test_window    = pd.Timedelta(test_window) / SLOT
+        self.warmup         = warmup
+        self.ph_delta       = ph_delta
+        self.ph_threshold   = ph_threshold
+        self.cusum_k        = cusum_k
+        self.cusum_h        = cusum_h
+        self.clip           = clip
+        self.wape_tolerance = wape_tolerance
+        self.on_alert       = on_alert
+        self.alerts: list[dict] = []
+
+        # EW sums: cells 0..N*24-1 station×hour, then N stations, then all stations
+        n_cells = N * 24 + N + 1
+        self._sums = np.zeros((len(STATS), n_cells))
+        self._last = np.full(n_cells, -np.inf)
+        self._t0   = None
+
+        # change-point state per station
+        self._win_id = np.full(N, -1)
+        self._win    = np.zeros((4, N))       # open window: Σ|e|, Σe, Σactual, readings
+        self._seen   = np.zeros(N)            # closed windows
+        self._calib  = np.zeros((5, N))       # warmup sums of mean |e|, its square, mean e, its square, mean actual
+        self._level  = np.ones(N)             # warmup mean load: errors are taken relative to it
+        self._mu     = np.zeros((2, N))       # (|e|, e) ratio mean / std after warmup
+        self._sd     = np.ones((2, N))
+        self.reset_tests()
+        self._wape_high = np.zeros(N, dtype=bool)
+
+    def reset_tests(self, stations=None, tests=None):
+        """
+        Restart the change-point ``tests`` (keys of ``TESTS``, default all)
+        for ``stations`` (default all).
+        """
+        names = [a for t in (tests or TESTS) for a in TESTS[t]]
+        if stations is None:
+            N = len(self.station_names)
+            for name in names:
+                setattr(self, name, np.zeros(N))
+            return
+        for name in names:
+            getattr(self, name)[stations] = 0.0
+
+    # ---- ingestion -------------------------------------------------------
+
+    def _slot(self, date) -> float:
+        date = pd.Timestamp(date)
+        if self._t0 is None:
+            self._t0 = date
+        return (date - self._t0) / SLOT
+
+    def _decay(self, cells, t):
+        if self.halflife is not None:
+            self._sums[:, cells] *= 0.5 ** ((t - self._last[cells]) / self.halflife)
+        self._last[cells] = t
+
+    def update(self, date, actual, predicted) -> list[dict]:
+        """
+        Ingest one 15-minute slot for all stations (arrays in ``station_names``
+        order; NaN = no reading). Returns the alerts raised by it.
+        """
+        actual    = np.asarray(actual, dtype=np.float64)
+        predicted = np.asarray(predicted, dtype=np.float64)
+        ok = ~(np.isnan(actual) | np.isnan(predicted))
+        if not ok.any():
+            return []
+        idx = np.flatnonzero(ok)
+        return self._ingest(date, idx, actual[idx], predicted[idx])
+
+    def update_one(self, station_name, date, actual, predicted) -> list[dict]:
+        """Ingest a single station reading."""
+        if np.isnan(actual) or np.isnan(predicted):
+            return []
+        return self._ingest(date, np.array([self._pos[station_name]]),
+                            np.array([actual], dtype=np.float64), np.array([predicted], dtype=np.float64))
+
+    def _ingest(self, date, idx, a, p):
+        N = len(self.station_names)
+        t = self._slot(date)
+        hour = pd.Timestamp(date).hour
+        e = p - a
+        w = self.weights[idx]
+        v = np.stack([np.ones_like(e), np.abs(e), e * e, e, w * np.abs(e), w * a])      # [len(STATS), K]
+
+        # 1) EW sums: station×hour and station cells once each, the global cell gets all K
+        cells = np.concatenate([idx * 24 + hour, N * 24 + idx])
+        self._decay(cells, t)
+        self._decay(np.array([N * 25]), t)
+        self._sums[:, cells] += np.concatenate([v, v], axis=1)
+        self._sums[:, N * 25] += v.sum(axis=1)
+
+        # 2) change-point tests when a station's window closes
+        win = int(((pd.Timestamp(date) - _EPOCH) / SLOT) // self.test_window)      # midnight-aligned
+        closing = idx[(self._win_id[idx] >= 0) & (self._win_id[idx] != win)]
+        alerts = self._close_windows(date, closing) if len(closing) else []
+        self._win_id[idx] = win
+        self._win[:, idx] += np.stack([np.abs(e), e, a, np.ones_like(e)])
+        alerts += self._wape_guard(date, idx)
+
+        for alert in alerts:
+            self.alerts.append(alert)
+            if self.on_alert:
+                self.on_alert(alert)
+        return alerts
+
+    def _close_windows(self, date, i):
+        abs_e, err, act, n = self._win[:, i]
+        self._win[:, i] = 0.0
+        keep = n >= self.test_window / 2                        # skip mostly-empty windows
+        i = i[keep]
+        if not len(i):
+            return []
+        m_abs, m_err, m_act = abs_e[keep] / n[keep], err[keep] / n[keep], act[keep] / n[keep]
+        self._seen[i] += 1
+
+        warm = self._seen[i] <= self.warmup
+        if warm.any():
+            w = i[warm]
+            self._calib[:, w] += np.stack([m_abs[warm], m_abs[warm] ** 2, m_err[warm], m_err[warm] ** 2,
+                                           m_act[warm]])
+            done = w[self._seen[w] == self.warmup]
+            if len(done):
+                n_w   = float(self.warmup)
+                level = np.maximum(self._calib[4, done] / n_w, 1e-6)
+                mean  = self._calib[[0, 2]][:, done] / n_w
+                var   = self._calib[[1, 3]][:, done] / n_w - mean ** 2
+                self._level[done] = level
+                self._mu[:, done] = mean / level
+                self._sd[:, done] = np.sqrt(np.maximum(var, 1e-12)) / level
+        live = ~warm
+        if not live.any():
+            return []
+        i = i[live]
+        return self._tests(date, i, m_abs[live] / self._level[i], m_err[live] / self._level[i])
+
+    def _tests(self, date, i, x, z):
+        xs = np.clip((x - self._mu[0, i]) / self._sd[0, i], -self.clip, self.clip)
+        zs = np.clip((z - self._mu[1, i]) / self._sd[1, i], -self.clip, self.clip)
+
+        # Page–Hinkley for an increase of the absolute error
+        self._ph_n[i] += 1
+        self._ph_mean[i] += (xs - self._ph_mean[i]) / self._ph_n[i]
+        self._ph_m[i] += xs - self._ph_mean[i] - self.ph_delta
+        self._ph_min[i] = np.minimum(self._ph_min[i], self._ph_m[i])
+        ph = self._ph_m[i] - self._ph_min[i]
+
+        # two-sided CUSUM for a shift of the signed error (bias)
+        self._cu_pos[i] = np.maximum(0.0, self._cu_pos[i] + zs - self.cusum_k)
+        self._cu_neg[i] = np.maximum(0.0, self._cu_neg[i] - zs - self.cusum_k)
+
+        alerts = []
+        for kind, stat, thr in (("page_hinkley", ph, self.ph_threshold),
+                                ("cusum_over", self._cu_pos[i], self.cusum_h),
+                                ("cusum_under", self._cu_neg[i], self.cusum_h)):
+            fired = i[stat > thr]
+            alerts += [self._alert(date, s, kind, float(v), thr) for s, v in zip(fired, stat[stat > thr])]
+            self.reset_tests(fired, [kind])
+        return alerts
+
+    def _wape_guard(self, date, idx):
+        if np.isnan(self.baseline_wape[idx]).all():
+            return []
+        N = len(self.station_names)
+        n, w_abs, w_act = (self._sums[STATS.index(k), N * 24 + idx] for k in ("n", "w_abs", "w_act"))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            wape = w_abs / w_act
+        limit = self.baseline_wape[idx] * (1 + self.wape_tolerance)
+        rearm = wape < self.baseline_wape[idx] * (1 + self.wape_tolerance / 2)      # hysteresis
+        high  = (self._seen[idx] > self.warmup) & (wape > limit)
+        new   = high & ~self._wape_high[idx]
+        self._wape_high[idx] = (self._wape_high[idx] | high) & ~rearm
+        return [self._alert(date, s, "wape", float(v), float(l))
+                for s, v, l in zip(idx[new], wape[new], limit[new])]
+
+    def _alert(self, date, station_idx, kind, value, threshold) -> dict:
+        return {"Date": pd.Timestamp(date), "station_name": self.station_names[station_idx],
+                "kind": kind, "value": value, "threshold": threshold}
+
+    # ---- reporting -------------------------------------------------------
+
+    def _frame(self, sums) -> pd.DataFrame:
+        n, abs_, sq, err, w_abs, w_act = sums
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mse = sq / n
+            return pd.DataFrame({
+                'MAE':  abs_ / n,
+                'MSE':  mse,
+                'RMSE': np.sqrt(mse),
+                'WAPE': np.where(w_act != 0, w_abs / w_act, np.nan),
+                'Bias': err / n,
+                'weight': n,
+            })
+
+    def metrics(self, by_hour: bool = False, now=None) -> pd.DataFrame:
+        """
+        EW metrics in the ``compute_station_metrics`` layout (plus Bias and
+        the effective number of readings ``weight``), decayed to ``now``
+        (default: the last update).
+
+        ``by_hour=True`` returns one row per station and hour of day instead
+        of the per-station rows plus ``all_station``.
+        """
+        N = len(self.station_names)
+        sums = self._sums.copy()
+        if now is not None and self.halflife is not None:
+            sums *= 0.5 ** (np.maximum(self._slot(now) - self._last, 0) / self.halflife)
+        if by_hour:
+            df = self._frame(sums[:, :N * 24])
+            df.insert(0, 'hour', np.tile(np.arange(24), N))
+            df.insert(0, 'station_name', np.repeat(self.station_names, 24))
+            return df[df['weight'] > 0].reset_index(drop=True)
+        df = self._frame(sums[:, N * 24:])
+        df.insert(0, 'station_name', self.station_names + ['all_station'])
+        return df[df['weight'] > 0].reset_index(drop=True)
+
+    def retrain_candidates(self, since=None) -> list[str]:
+        """Stations with at least one alert (since ``since``)."""
+        since = pd.Timestamp(since) if since is not None else None
+        return sorted({a["station_name"] for a in self.alerts if since is None or a["Date"] >= since})
@@ -37,7 +37,7 @@ def compute_station_metrics(df_eval: pd.DataFrame, station_weights_df: pd.DataFr
     # 3) Per-station metrics
     station_metrics = (
         df
-        .groupby('station_name')
+        .groupby('station_name', observed=True)
         .apply(compute_metrics)
         .reset_index()
     )
@@ -0,0 +1,106 @@
+"""
+Direct reader for the monthly "รายงานสรุป Demand รายวัน" meter workbooks.
+
+``pd.read_excel`` + ``clean_header_and_drop_unused_rows`` + CSV round trip +
+``preprocess_and_add_datetime`` is replaced by one streaming pass over the
+sheet in openpyxl read-only mode: the header row (first cell ``Date``) and
+its 96 time-slot columns are located once, then only those cells of the day
+rows are pulled into a float64 (days, 96) array. Rows follow the same rules
+as the pandas path: rows with an empty ``Date`` cell (blank lines, colour
+legend) are dropped, non-numeric cells become NaN, and day ``i`` of the
+block is the i-th day of the month named in the file name. Values stay
+float64 like ``pd.read_excel`` so the CSVs match the pandas path digit for
+digit; the float32 layout is only produced on request, via
+``utils.compact_schema``.
+"""
+import os
+import re
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from utils.compact_schema import compact_wide
+
+_TIME_RE  = re.compile(r"^\d{1,2}:\d{2}$")
+_MONTH_RE = re.compile(r"(\d{2})-(\d{4})")
+
+
+def month_start_from_filename(filename: str) -> datetime:
+    match = _MONTH_RE.search(filename)
+    if not match:
+        raise ValueError(f"Cannot extract date from filename: {filename}")
+    return datetime(int(match.group(2)), int(match.group(1)), 1)
+
+
+def _to_float(v) -> float:
+    """pd.to_numeric(errors='coerce') for a single cell."""
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def read_meter_workbook(fp: str, max_header_rows: int = 20):
+    """
+    Read one meter workbook.
+
+    Returns
+    -------
+    dates : pd.DatetimeIndex
+        One day per kept row, starting at the month in the file name.
+    values : np.ndarray
+        float64 (days, n_slots) kW readings, NaN for missing/non-numeric cells.
+    slot_columns : list[str]
+        Header labels of the slot columns ("0:00" … "23:45").
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(fp, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+
+        # 1) locate the header row and the slot columns once
+        for i, row in enumerate(rows):
+            if row and row[0] is not None and str(row[0]).strip() == 'Date':
+                break
+            if i >= max_header_rows:
+                raise ValueError(f"No 'Date' header row in the first {max_header_rows} rows of {fp}")
+        else:
+            raise ValueError(f"No 'Date' header row in {fp}")
+        slot_idx     = [j for j, c in enumerate(row) if c is not None and _TIME_RE.match(str(c))]
+        slot_columns = [str(row[j]) for j in slot_idx]
+        lo, hi       = slot_idx[0], slot_idx[-1] + 1
+        contiguous   = slot_idx == list(range(lo, hi))
+
+        # 2) day rows: keep those with a non-empty Date cell
+        block = []
+        for row in rows:
+            if not row or row[0] is None or row[0] == '':
+                continue
+            block.append(row[lo:hi] if contiguous else tuple(row[j] for j in slot_idx))
+    finally:
+        wb.close()
+
+    # 3) numeric block in one go; fall back per cell when text slipped in
+    try:
+        values = np.array(block, dtype=np.float64).reshape(len(block), len(slot_idx))
+    except (TypeError, ValueError):
+        values = np.array([[_to_float(v) for v in r] for r in block], dtype=np.float64)
+
+    dates = pd.date_range(month_start_from_filename(os.path.basename(fp)), periods=len(block), freq='D')
+    return dates, values, slot_columns
+
+
+def read_station_month(fp: str, station: str, compact: bool = False) -> pd.DataFrame:
+    """
+    One station-month in the preprocessed wide layout (station_name, Date, slots…).
+
+    float64 values by default; ``compact=True`` returns the
+    ``utils.compact_schema.compact_wide`` layout (categorical station, float32).
+    """
+    dates, values, slot_columns = read_meter_workbook(fp)
+    df = pd.DataFrame(values, columns=slot_columns)
+    df.insert(0, 'Date', dates)
+    df.insert(0, 'station_name', station)
+    return compact_wide(df) if compact else df
@@ -0,0 +1,204 @@
+import functools
+import json
+import os
+import resource
+import threading
+import time
+from contextlib import nullcontext
+
+_NULL_SPAN = nullcontext()
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MB (falls back to peak RSS off Linux)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def tensor_memory_mb() -> float | None:
+    """Allocated CUDA tensor memory in MB, or None on CPU-only runs."""
+    try:
+        import torch
+    except ImportError:
+        return None
+    if torch.cuda.is_available():
+        return torch.cuda.memory_allocated() / 2 ** 20
+    return None
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "attrs", "start")
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer, self.name, self.attrs = tracer, name, attrs
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer._record(self.name, self.start, time.perf_counter_ns() - self.start, self.attrs)
+        return False
+
+
+class Tracer:
+    """
+    Collects timing spans with RSS / tensor-memory samples.
+
+    Disabled tracers hand out a shared no-op context manager, so leaving
+    ``with tracer.span(...)`` in hot code costs one attribute check.
+
+    Usage:
+        tracer = get_tracer(); tracer.enable()
+        all_df, long_df = run_pipeline(...)
+        tracer.to_jsonl("trace.jsonl"); tracer.to_chrome_trace("trace.json")
+    """
+
+    def __init__(self, enabled: bool = False, sample_memory: bool = True):
+        self.enabled       = enabled
+        self.sample_memory = sample_memory
+        self.events: list[dict] = []
+        self._lock = threading.Lock()
+        self._t0   = time.perf_counter_ns()
+
+    def enable(self):
+        self.enabled = True
+        return self
+
+    def disable(self):
+        self.enabled = False
+        return self
+
+    def clear(self):
+        with self._lock:
+            self.events = []
+
+    def span(self, name: str, **attrs):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, attrs)
+
+    def _record(self, name, start_ns, dur_ns, attrs):
+        event = {
+            "name": name,
+            "start_us": (start_ns - self._t0) / 1e3,
+            "dur_us": dur_ns / 1e3,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+        }
+        if self.sample_memory:
+            event["rss_mb"] = current_rss_mb()
+            tensor_mb = tensor_memory_mb()
+            if tensor_mb is not None:
+                event["tensor_mb"] = tensor_mb
+        if attrs:
+            event["attrs"] = attrs
+        with self._lock:
+            self.events.append(event)
+
+    def summary(self):
+        """Total / mean / max duration (ms) and max RSS per span name."""
+        import pandas as pd
+        if not self.events:
+            return pd.DataFrame()
+        df = pd.DataFrame(self.events)
+        df["dur_ms"] = df["dur_us"] / 1e3
+        agg = {"dur_ms": ["count", "sum", "mean", "max"]}
+        if "rss_mb" in df:
+            agg["rss_mb"] = ["max"]
+        out = df.groupby("name").agg(agg)
+        out.columns = ["_".join(c) for c in out.columns]
+        return out.sort_values("dur_ms_sum", ascending=False)
+
+    def to_jsonl(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for e in self.events:
+                f.write(json.dumps(e, ensure_ascii=False, default=str) + "\n")
+
+    def to_chrome_trace(self, path: str) -> None:
+        """Write the spans in Chrome trace format (chrome://tracing, Perfetto)."""
+        trace = []
+        for e in self.events:
+            args = dict(e.get("attrs", {}))
+            for k in ("rss_mb", "tensor_mb"):
+                if k in e:
+                    args[k] = e[k]
+            trace.append({"name": e["name"], "ph": "X", "ts": e["start_us"], "dur": e["dur_us"],
+                          "pid": e["pid"], "tid": e["tid"], "args": args})
+            if "rss_mb" in e:
+                trace.append({"name": "rss_mb", "ph": "C", "ts": e["start_us"] + e["dur_us"],
+                              "pid": e["pid"], "args": {"rss_mb": e["rss_mb"]}})
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f, ensure_ascii=False, default=str)
+
+
+_TRACER = Tracer(enabled=os.environ.get("VPP_TRACE", "") not in ("", "0"))
+
+
+def get_tracer() -> Tracer:
+    """Process-wide tracer used by run_pipeline, the dataset helpers and model hooks."""
+    return _TRACER
+
+
+def span(name: str, **attrs):
+    return _TRACER.span(name, **attrs)
+
+
+def traced(name: str | None = None):
+    """Decorator wrapping a function call in a span on the global tracer."""
+    def deco(fn):
+        label = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _TRACER.enabled:
+                return fn(*args, **kwargs)
+            with _TRACER.span(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+def instrument_model(model, tracer: Tracer | None = None, block_types: tuple | None = None,
+                     prefix: str = "model"):
+    """
+    Register forward hooks that time the whole model and each ASTGCN block.
+
+    ``block_types`` defaults to torch_geometric_temporal's ``ASTGCNBlock``;
+    the hooks return early when the tracer is disabled. Returns the hook
+    handles; call ``h.remove()`` on each to detach.
+    """
+    tracer = tracer or _TRACER
+    if block_types is None:
+        from torch_geometric_temporal.nn.attention.astgcn import ASTGCNBlock
+        block_types = (ASTGCNBlock,)
+
+    starts  = {}
+    handles = []
+
+    def pre_hook(module, inputs):
+        if tracer.enabled:
+            starts.setdefault(id(module), []).append(time.perf_counter_ns())
+
+    def make_post_hook(label):
+        def post_hook(module, inputs, output):
+            stack = starts.get(id(module))
+            if tracer.enabled and stack:
+                t0 = stack.pop()
+                x = inputs[0] if inputs else None
+                attrs = {"shape": list(x.shape)} if hasattr(x, "shape") else {}
+                tracer._record(label, t0, time.perf_counter_ns() - t0, attrs)
+        return post_hook
+
+    targets = [(f"{prefix}.{type(model).__name__}.forward", model)]
+    for name, module in model.named_modules():
+        if isinstance(module, block_types):
+            targets.append((f"{prefix}.{name}", module))
+    for label, module in targets:
+        handles.append(module.register_forward_pre_hook(pre_hook))
+        handles.append(module.register_forward_hook(make_post_hook(label)))
+    return handles
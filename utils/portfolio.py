@@ -0,0 +1,321 @@
+"""
+Portfolio load scenarios from per-station forecasts and historical residuals.
+
+Scenarios are point forecast + residuals resampled with a joint block
+bootstrap: each scenario stitches ``block_len``-slot blocks of the
+historical residual grid (actual − predicted, all stations at once), so
+cross-station correlation and short-range autocorrelation survive. With
+``align_time_of_day`` a block only comes from the same time of day as the
+horizon steps it fills, which keeps the daily shape of the error spread.
+
+Multi-lead frames (``lead`` column, e.g. ``model.evaluate`` predictions) are
+kept as one residual path per past forecast origin: horizon step ``h`` is
+filled from lead ``h + 1`` errors, so the spread grows with the horizon as
+the model's errors do, and a block copies consecutive leads of one past
+forecast. Everything is one gather and one matmul over (scenarios,
+horizon, stations):
+
+    engine = ScenarioEngine.from_eval(df_eval)               # error_analysis frame
+    engine = ScenarioEngine.from_eval(predictions, pred_col="ASTGCN_V1")   # model.evaluate frame
+    scen   = engine.sample(forecast, n_scenarios=10_000, origin="2025-01-02")   # [S, H, N]
+    quantiles, peaks = engine.summarize(scen, groups=station_meta, origin="2025-01-02")
+
+``groups`` is station metadata in the ``build_station_weights`` layout: one
+row per ``station_name`` with a group column (and optionally a weight such
+as a contracted share of the building). A ``portfolio`` total over all
+stations is always included.
+"""
+import numpy as np
+import pandas as pd
+
+SLOTS_PER_DAY = 96
+SLOT          = pd.Timedelta(minutes=15)
+
+
+def _residuals(df_eval: pd.DataFrame, pred_col: str) -> pd.DataFrame:
+    if pred_col not in df_eval.columns:
+        raise KeyError(f"No prediction column {pred_col!r}; pass pred_col= (model.evaluate frames "
+                       f"have one column per model)")
+    return df_eval.assign(residual=df_eval['Electricity(kW)'] - df_eval[pred_col])
+
+
+def _phase(ts) -> np.ndarray:
+    ts = pd.DatetimeIndex(ts)
+    return np.asarray((ts - ts.normalize()) // SLOT) % SLOTS_PER_DAY
+
+
+def residual_grid(df_eval: pd.DataFrame, station_names: list[str] | None = None, lead: int | None = None,
+                  pred_col: str = 'Predicted(kW)'):
+    """
+    Residuals (actual − predicted) of an ``error_analyzer`` frame on a regular 15-minute grid.
+
+    A frame with several leads needs ``lead``: averaging across leads would
+    shrink the spread (``residual_paths`` keeps every lead).
+
+    Returns
+    -------
+    residuals : np.ndarray
+        float32 (T, N), NaN where a station has no pair.
+    start : pd.Timestamp
+        Timestamp of row 0.
+    station_names : list[str]
+    """
+    if 'lead' in df_eval.columns:
+        if lead is not None:
+            df_eval = df_eval[df_eval['lead'] == lead]
+        elif df_eval['lead'].nunique() > 1:
+            raise ValueError("df_eval has several leads; pass lead= or use residual_paths")
+    station_names = station_names or sorted(df_eval['station_name'].astype(str).unique())
+    res = _residuals(df_eval, pred_col)
+    pv = res.pivot_table(index='Date', columns='station_name', values='residual', aggfunc='mean', observed=True)
+    dates = pd.date_range(pv.index.min(), pv.index.max(), freq='15min')
+    pv = pv.reindex(index=dates, columns=station_names)
+    return pv.to_numpy(dtype=np.float32), dates[0], station_names
+
+
+def residual_paths(df_eval: pd.DataFrame, station_names: list[str] | None = None,
+                   pred_col: str = 'Predicted(kW)'):
+    """
+    Residual path of every past forecast in a multi-lead frame.
+
+    The origin of a row is ``Date - (lead - 1) * 15 min`` (lead 1 is the
+    first forecast slot, as in ``model.evaluate``).
+
+    Returns
+    -------
+    residuals : np.ndarray
+        float32 (O, L, N): origin, lead (ascending), station; NaN where missing.
+    origins : pd.DatetimeIndex
+    station_names : list[str]
+    """
+    station_names = station_names or sorted(df_eval['station_name'].astype(str).unique())
+    res    = _residuals(df_eval, pred_col)
+    lead   = res['lead'].to_numpy(dtype=np.int64)
+    origin = pd.to_datetime(res['Date']).to_numpy() - (lead - 1) * SLOT.to_timedelta64()
+    o, origins = pd.factorize(origin, sort=True)
+    l, leads   = pd.factorize(lead, sort=True)
+    s    = pd.Index(station_names).get_indexer(res['station_name'].astype(str))
+    keep = s >= 0
+    paths = np.full((len(origins), len(leads), len(station_names)), np.nan, dtype=np.float32)
+    paths[o[keep], l[keep], s[keep]] = res['residual'].to_numpy(dtype=np.float32)[keep]
+    return paths, pd.DatetimeIndex(origins), station_names
+
+
+class ScenarioEngine:
+    """
+    Parameters
+    ----------
+    residuals : array-like
+        (T, N) residual grid, or (O, L, N) per-origin residual paths where
+        horizon step ``h`` uses lead ``h``; NaN = missing, blocks containing
+        NaN are never drawn.
+    start : Timestamp, optional
+        Time of ``residuals[0]`` of a grid; needed for ``align_time_of_day``.
+    origins : array-like of Timestamp, optional
+        Forecast origin of each residual path; needed for ``align_time_of_day``.
+    block_len : int
+        Slots per bootstrap block (16 = 4 hours).
+    """
+    def __init__(self, residuals, station_names, start=None, block_len=16,
+                 align_time_of_day=True, seed=None, origins=None):
+        self.residuals     = np.ascontiguousarray(residuals, dtype=np.float32)
+        self.station_names = list(station_names)
+        self.block_len     = block_len
+        self.by_lead       = self.residuals.ndim == 3
+        self.rng           = np.random.default_rng(seed)
+        if self.by_lead:
+            self._init_paths(origins, align_time_of_day)
+        else:
+            self._init_grid(start, align_time_of_day)
+        self.residuals = np.nan_to_num(self.residuals)
+
+    def _init_grid(self, start, align_time_of_day):
+        self.start = pd.Timestamp(start) if start is not None else None
+        self.align = align_time_of_day and start is not None
+
+        # a block start is valid if the whole block has every station
+        T, b = len(self.residuals), self.block_len
+        if T < b:
+            raise ValueError(f"Need at least block_len={b} residual rows, got {T}")
+        ok = np.isfinite(self.residuals).all(axis=1).astype(np.int32)
+        run = np.convolve(ok, np.ones(b, dtype=np.int32), mode="valid")
+        self._starts = np.flatnonzero(run == b)
+        if len(self._starts) == 0:
+            raise ValueError("No complete residual block; lower block_len or check the residuals")
+        if self.align:
+            self._start_phase = (_phase([self.start])[0] + self._starts) % SLOTS_PER_DAY
+
+    def _init_paths(self, origins, align_time_of_day):
+        self.origins = pd.DatetimeIndex(origins) if origins is not None else None
+        self.align   = align_time_of_day and origins is not None
+        self.n_leads = self.residuals.shape[1]
+
+        # path o can fill block j if leads j*b .. (j+1)*b-1 are complete for every station
+        b  = self.block_len
+        ok = np.isfinite(self.residuals).all(axis=2)                                  # [O, L]
+        self._valid = np.stack([ok[:, j:j + b].all(axis=1) for j in range(0, self.n_leads, b)], axis=1)
+        if not self._valid.any(axis=0).all():
+            raise ValueError("Some lead block has no complete residual path; lower block_len or check the residuals")
+        if self.align:
+            self._origin_phase = _phase(self.origins)
+
+    @classmethod
+    def from_eval(cls, df_eval: pd.DataFrame, station_names: list[str] | None = None,
+                  lead: int | None = None, pred_col: str = 'Predicted(kW)', **kwargs):
+        """
+        Build from an ``error_analysis`` / ``model.evaluate`` predictions frame.
+
+        ``pred_col`` names the forecast column (a model name for
+        ``model.evaluate`` frames). A frame with several leads and no
+        ``lead`` becomes per-origin residual paths (``residual_paths``).
+        """
+        if lead is None and 'lead' in df_eval.columns and df_eval['lead'].nunique() > 1:
+            paths, origins, station_names = residual_paths(df_eval, station_names, pred_col)
+            return cls(paths, station_names, origins=origins, **kwargs)
+        residuals, start, station_names = residual_grid(df_eval, station_names, lead, pred_col)
+        return cls(residuals, station_names, start, **kwargs)
+
+    def _block_starts(self, n_scenarios, n_blocks, origin):
+        if not (self.align and origin is not None):
+            return self._starts[self.rng.integers(len(self._starts), size=(n_scenarios, n_blocks))]
+        phase  = _phase([origin])[0]
+        starts = np.empty((n_scenarios, n_blocks), dtype=np.int64)
+        for j in range(n_blocks):
+            want = (phase + j * self.block_len) % SLOTS_PER_DAY
+            cand = self._starts[self._start_phase == want]
+            if len(cand) == 0:                         # no block at that time of day: any block
+                cand = self._starts
+            starts[:, j] = cand[self.rng.integers(len(cand), size=n_scenarios)]
+        return starts
+
+    def _block_paths(self, n_scenarios, n_blocks, origin):
+        same = self._origin_phase == _phase([origin])[0] if self.align and origin is not None else None
+        paths = np.empty((n_scenarios, n_blocks), dtype=np.int64)
+        for j in range(n_blocks):
+            cand = np.flatnonzero(self._valid[:, j] & same) if same is not None else []
+            if len(cand) == 0:                         # no path from that time of day: any path
+                cand = np.flatnonzero(self._valid[:, j])
+            paths[:, j] = cand[self.rng.integers(len(cand), size=n_scenarios)]
+        return paths
+
+    def sample(self, forecast, n_scenarios: int = 10_000, origin=None, clip: bool = True) -> np.ndarray:
+        """
+        Load scenarios around a point forecast.
+
+        Parameters
+        ----------
+        forecast : array-like
+            [N, H] per-station forecast (station order of the engine), kW.
+        origin : Timestamp, optional
+            Time of forecast step 0 (for time-of-day aligned blocks).
+        clip : bool
+            Clip scenario loads at 0 kW.
+
+        Returns
+        -------
+        np.ndarray
+            float32 [n_scenarios, H, N].
+        """
+        forecast = np.asarray(forecast, dtype=np.float32)
+        N, H = forecast.shape
+        if N != len(self.station_names):
+            raise ValueError(f"forecast has {N} stations, engine has {len(self.station_names)}")
+        b = self.block_len
+        n_blocks = -(-H // b)
+        if self.by_lead:
+            if H > self.n_leads:
+                raise ValueError(f"forecast has {H} steps, residual paths only {self.n_leads} leads")
+            paths = self._block_paths(n_scenarios, n_blocks, origin)                  # [S, n_blocks]
+            idx   = np.repeat(paths, b, axis=1)[:, :H]                                # [S, H]
+            scen  = self.residuals[idx, np.arange(H)[None, :]]                         # [S, H, N]
+        else:
+            starts = self._block_starts(n_scenarios, n_blocks, origin)                # [S, n_blocks]
+            idx  = np.repeat(starts, b, axis=1)[:, :H] + (np.arange(H) % b)[None, :]  # [S, H]
+            scen = self.residuals[idx]                                                 # [S, H, N]
+        scen += forecast.T[None]
+        if clip:
+            np.maximum(scen, 0.0, out=scen)
+        return scen
+
+    def group_matrix(self, groups: pd.DataFrame | None = None, group_col: str = "group",
+                     weight_col: str | None = None) -> tuple[np.ndarray, list[str]]:
+        """(N, G) float32 membership/weight matrix and group names; ``portfolio`` (all stations) first."""
+        w = np.ones(len(self.station_names), dtype=np.float32)
+        meta = None
+        if groups is not None:
+            meta = groups.set_index('station_name').reindex(self.station_names)
+            if weight_col:
+                w = meta[weight_col].fillna(0).to_numpy(np.float32)
+        names, cols = ["portfolio"], [w]
+        if meta is not None and group_col in meta.columns:
+            for g in pd.unique(meta[group_col].dropna()):
+                names.append(str(g))
+                cols.append(np.where(meta[group_col].to_numpy() == g, w, 0).astype(np.float32))
+        return np.stack(cols, axis=1), names
+
+    def aggregate(self, scenarios, groups=None, group_col="group", weight_col=None):
+        """Group totals of every scenario: ([S, H, G], group names)."""
+        G, names = self.group_matrix(groups, group_col, weight_col)
+        return scenarios @ G, names
+
+    def summarize(self, scenarios, groups=None, group_col="group", weight_col=None, origin=None,
+                  quantiles=(0.05, 0.5, 0.95), thresholds=None, forecast=None):
+        """
+        Portfolio / group quantiles and peak probabilities.
+
+        Parameters
+        ----------
+        thresholds : float or dict, optional
+            kW level per group (or one for all) for exceedance probabilities.
+            Defaults to the peak of the group's point forecast when
+            ``forecast`` is given, i.e. "how likely is a higher peak than forecast".
+
+        Returns
+        -------
+        steps : pd.DataFrame
+            group, step (and Date with ``origin``), mean, q.. columns and
+            p_exceed = P(load > threshold) per horizon step.
+        peaks : pd.DataFrame
+            Per group: threshold, p_exceed_any (peak over the horizon above
+            it), peak mean and quantiles, most likely peak step and its probability.
+        """
+        agg, names = self.aggregate(scenarios, groups, group_col, weight_col)       # [S, H, G]
+        S, H, n_groups = agg.shape
+        q = np.asarray(quantiles)
+        qcols = [f"q{round(x * 100):02d}" for x in q]
+
+        if thresholds is None and forecast is not None:
+            G, _ = self.group_matrix(groups, group_col, weight_col)
+            point = np.asarray(forecast, dtype=np.float32).T @ G                      # [H, G]
+            thr = point.max(axis=0)
+        elif isinstance(thresholds, dict):
+            thr = np.array([thresholds.get(n, np.nan) for n in names], dtype=np.float32)
+        elif thresholds is not None:
+            thr = np.full(n_groups, thresholds, dtype=np.float32)
+        else:
+            thr = np.full(n_groups, np.nan, dtype=np.float32)
+
+        step_q = np.quantile(agg, q, axis=0)                                           # [Q, H, G]
+        steps = pd.DataFrame({
+            'group': np.repeat(names, H),
+            'step':  np.tile(np.arange(H), n_groups),
+            'mean':  agg.mean(axis=0).T.ravel(),
+            **{c: step_q[i].T.ravel() for i, c in enumerate(qcols)},
+            'p_exceed': np.where(np.isnan(thr), np.nan, (agg > thr).mean(axis=0)).T.ravel(),
+        })
+        if origin is not None:
+            steps.insert(2, 'Date', pd.Timestamp(origin) + steps['step'].to_numpy() * SLOT)
+
+        peak     = agg.max(axis=1)                                                     # [S, G]
+        peak_at  = agg.argmax(axis=1)
+        counts   = np.stack([np.bincount(peak_at[:, g], minlength=H) for g in range(n_groups)])
+        peaks = pd.DataFrame({
+            'group':        names,
+            'threshold':    thr,
+            'p_exceed_any': np.where(np.isnan(thr), np.nan, (peak > thr).mean(axis=0)),
+            'peak_mean':    peak.mean(axis=0),
+            **{f"peak_{c}": v for c, v in zip(qcols, np.quantile(peak, q, axis=0))},
+            'peak_step':    counts.argmax(axis=1),
+            'p_peak_step':  counts.max(axis=1) / S,
+        })
+        return steps, peaks
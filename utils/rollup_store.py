@@ -0,0 +1,228 @@
+"""
+Multi-resolution rollups of actuals, predictions and errors per station.
+
+The 15-minute long frame (``station_name, Date, Electricity(kW)`` and,
+for evaluation frames, ``Predicted(kW)``) is rolled up once into a pyramid
+
+    15min → hour → day → week      (week starts Monday)
+                       └→ month
+
+where every level keeps, per station and period, ``count / sum / min / max``
+and the timestamp of the max (``peak_time``) for each measure. Coarser
+levels are built from the level below, so nothing is recomputed from the raw
+frame. ``query`` answers a (range, resolution) request from the coarsest
+level whose periods tile both, e.g. a daily view of a year reads ~365 rows
+per station instead of ~35k.
+
+    store = RollupStore.build(df_eval)          # compute once
+    store.save("rollups")
+    store = RollupStore.load("rollups")
+    daily = store.query("2024-01-01", "2025-01-01", resolution="day",
+                        stations=["Data_A"], measures=["actual", "abs_error"])
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+LEVELS = ["15min", "hour", "day", "week", "month"]
+
+# pandas period alias per level and the level each one is rolled up from
+_PERIOD = {"15min": "15min", "hour": "h", "day": "D", "week": "W-SUN", "month": "M"}
+_SOURCE = {"hour": "15min", "day": "hour", "week": "day", "month": "day"}
+# levels whose periods are unions of periods of the key level
+_TILES  = {
+    "15min": set(LEVELS),
+    "hour":  {"hour", "day", "week", "month"},
+    "day":   {"day", "week", "month"},
+    "week":  {"week"},
+    "month": {"month"},
+}
+STATS = ["count", "sum", "min", "max", "peak_time"]
+
+
+def period_start(ts, level: str) -> pd.Series | pd.Timestamp:
+    """Start of the ``level`` period containing ``ts`` (Series or scalar)."""
+    if isinstance(ts, pd.Series):
+        return ts.dt.to_period(_PERIOD[level]).dt.start_time
+    return pd.Timestamp(ts).to_period(_PERIOD[level]).start_time
+
+
+def _measures(df: pd.DataFrame, value_col: str, pred_col: str) -> dict[str, pd.Series]:
+    out = {"actual": df[value_col].astype('float64')}
+    if pred_col in df.columns:
+        pred = df[pred_col].astype('float64')
+        out["predicted"] = pred
+        out["error"]     = pred - out["actual"]
+        out["abs_error"] = out["error"].abs()
+    return out
+
+
+def _merge_stats(df: pd.DataFrame, measures: list[str]) -> pd.DataFrame:
+    """Merge per-period stats of rows sharing (station_name, period)."""
+    keys = ['station_name', 'period']
+    g = df.groupby(keys, sort=True)
+    parts = []
+    for m in measures:
+        agg = g.agg(**{
+            f'{m}_count': (f'{m}_count', 'sum'),
+            f'{m}_sum':   (f'{m}_sum',   'sum'),
+            f'{m}_min':   (f'{m}_min',   'min'),
+            f'{m}_max':   (f'{m}_max',   'max'),
+        })
+        # peak time of the merged period = peak time of its largest sub-period
+        idx  = df[f'{m}_max'].fillna(-np.inf).groupby([df['station_name'], df['period']]).idxmax()
+        peak = df.loc[idx.values, keys + [f'{m}_peak_time']].set_index(keys)
+        peak.loc[agg[f'{m}_count'] == 0, f'{m}_peak_time'] = pd.NaT
+        parts.append(agg.join(peak))
+    return pd.concat(parts, axis=1).reset_index()
+
+
+def _combine(finer: pd.DataFrame, level: str, measures: list[str]) -> pd.DataFrame:
+    """Roll a finer level up to ``level``."""
+    df = finer.copy()
+    df['period'] = period_start(df['period'], level)
+    return _merge_stats(df, measures)
+
+
+class RollupStore:
+    def __init__(self, levels: dict[str, pd.DataFrame], measures: list[str]):
+        self.levels   = levels
+        self.measures = measures
+
+    # ---- build -----------------------------------------------------------
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, value_col: str = 'Electricity(kW)',
+              pred_col: str = 'Predicted(kW)', date_col: str = 'Date',
+              station_col: str = 'station_name') -> "RollupStore":
+        """
+        Build every level from a 15-minute long frame. ``pred_col`` is optional;
+        when present the predicted / error / abs_error measures are added.
+        """
+        base = pd.DataFrame({
+            'station_name': df[station_col].values,
+            'period':       period_start(pd.to_datetime(df[date_col]), "15min").values,
+        })
+        series   = _measures(df, value_col, pred_col)
+        measures = list(series)
+        for m, s in series.items():
+            v = s.values
+            base[f'{m}_count']     = (~np.isnan(v)).astype('int64')
+            base[f'{m}_sum']       = np.nan_to_num(v)
+            base[f'{m}_min']       = v
+            base[f'{m}_max']       = v
+            base[f'{m}_peak_time'] = base['period'].where(~np.isnan(v))
+
+        # duplicates in the raw frame (same station and slot) collapse here
+        levels = {"15min": _combine(base, "15min", measures)}
+        for level in LEVELS[1:]:
+            levels[level] = _combine(levels[_SOURCE[level]], level, measures)
+        return cls(levels, measures)
+
+    # ---- query -----------------------------------------------------------
+
+    def choose_level(self, start=None, end=None, resolution: str = "day") -> str:
+        """
+        Coarsest loaded level that tiles the requested ``resolution`` and
+        whose period boundaries fall on ``start`` and ``end``.
+
+        Raises
+        ------
+        ValueError
+            If no loaded level can answer the request (e.g. a 06:00 start
+            with only ``["day", "month"]`` loaded).
+        """
+        if resolution in LEVELS:
+            candidates = [l for l in LEVELS if resolution in _TILES[l]]
+        else:
+            step = pd.Timedelta(pd.tseries.frequencies.to_offset(resolution))
+            fixed = {"15min": pd.Timedelta("15min"), "hour": pd.Timedelta("1h"), "day": pd.Timedelta("1D")}
+            candidates = [l for l, d in fixed.items() if step % d == pd.Timedelta(0)]
+            if not candidates:
+                raise ValueError(f"resolution {resolution!r} is not a multiple of 15 minutes")
+
+        candidates = [l for l in candidates if l in self.levels]
+        for level in reversed(candidates):
+            if all(t is None or period_start(t, level) == pd.Timestamp(t) for t in (start, end)):
+                return level
+        raise ValueError(
+            f"No loaded level answers resolution {resolution!r} over [{start}, {end}); "
+            f"loaded levels: {list(self.levels)}. Load a finer level (e.g. RollupStore.load(dir, [..., '15min']))."
+        )
+
+    def query(self, start=None, end=None, resolution: str = "day",
+              stations: list[str] | None = None, measures: list[str] | None = None) -> pd.DataFrame:
+        """
+        Aggregates over ``[start, end)`` at ``resolution``.
+
+        Parameters
+        ----------
+        start, end : str or Timestamp, optional
+            Half-open time range; ``None`` means unbounded.
+        resolution : str
+            A level name (``"hour"``, ``"day"``, ``"week"``, ``"month"``…) or
+            a fixed pandas offset that is a multiple of 15 minutes (``"6h"``).
+        stations, measures : list, optional
+            Restrict the result (default: everything stored).
+
+        Returns
+        -------
+        pd.DataFrame
+            ``station_name, period`` plus ``<measure>_{count,sum,mean,min,max,peak_time}``.
+            ``df.attrs['level']`` is the stored level that was read.
+        """
+        measures = measures or self.measures
+        unknown  = set(measures) - set(self.measures)
+        if unknown:
+            raise KeyError(f"Measures not stored: {sorted(unknown)}")
+
+        level = self.choose_level(start, end, resolution)
+        df = self.levels[level]
+        mask = np.ones(len(df), dtype=bool)
+        if start is not None:
+            mask &= (df['period'] >= pd.Timestamp(start)).values
+        if end is not None:
+            mask &= (df['period'] < pd.Timestamp(end)).values
+        if stations is not None:
+            mask &= df['station_name'].isin(stations).values
+        cols = ['station_name', 'period'] + [f'{m}_{s}' for m in measures for s in STATS]
+        out = df.loc[mask, cols]
+
+        if resolution != level:
+            if resolution in LEVELS:
+                out = _combine(out, resolution, measures)
+            else:
+                out = out.copy()
+                out['period'] = out['period'].dt.floor(resolution)
+                out = _merge_stats(out, measures)
+
+        out = out.reset_index(drop=True)
+        for m in measures:
+            count = out[f'{m}_count']
+            out.insert(out.columns.get_loc(f'{m}_sum') + 1, f'{m}_mean',
+                       out[f'{m}_sum'].where(count > 0) / count.where(count > 0))
+        out.attrs['level'] = level
+        return out
+
+    # ---- persistence -----------------------------------------------------
+
+    def save(self, root_dir: str) -> None:
+        """One CSV per level, rows ordered by station then period."""
+        os.makedirs(root_dir, exist_ok=True)
+        for level, df in self.levels.items():
+            df.to_csv(os.path.join(root_dir, f"{level}.csv"), index=False)
+
+    @classmethod
+    def load(cls, root_dir: str, levels: list[str] | None = None) -> "RollupStore":
+        """Load stored levels (all by default; pass e.g. ``["day", "month"]`` for a dashboard)."""
+        out, measures = {}, None
+        for level in levels or LEVELS:
+            path = os.path.join(root_dir, f"{level}.csv")
+            head = pd.read_csv(path, nrows=0).columns
+            dates = ['period'] + [c for c in head if c.endswith('_peak_time')]
+            df = pd.read_csv(path, parse_dates=dates)
+            out[level] = df
+            measures = measures or [c[:-len('_count')] for c in head if c.endswith('_count')]
+        return cls(out, measures)
+
@@ -30,7 +30,7 @@ def split_train_test_data(df: pd.DataFrame,
     test_parts  = []
     
     # Group by station, sort by date, then split
-    for station, g in df.groupby(station_col):
+    for station, g in df.groupby(station_col, observed=True):
         g_sorted = g.sort_values(date_col)
         n = len(g_sorted)
         split_idx = int(n * train_ratio)
@@ -44,3 +44,28 @@ def split_train_test_data(df: pd.DataFrame,
     
     return train_df, test_df
 
+
+
+def split_threeway(df: pd.DataFrame,
+                   train_frac: float = 0.7,
+                   eval_frac: float = 0.1,
+                   date_col: str = 'Date',
+                   station_col: str = 'station_name'
+                  ) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Three-way chronological split per station (default 70% train / 10% eval / 20% test),
+    as used in the training notebooks.
+    """
+    train_list, eval_list, test_list = [], [], []
+    for station, sdf in df.groupby(station_col, observed=True):
+        sdf = sdf.sort_values(date_col)
+        n = len(sdf)
+        n_train = int(n * train_frac)
+        n_eval  = int(n * (train_frac + eval_frac)) - n_train
+        train_list.append(sdf.iloc[:n_train])
+        eval_list .append(sdf.iloc[n_train:n_train + n_eval])
+        test_list .append(sdf.iloc[n_train + n_eval:])
+    train_df = pd.concat(train_list).reset_index(drop=True)
+    eval_df  = pd.concat(eval_list ).reset_index(drop=True)
+    test_df  = pd.concat(test_list ).reset_index(drop=True)
+    return train_df, eval_df, test_df
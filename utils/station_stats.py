@@ -0,0 +1,312 @@
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+
+class QuantileSketch:
+    """
+    Small mergeable t-digest style sketch for streaming quantiles.
+
+    Values are kept as (mean, weight) centroids. Centroids near the tails are
+    kept small and centroids near the median are allowed to grow, so tail
+    quantiles (p01/p99) stay accurate while memory stays bounded by
+    roughly ``compression`` centroids.
+    """
+
+    def __init__(self, compression: int = 100):
+        self.compression = compression
+        self.means   = np.empty(0, dtype=np.float64)
+        self.weights = np.empty(0, dtype=np.float64)
+
+    @property
+    def total_weight(self) -> float:
+        return float(self.weights.sum())
+
+    def update(self, values) -> "QuantileSketch":
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[np.isfinite(values)]
+        if values.size:
+            self._absorb(values, np.ones_like(values))
+        return self
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        if other.means.size:
+            self._absorb(other.means, other.weights)
+        return self
+
+    def _absorb(self, means, weights):
+        means   = np.concatenate([self.means, means])
+        weights = np.concatenate([self.weights, weights])
+        order   = np.argsort(means, kind="mergesort")
+        means, weights = means[order], weights[order]
+
+        # k1 scale function: k(q) = delta / (2*pi) * asin(2q - 1). Every value
+        # goes to the unit-width k bin holding its left cumulative weight, so
+        # centroids stay small in the tails; each bin is then merged in bulk.
+        total  = weights.sum()
+        q_left = (np.cumsum(weights) - weights) / total
+        k      = self.compression / (2 * np.pi) * np.arcsin(np.clip(2 * q_left - 1, -1.0, 1.0))
+        bins   = np.floor(k - k[0]).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+
+        self.weights = np.add.reduceat(weights, starts)
+        self.means   = np.add.reduceat(means * weights, starts) / self.weights
+
+    def quantile(self, q: float) -> float:
+        if not self.means.size:
+            return np.nan
+        if self.means.size == 1:
+            return float(self.means[0])
+        # centroid mid-points on the cumulative weight axis
+        cum = np.cumsum(self.weights) - self.weights / 2
+        return float(np.interp(q * self.total_weight, cum, self.means))
+
+    def to_dict(self) -> dict:
+        return {
+            "compression": self.compression,
+            "means":   self.means.tolist(),
+            "weights": self.weights.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "QuantileSketch":
+        sk = cls(compression=d["compression"])
+        sk.means   = np.asarray(d["means"], dtype=np.float64)
+        sk.weights = np.asarray(d["weights"], dtype=np.float64)
+        return sk
+
+
+class StationStats:
+    """
+    Running count / mean / variance / min / max for one station.
+
+    Batches are folded in with the parallel form of Welford's algorithm
+    (Chan et al.), so two partial results can be merged exactly without
+    revisiting the raw values.
+    """
+
+    def __init__(self, compression: int = 100):
+        self.count  = 0
+        self.mean   = 0.0
+        self.m2     = 0.0
+        self.min    = np.inf
+        self.max    = -np.inf
+        self.sketch = QuantileSketch(compression)
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self.variance))
+
+    def _combine(self, n_b, mean_b, m2_b, min_b, max_b):
+        n_a = self.count
+        n   = n_a + n_b
+        if n_b == 0:
+            return
+        delta     = mean_b - self.mean
+        self.mean = self.mean + delta * n_b / n
+        self.m2   = self.m2 + m2_b + delta ** 2 * n_a * n_b / n
+        self.count = n
+        self.min  = min(self.min, min_b)
+        self.max  = max(self.max, max_b)
+
+    def update(self, values) -> "StationStats":
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[np.isfinite(values)]
+        if values.size:
+            mean_b = values.mean()
+            m2_b   = ((values - mean_b) ** 2).sum()
+            self._combine(values.size, mean_b, m2_b, values.min(), values.max())
+            self.sketch.update(values)
+        return self
+
+    def merge(self, other: "StationStats") -> "StationStats":
+        self._combine(other.count, other.mean, other.m2, other.min, other.max)
+        self.sketch.merge(other.sketch)
+        return self
+
+    def quantile(self, q: float) -> float:
+        return self.sketch.quantile(q)
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean":  self.mean,
+            "m2":    self.m2,
+            "min":   self.min if self.count else None,
+            "max":   self.max if self.count else None,
+            "sketch": self.sketch.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "StationStats":
+        st = cls()
+        st.count  = int(d["count"])
+        st.mean   = float(d["mean"])
+        st.m2     = float(d["m2"])
+        st.min    = np.inf if d["min"] is None else float(d["min"])
+        st.max    = -np.inf if d["max"] is None else float(d["max"])
+        st.sketch = QuantileSketch.from_dict(d["sketch"])
+        return st
+
+
+class StationStatsStore:
+    """
+    Per-station normalization statistics, updated incrementally.
+
+    Feed it the long frame from ``convert_to_timeseries_long_format`` (or the
+    wide ``all_data_df``) one month at a time; each call is a single pass over
+    the new rows only. Save it next to the checkpoint with
+    ``store.save(stats_path_for("best_model.pt"))``.
+
+    Supported scaling methods for ``normalize`` / ``denormalize``:
+      - 'zscore' : (x - mean) / std
+      - 'robust' : (x - median) / (p75 - p25)
+      - 'minmax' : (x - min) / (max - min)
+    """
+
+    METHODS = ("zscore", "robust", "minmax")
+
+    def __init__(self, compression: int = 100):
+        self.compression = compression
+        self.stations: dict[str, StationStats] = {}
+
+    def _get(self, station) -> StationStats:
+        if station not in self.stations:
+            self.stations[station] = StationStats(self.compression)
+        return self.stations[station]
+
+    # ---- updates -------------------------------------------------------
+
+    def update(self, station: str, values) -> "StationStatsStore":
+        self._get(station).update(values)
+        return self
+
+    def update_from_long(self, df: pd.DataFrame,
+                         value_col: str = 'Electricity(kW)',
+                         station_col: str = 'station_name') -> "StationStatsStore":
+        for station, vals in df.groupby(station_col, sort=False)[value_col]:
+            self._get(station).update(vals.to_numpy())
+        return self
+
+    def update_from_wide(self, df: pd.DataFrame,
+                         station_col: str = 'station_name') -> "StationStatsStore":
+        time_columns = [c for c in df.columns if re.match(r"^\d{1,2}:\d{2}$", str(c))]
+        for station, g in df.groupby(station_col, sort=False):
+            block = g[time_columns].apply(pd.to_numeric, errors='coerce').to_numpy()
+            self._get(station).update(block)
+        return self
+
+    def merge(self, other: "StationStatsStore") -> "StationStatsStore":
+        for station, st in other.stations.items():
+            self._get(station).merge(st)
+        return self
+
+    # ---- summaries -----------------------------------------------------
+
+    def summary(self) -> pd.DataFrame:
+        rows = []
+        for station, st in self.stations.items():
+            rows.append({
+                'station_name': station,
+                'count': st.count,
+                'mean':  st.mean,
+                'std':   st.std,
+                'min':   st.min,
+                'max':   st.max,
+                'p01':   st.quantile(0.01),
+                'p25':   st.quantile(0.25),
+                'p50':   st.quantile(0.50),
+                'p75':   st.quantile(0.75),
+                'p99':   st.quantile(0.99),
+            })
+        return pd.DataFrame(rows)
+
+    def scale_vectors(self, station_names: list[str], method: str = "zscore",
+                      eps: float = 1e-6) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Return float32 ``(loc, scale)`` arrays aligned with ``station_names``.
+        """
+        if method not in self.METHODS:
+            raise ValueError(f"Unknown scaling method: {method}")
+        missing = [s for s in station_names if s not in self.stations]
+        if missing:
+            raise KeyError(f"No statistics for stations: {missing}")
+
+        loc, scale = [], []
+        for s in station_names:
+            st = self.stations[s]
+            if method == "zscore":
+                l, sc = st.mean, st.std
+            elif method == "robust":
+                l, sc = st.quantile(0.5), st.quantile(0.75) - st.quantile(0.25)
+            else:
+                l, sc = st.min, st.max - st.min
+            loc.append(l)
+            scale.append(sc if sc > eps else 1.0)
+        return np.asarray(loc, dtype=np.float32), np.asarray(scale, dtype=np.float32)
+
+    # ---- fused transforms ---------------------------------------------
+
+    @staticmethod
+    def _broadcast(vec, x, node_axis):
+        shape = [1] * x.ndim
+        shape[node_axis] = -1
+        if hasattr(x, "new_tensor"):          # torch.Tensor
+            return x.new_tensor(vec).reshape(shape)
+        return vec.reshape(shape)
+
+    def normalize(self, x, station_names: list[str], method: str = "zscore",
+                  node_axis: int = 1):
+        """
+        Scale ``x`` (NumPy array or torch tensor) station-wise.
+
+        ``node_axis`` is the axis holding the N stations: 1 for the
+        ``[B, N, T]`` / ``[B, N, 1, T]`` windows used by the ASTGCN models.
+        """
+        loc, scale = self.scale_vectors(station_names, method)
+        return (x - self._broadcast(loc, x, node_axis)) * self._broadcast(1.0 / scale, x, node_axis)
+
+    def denormalize(self, x, station_names: list[str], method: str = "zscore",
+                    node_axis: int = 1):
+        loc, scale = self.scale_vectors(station_names, method)
+        return x * self._broadcast(scale, x, node_axis) + self._broadcast(loc, x, node_axis)
+
+    # ---- persistence ---------------------------------------------------
+
+    def to_dict(self) -> dict:
+        return {
+            "compression": self.compression,
+            "stations": {s: st.to_dict() for s, st in self.stations.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "StationStatsStore":
+        store = cls(compression=d.get("compression", 100))
+        store.stations = {s: StationStats.from_dict(v) for s, v in d["stations"].items()}
+        return store
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> "StationStatsStore":
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+def stats_path_for(checkpoint_path: str) -> str:
+    """
+    Location of the stats file persisted next to a checkpoint,
+    e.g. 'best_model.pt' -> 'best_model.stats.json'.
+    """
+    root, _ = os.path.splitext(checkpoint_path)
+    return root + ".stats.json"